@@ -0,0 +1,120 @@
+import functools
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Iterable, Optional, Tuple
+
+from streaming import wants_ndjson
+
+# How many responses each cache keeps before evicting the least recently used one.
+MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 512))
+# Seconds an entry may be served for. Writes made through this process invalidate entries immediately through the
+# table versions; the TTL bounds how long a write made by another Lambda container can go unnoticed.
+TTL = float(os.getenv("CACHE_TTL", 60))
+
+MISSING = object()
+
+# One counter per table name, bumped after every committed write to that table. A cached response remembers the
+# versions of the tables it was read from and is only served while they are unchanged. Writes run in the threadpool,
+# so the counters are guarded by a lock: two bumps racing must not collapse into one.
+_versions = {}
+_versions_lock = threading.Lock()
+
+
+def bump(*tables: str):
+    with _versions_lock:
+        for table in tables:
+            _versions[table] = _versions.get(table, 0) + 1
+
+
+def stamp(tables: Iterable[str]) -> Tuple[int, ...]:
+    """
+    The current versions of `tables`. Take it before running the query, so a write that lands while the query
+    runs makes the stored entry stale rather than hiding the write.
+    """
+    with _versions_lock:
+        return tuple(_versions.get(table, 0) for table in tables)
+
+
+class VersionedCache:
+    """
+    A size-bounded LRU of query results, each tagged with the versions of the tables it depends on. Entries are
+    only read and stored from the event loop, so they need no locking; the versions they are checked against are
+    bumped from the threadpool and locked in bump and stamp.
+    """
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, ttl: float = TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, key, tables: Tuple[str, ...]):
+        entry = self._entries.get(key)
+        if entry is not None:
+            versions, expires, value = entry
+            if versions == stamp(tables) and expires > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+        self.misses += 1
+        return MISSING
+
+    def put(self, key, versions: Tuple[int, ...], value):
+        self._entries[key] = (versions, time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "max_entries": self.max_entries, "hits": self.hits,
+                "misses": self.misses}
+
+
+# Responses of the read_* endpoints, and results of run_select_query keyed by SQL fingerprint
+read_cache = VersionedCache()
+query_cache = VersionedCache()
+
+# Endpoint arguments that don't change the response
+_UNKEYED = {"request", "database", "db", "api_key"}
+
+
+def _key_part(value):
+    # Dependency classes such as PageParams and DateRange are keyed by their attributes, list parameters as tuples
+    if hasattr(value, "__dict__"):
+        return tuple(sorted(vars(value).items()))
+    if isinstance(value, list):
+        return tuple(value)
+    return value
+
+
+def cached_read(*tables: str, related: Optional[Callable[[dict], Tuple[str, ...]]] = None):
+    """
+    Caches a read endpoint's response in read_cache, keyed by its arguments and tagged with the versions of
+    `tables`, plus any tables `related` returns for the arguments of a call. NDJSON exports are streamed, never
+    cached.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            if wants_ndjson(kwargs["request"]):
+                return await fn(*args, **kwargs)
+            key = (fn.__name__,) + tuple((name, _key_part(value)) for name, value in sorted(kwargs.items())
+                                         if name not in _UNKEYED)
+            depends = tables + related(kwargs) if related is not None else tables
+            value = read_cache.get(key, depends)
+            if value is MISSING:
+                versions = stamp(depends)
+                value = await fn(*args, **kwargs)
+                read_cache.put(key, versions, value)
+            return value
+
+        return wrapper
+
+    return decorator
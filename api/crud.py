@@ -0,0 +1,263 @@
+import re
+from typing import Callable, List, NamedTuple, Optional, Tuple, Union
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import insert, select, text
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+import cache
+import models
+import schema
+
+# Resource names as they appear in the URL paths, with their ORM class and Pydantic model
+RESOURCES = {
+    "seeds": (schema.Seed, models.Seed),
+    "germinations": (schema.Germination, models.Germination),
+    "plants": (schema.Plant, models.Plant),
+    "yields": (schema.Yield, models.Yield),
+    "plant_crosses": (schema.PlantCross, models.PlantCross),
+    "plant_plant_crosses": (schema.PlantPlantCross, models.PlantPlantCross),
+    "taste_tests": (schema.TasteTest, models.TasteTest),
+    "observations": (schema.Observation, models.Observation),
+    "hydroponic_systems": (schema.HydroponicSystem, models.HydroponicSystem),
+    "hydroponic_conditions": (schema.HydroponicCondition, models.HydroponicCondition),
+}
+
+BATCH_REFERENCE = re.compile(r"^\$(\d+)$")
+
+
+class WriteHook(NamedTuple):
+    tables: Tuple[str, ...]
+    derived: Tuple[str, ...]
+    callback: Callable
+
+
+# Callbacks that keep derived tables in step with the tables they are computed from; see on_write
+write_hooks: List[WriteHook] = []
+
+
+def on_write(*tables: str, derived: Tuple[str, ...] = ()):
+    """
+    Registers callback(db, table_name, before, after) to run inside every upsert or delete of `tables`, once the
+    write is flushed and before it is committed. `before` holds the rows as they were before being overwritten or
+    deleted, `after` the rows written. The tables the callback itself writes go in `derived`, so cached reads of
+    them are invalidated with the write.
+    """
+    def decorator(fn):
+        write_hooks.append(WriteHook(tables, derived, fn))
+        return fn
+
+    return decorator
+
+
+def hooks_for(schema_cls) -> List[WriteHook]:
+    return [hook for hook in write_hooks if schema_cls.__tablename__ in hook.tables]
+
+
+def current_rows(db: Session, schema_cls, pk_values: List[int]) -> List[dict]:
+    """
+    The stored rows with these ids, as dicts, read before a write overwrites them.
+    """
+    if not pk_values:
+        return []
+    table = schema_cls.__table__
+    return [dict(row) for row in db.execute(select(table).where(primary_key(schema_cls).in_(pk_values))).mappings()]
+
+
+def run_hooks(db: Session, schema_cls, before: List[dict], after: List[dict]):
+    for hook in hooks_for(schema_cls):
+        hook.callback(db, schema_cls.__tablename__, before, after)
+
+
+class BatchError(Exception):
+    """
+    Raised when an operation of a batch fails. The whole batch has been rolled back.
+    """
+
+    def __init__(self, index: int, message: str):
+        super().__init__(message)
+        self.index = index
+        self.message = message
+
+
+def primary_key(schema_cls):
+    return schema_cls.__table__.primary_key.columns.values()[0]
+
+
+def written_tables(schema_cls, verb: str) -> List[str]:
+    """
+    The tables a write can change, for cache invalidation. Deleting a row also nulls the foreign keys of its
+    loaded children, so a delete counts as a write to every table that references it.
+    """
+    table = schema_cls.__table__
+    tables = [table.name]
+    if verb == "delete":
+        tables += [other.name for other in schema.Base.metadata.tables.values()
+                   if any(key.column.table is table for key in other.foreign_keys)]
+    for hook in hooks_for(schema_cls):
+        tables += [derived for derived in hook.derived if derived not in tables]
+    return tables
+
+
+def upsert_statement(dialect_name: str, table, columns):
+    """
+    Builds a single INSERT that updates the existing row when the primary key is already taken:
+    ON DUPLICATE KEY UPDATE on MySQL, ON CONFLICT DO UPDATE on SQLite. Values are bound at execution, so the same
+    statement serves one row or an executemany batch.
+    """
+    pk_name = table.primary_key.columns.values()[0].name
+    if dialect_name == "mysql":
+        stmt = mysql.insert(table)
+        return stmt.on_duplicate_key_update({key: stmt.inserted[key] for key in columns if key != pk_name})
+    if dialect_name == "sqlite":
+        stmt = sqlite.insert(table)
+        return stmt.on_conflict_do_update(index_elements=[pk_name],
+                                          set_={key: stmt.excluded[key] for key in columns if key != pk_name})
+    raise NotImplementedError(f"Upserts are not implemented for the {dialect_name} dialect")
+
+
+def insert_many(db: Session, table, rows: List[dict]) -> List[int]:
+    """
+    Inserts rows without ids in one multi-row statement and returns their new ids in input order.
+    """
+    pk = table.primary_key.columns.values()[0]
+    if db.get_bind().dialect.insert_executemany_returning_sort_by_parameter_order:
+        return db.execute(insert(table).returning(pk, sort_by_parameter_order=True), rows).scalars().all()
+    # MySQL has no RETURNING. A multi-row INSERT ... VALUES is a "simple insert", for which InnoDB reserves one
+    # block of auto-increment values without gaps in every lock mode, starting at LAST_INSERT_ID(). The values in
+    # the block are auto_increment_increment apart, which replicated and multi-writer setups set above 1.
+    first_id = db.execute(insert(table).values(rows)).lastrowid
+    step = db.execute(text("SELECT @@auto_increment_increment")).scalar_one()
+    return list(range(first_id, first_id + step * len(rows), step))
+
+
+def bulk_upsert(db: Session, schema_cls, items: List[BaseModel], commit: bool = True) -> List[dict]:
+    """
+    Writes a batch in one transaction: new items in one multi-row INSERT, items with ids in one executemany upsert.
+    Returns the items with their ids, in the order they were given.
+    """
+    table = schema_cls.__table__
+    pk_name = primary_key(schema_cls).name
+    rows = [item.model_dump() for item in items]
+    new_rows = [row for row in rows if row[pk_name] is None]
+    existing_rows = [row for row in rows if row[pk_name] is not None]
+    hooked = bool(hooks_for(schema_cls))
+    before = current_rows(db, schema_cls, [row[pk_name] for row in existing_rows]) if hooked else []
+    if new_rows:
+        for row in new_rows:
+            del row[pk_name]
+        for row, new_id in zip(new_rows, insert_many(db, table, new_rows)):
+            row[pk_name] = new_id
+    if existing_rows:
+        db.execute(upsert_statement(db.get_bind().dialect.name, table, existing_rows[0].keys()), existing_rows)
+    if hooked:
+        run_hooks(db, schema_cls, before, rows)
+    if commit:
+        db.commit()
+        cache.bump(*written_tables(schema_cls, "upsert"))
+    return rows
+
+
+def upsert(db: Session, schema_cls, item: Union[BaseModel, List[BaseModel]], commit: bool = True):
+    """
+    Inserts an item, or replaces every column of the existing row if the item's id is already taken, in one
+    statement. The response is built from the payload and the statement result, so the row is never read back.
+    A list of items is handed to bulk_upsert.
+    """
+    if isinstance(item, list):
+        return bulk_upsert(db, schema_cls, item, commit=commit)
+    table = schema_cls.__table__
+    pk_name = primary_key(schema_cls).name
+    values = item.model_dump()
+    hooked = bool(hooks_for(schema_cls))
+    before = []
+    if values[pk_name] is None:
+        # Without an id there is nothing to conflict with, so a plain INSERT is enough
+        del values[pk_name]
+        result = db.execute(insert(table).values(values))
+        values = {pk_name: result.inserted_primary_key[0], **values}
+    else:
+        if hooked:
+            before = current_rows(db, schema_cls, [values[pk_name]])
+        db.execute(upsert_statement(db.get_bind().dialect.name, table, values.keys()), values)
+    if hooked:
+        run_hooks(db, schema_cls, before, [values])
+    if commit:
+        db.commit()
+        cache.bump(*written_tables(schema_cls, "upsert"))
+    return values
+
+
+def delete(db: Session, schema_cls, pk_value: int, commit: bool = True) -> Optional[dict]:
+    """
+    Deletes a row by primary key and returns what it contained, or None if there was no such row.
+    """
+    row = db.execute(select(schema_cls).where(primary_key(schema_cls) == pk_value)).scalar_one_or_none()
+    if row is None:
+        return None
+    deleted = {column.key: getattr(row, column.key) for column in schema_cls.__table__.columns}
+    db.delete(row)
+    if hooks_for(schema_cls):
+        db.flush()
+        run_hooks(db, schema_cls, [deleted], [])
+    if commit:
+        db.commit()
+        cache.bump(*written_tables(schema_cls, "delete"))
+    return deleted
+
+
+def resolve_references(value, ids: List[int]):
+    """
+    Replaces "$N" strings in a batch payload with the id produced by operation N.
+    """
+    if isinstance(value, dict):
+        return {key: resolve_references(item, ids) for key, item in value.items()}
+    if isinstance(value, list):
+        return [resolve_references(item, ids) for item in value]
+    if isinstance(value, str):
+        match = BATCH_REFERENCE.match(value)
+        if match:
+            index = int(match.group(1))
+            if index >= len(ids):
+                raise ValueError(f"{value} refers to an operation that has not run yet")
+            return ids[index]
+    return value
+
+
+def run_batch(db: Session, operations: List[models.BatchOperation]) -> List[dict]:
+    """
+    Runs upserts and deletes in order in one transaction. Either every operation is committed or, if one fails,
+    none are and a BatchError says which one failed.
+    """
+    ids = []
+    results = []
+    written = set()
+    for index, operation in enumerate(operations):
+        schema_cls, model_cls = RESOURCES[operation.resource]
+        pk_name = primary_key(schema_cls).name
+        written.update(written_tables(schema_cls, operation.verb))
+        try:
+            payload = resolve_references(operation.payload, ids)
+            if operation.verb == "upsert":
+                result = upsert(db, schema_cls, model_cls(**payload), commit=False)
+            else:
+                if not isinstance(payload.get("id"), int):
+                    raise ValueError('delete payloads must be {"id": <id>}')
+                result = delete(db, schema_cls, payload["id"], commit=False)
+                if result is None:
+                    raise LookupError(f"{model_cls.__name__} {payload['id']} not found")
+            # Flush deletes now so a failure is reported against this operation rather than the commit
+            db.flush()
+        except DBAPIError as e:
+            db.rollback()
+            raise BatchError(index, str(e.orig))
+        except (ValidationError, ValueError, LookupError) as e:
+            db.rollback()
+            raise BatchError(index, str(e))
+        ids.append(result[pk_name])
+        results.append(result)
+    db.commit()
+    cache.bump(*written)
+    return results
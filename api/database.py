@@ -1,23 +1,218 @@
+import asyncio
+import functools
+import inspect
+import logging
 import os
+from typing import Optional
 
-import pymysql
-from dotenv import load_dotenv
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session, sessionmaker
 
-# Load environment variables
-load_dotenv()
+logger = logging.getLogger()
 
-# Retrieve the database URL from the .env file
-DATABASE_URL = os.getenv("DB_CONNECTION")
+# Connection management tuned for Lambda, where one container serves one request at a time and may sit frozen for
+# minutes between invocations. Every value can be overridden through the environment.
+# One connection per container, plus one spare for a streamed response still holding the first.
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 1))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 1))
+# Seconds to wait for a free pooled connection before failing the request.
+POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 10))
+# Connections are replaced before they have been idle long enough to be dropped along the way: the AWS NAT gateway
+# forgets idle TCP flows after 350 seconds, well before the MySQL wait_timeout.
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 240))
+# Socket timeouts in seconds, kept well inside the 30 second function timeout.
+CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", 5))
+READ_TIMEOUT = int(os.getenv("DB_READ_TIMEOUT", 20))
+WRITE_TIMEOUT = int(os.getenv("DB_WRITE_TIMEOUT", 20))
+# How many times an idempotent read is retried after its connection was lost.
+READ_RETRIES = int(os.getenv("DB_READ_RETRIES", 1))
+# Size of the async pool behind the read endpoints. On Lambda one request runs at a time, so it matches the sync
+# pool; the container deployment raises it to serve concurrent reads.
+ASYNC_POOL_SIZE = int(os.getenv("DB_ASYNC_POOL_SIZE", POOL_SIZE + MAX_OVERFLOW))
+# MySQL client errors raised by the async driver when the connection is lost mid-query: server has gone away, lost
+# connection during query, lost connection during handshake.
+DISCONNECT_ERRORS = {2006, 2013, 2055}
 
-# Database connection
-connection = pymysql.connect(host='host',
-                             user='user',
-                             password='password',
-                             database='dbname')
+# Nothing in this module touches the network or disk at import time. The engine, the session factory and the
+# async `databases.Database` are created the first time something asks for them, so a cold Lambda only pays for
+# what the first request actually uses.
+_engine = None
+_session_factory = None
+_database = None
+_database_lock = None
 
 
-def get_db_session():
+def load_local_env():
+    """
+    The SAM template sets the DB_* variables and API_KEY on Lambda. Only when they are missing (local runs) is a
+    .env file read, so deployed cold starts skip importing dotenv and the filesystem lookup.
+    """
+    if os.getenv("DATABASE_URL") is None and os.getenv("DB_HOST") is None:
+        from dotenv import load_dotenv
+        load_dotenv()
+
+
+def database_url() -> str:
+    """
+    DATABASE_URL wins if set (tests, local tools). Otherwise the URL is assembled from the DB_* variables.
+    """
+    url = os.getenv("DATABASE_URL")
+    if url:
+        return url
+    return f"mysql+pymysql://{os.getenv('DB_USER')}:" \
+           f"{os.getenv('DB_PASSWORD')}@" \
+           f"{os.getenv('DB_HOST')}/{os.getenv('DB_NAME')}"
+
+
+def engine_options(url: str) -> dict:
+    options = {"pool_pre_ping": True, "pool_recycle": POOL_RECYCLE}
+    if url.startswith("mysql"):
+        options.update(pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW, pool_timeout=POOL_TIMEOUT,
+                       connect_args={"connect_timeout": CONNECT_TIMEOUT, "read_timeout": READ_TIMEOUT,
+                                     "write_timeout": WRITE_TIMEOUT})
+    return options
+
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        from sqlalchemy import create_engine
+        url = database_url()
+        _engine = create_engine(url, **engine_options(url))
+    return _engine
+
+
+def new_session() -> Session:
+    global _session_factory
+    if _session_factory is None:
+        _session_factory = sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
+    return _session_factory()
+
+
+def is_disconnect(e: Exception) -> bool:
+    """
+    Whether a query failed because its connection was lost, rather than because of the query itself. SQLAlchemy
+    flags this on the sync path; the async driver raises the raw PyMySQL error.
+    """
+    if isinstance(e, DBAPIError):
+        return e.connection_invalidated
+    return type(e).__name__ == "OperationalError" and bool(e.args) and e.args[0] in DISCONNECT_ERRORS
+
+
+def retry_on_disconnect(fn):
+    """
+    For idempotent reads only: if the connection drops mid-query (failover, an idle connection killed while the
+    container was frozen), the pool discards it and the read is retried on a fresh one. Stale connections are
+    already caught at checkout by pool_pre_ping; this covers the ones that die after it. A sync endpoint's Session,
+    passed as `db`, is rolled back before retrying; the async pool discards a closed connection on its own.
+    """
+    def should_retry(e: Exception, attempt: int, db) -> bool:
+        if not is_disconnect(e) or attempt >= READ_RETRIES:
+            return False
+        logger.warning("retrying %s after losing the database connection: %s", fn.__name__, e)
+        if db is not None:
+            db.rollback()
+        return True
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            attempt = 0
+            while True:
+                try:
+                    return await fn(*args, **kwargs)
+                except Exception as e:
+                    if not should_retry(e, attempt, kwargs.get("db")):
+                        raise
+                    attempt += 1
+
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        attempt = 0
+        while True:
+            try:
+                return fn(*args, **kwargs)
+            except DBAPIError as e:
+                if not should_retry(e, attempt, kwargs.get("db")):
+                    raise
+                attempt += 1
+
+    return wrapper
+
+
+def ping():
+    """
+    Checks a pooled connection out and back in, opening it if needed, so the next request finds it ready.
+    """
+    with get_engine().connect() as connection:
+        connection.exec_driver_sql("SELECT 1")
+
+
+def database_options(url: str) -> dict:
+    if url.startswith("mysql"):
+        return {"min_size": 1, "max_size": ASYNC_POOL_SIZE, "pool_recycle": POOL_RECYCLE,
+                "connect_timeout": CONNECT_TIMEOUT}
+    return {}
+
+
+def get_database():
+    """
+    The async connection pool. `databases` pulls in the async driver stack, so it is only imported on first use.
+    """
+    global _database
+    if _database is None:
+        from databases import Database
+        url = database_url()
+        _database = Database(url, **database_options(url))
+    return _database
+
+
+async def connected_database():
+    """
+    The async pool, connected on first use. The lock keeps concurrent first requests from each opening a pool.
+    """
+    global _database_lock
+    database = get_database()
+    if not database.is_connected:
+        if _database_lock is None:
+            _database_lock = asyncio.Lock()
+        async with _database_lock:
+            if not database.is_connected:
+                await database.connect()
+    return database
+
+
+async def fetch_sql(database, query: str, params: Optional[tuple] = None) -> list:
+    """
+    Runs a raw SQL string on the async pool. It goes straight to the driver cursor, so colons and percent signs in
+    it are never taken for bind parameters; positional `params`, if given, are bound by the driver. Rows come back
+    as dicts.
+    """
+    async with database.connection() as connection:
+        cursor = await connection.raw_connection.cursor()
+        try:
+            await cursor.execute(query, params)
+            columns = [column[0] for column in cursor.description or ()]
+            return [dict(zip(columns, row)) for row in await cursor.fetchall()]
+        finally:
+            await cursor.close()
+
+
+def connect_database():
+    """
+    Opens the async pool from synchronous code, on the same event loop Mangum runs requests on.
+    """
     try:
-        yield connection
-    finally:
-        connection.close()
+        loop = asyncio.get_event_loop()
+    except RuntimeError:
+        # The thread's loop was closed and unset (asyncio.run does this); install a new one for Mangum to reuse
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+    loop.run_until_complete(connected_database())
+
+
+async def disconnect_database():
+    if _database is not None and _database.is_connected:
+        await _database.disconnect()
@@ -0,0 +1,85 @@
+"""
+Everything recorded about one plant, read in a fixed number of statements however long its history is: the plant
+with its germination, seed and hydroponic system are joined into one query, and each list section is one more
+query, newest first, with the section limit applied in SQL.
+"""
+from typing import Optional
+
+from sqlalchemy import desc, select
+from sqlalchemy.orm import Session, joinedload
+
+import schema
+from database import new_session
+
+# The tables a dossier is read from, for caching
+TABLES = (schema.Plant.__tablename__, schema.Germination.__tablename__, schema.Seed.__tablename__,
+          schema.HydroponicSystem.__tablename__, schema.Observation.__tablename__, schema.TasteTest.__tablename__,
+          schema.Yield.__tablename__, schema.PlantPlantCross.__tablename__, schema.PlantCross.__tablename__)
+
+LOADER_OPTIONS = (
+    joinedload(schema.Plant.germination).joinedload(schema.Germination.seed),
+    joinedload(schema.Plant.system),
+)
+
+Observation, TasteTest, Yield, PlantCross, PlantPlantCross = (
+    schema.Observation, schema.TasteTest, schema.Yield, schema.PlantCross, schema.PlantPlantCross)
+
+
+def sections(plant_id: int) -> dict:
+    """
+    The query of each list section, newest first.
+    """
+    return {
+        "observations": select(Observation).where(Observation.plant_id == plant_id)
+        .order_by(desc(Observation.date), desc(Observation.observation_id)),
+        "taste_tests": select(TasteTest).where(TasteTest.plant_id == plant_id)
+        .order_by(desc(TasteTest.date), desc(TasteTest.taste_test_id)),
+        "yields": select(Yield).where(Yield.plant_id == plant_id).order_by(desc(Yield.date), desc(Yield.yield_id)),
+        "crosses": select(PlantCross)
+        .where(PlantCross.cross_id.in_(select(PlantPlantCross.cross_id).where(PlantPlantCross.plant_id == plant_id)))
+        .order_by(PlantCross.cross_date.is_(None), desc(PlantCross.cross_date), desc(PlantCross.cross_id)),
+    }
+
+
+def columns(row) -> Optional[dict]:
+    if row is None:
+        return None
+    return {column.key: getattr(row, column.key) for column in row.__table__.columns}
+
+
+def load(db: Session, plant_id: int, section_limit: Optional[int] = None) -> Optional[dict]:
+    """
+    The plant's dossier, or None if there is no such plant. List sections are newest first; with a section_limit,
+    each keeps that many rows and the names of the cut sections are listed in `truncated`.
+    """
+    plant = db.scalars(select(schema.Plant).options(*LOADER_OPTIONS)
+                       .where(schema.Plant.plant_id == plant_id)).unique().one_or_none()
+    if plant is None:
+        return None
+    germination = plant.germination
+    dossier = {
+        **columns(plant),
+        "germination": columns(germination),
+        "seed": columns(germination.seed if germination is not None else None),
+        "system": columns(plant.system),
+    }
+    truncated = []
+    for section, query in sections(plant_id).items():
+        # One row past the limit tells whether the section was cut
+        if section_limit is not None:
+            query = query.limit(section_limit + 1)
+        rows = db.scalars(query).all()
+        if section_limit is not None and len(rows) > section_limit:
+            rows = rows[:section_limit]
+            truncated.append(section)
+        dossier[section] = [columns(row) for row in rows]
+    dossier["truncated"] = truncated
+    return dossier
+
+
+def read(plant_id: int, section_limit: Optional[int] = None) -> Optional[dict]:
+    db = new_session()
+    try:
+        return load(db, plant_id, section_limit)
+    finally:
+        db.close()
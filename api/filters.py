@@ -0,0 +1,35 @@
+from datetime import date
+from typing import Optional
+
+from fastapi import HTTPException, Query
+from sqlalchemy import Select
+
+
+class DateRange:
+    """
+    Optional inclusive date bounds shared by the list endpoints of dated resources.
+    """
+
+    def __init__(self,
+                 date_from: Optional[date] = Query(None, description='Only include entries on or after this date'),
+                 date_to: Optional[date] = Query(None, description='Only include entries on or before this date')):
+        if date_from and date_to and date_from > date_to:
+            raise HTTPException(status_code=400, detail="date_from must not be after date_to.")
+        self.date_from = date_from
+        self.date_to = date_to
+
+
+def apply_filters(stmt: Select, equals: dict, date_column=None, dates: Optional[DateRange] = None) -> Select:
+    """
+    Pushes list filters down into the WHERE clause. `equals` maps columns to values; None values are skipped so
+    unset query parameters don't filter anything.
+    """
+    for column, value in equals.items():
+        if value is not None:
+            stmt = stmt.where(column == value)
+    if dates is not None:
+        if dates.date_from is not None:
+            stmt = stmt.where(date_column >= dates.date_from)
+        if dates.date_to is not None:
+            stmt = stmt.where(date_column <= dates.date_to)
+    return stmt
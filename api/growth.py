@@ -0,0 +1,218 @@
+"""
+Growth analytics over observations. Heights and leaf counts are fetched as columns in one query, sorted by plant
+and date, and every statistic is computed for all plants at once with NumPy: per-plant sums come from
+np.add.reduceat over the plant boundaries, so there is no loop over plants.
+
+Per plant: a least-squares line through height (cm/day) and leaf count (leaves/day), a logistic curve
+K / (1 + exp(-r (t - t_mid))) fitted by linearizing with K just above the tallest observation, and the days from
+planting (or the first observation) until height first reached a milestone. Plants can be compared in cohorts by
+variety, cross or hydroponic system.
+"""
+from typing import Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+import schema
+from database import new_session
+from pagination import encode_cursor
+
+Observation, Plant, Germination, Seed, Yield = (
+    schema.Observation, schema.Plant, schema.Germination, schema.Seed, schema.Yield)
+
+TABLES = (Observation.__tablename__, Plant.__tablename__, Germination.__tablename__, Seed.__tablename__,
+          Yield.__tablename__)
+
+# The logistic ceiling is set this far above the tallest observation, so the tallest point stays on the curve
+CEILING = 1.1
+# Fewest height observations a curve is fitted to
+MIN_POINTS = 3
+
+COLUMNS = ("plant_id", "observations", "first_day", "days_observed", "latest_height_cm", "growth_cm_per_day",
+           "linear_r2", "leaves_per_day", "logistic_max_height_cm", "logistic_rate", "logistic_midpoint_day",
+           "logistic_r2", "days_to_milestone")
+
+
+def _line(np, starts, weights, x, y):
+    """
+    Weighted least squares y = slope * x + intercept within every group at once. Returns slope, intercept, r².
+    """
+    def sums(values):
+        return np.add.reduceat(values, starts)
+
+    y = np.where(weights > 0, y, 0.0)
+    wy = weights * y
+    n, sx, sy = sums(weights), sums(weights * x), sums(wy)
+    sxx, sxy, syy = sums(weights * x * x), sums(wy * x), sums(wy * y)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        spread = n * sxx - sx * sx
+        slope = np.where(spread > 0, (n * sxy - sx * sy) / spread, np.nan)
+        intercept = (sy - slope * sx) / n
+        variance = n * syy - sy * sy
+        r2 = np.where(variance > 0, (n * sxy - sx * sy) ** 2 / (spread * variance), np.nan)
+    return slope, intercept, r2
+
+
+def analyze(plant_ids, days, heights, leaves, origins: Optional[Dict[int, int]] = None, milestone_cm: float = 30.0):
+    """
+    Per-plant growth statistics. Inputs are parallel arrays sorted by plant and then day: days as day numbers,
+    heights and leaf counts with NaN where not observed. `origins` maps plants to their planting day number.
+    Returns a dict of arrays with one entry per plant.
+    """
+    import numpy as np
+
+    plant_ids, days = np.asarray(plant_ids), np.asarray(days, dtype=float)
+    heights, leaves = np.asarray(heights, dtype=float), np.asarray(leaves, dtype=float)
+    if not len(plant_ids):
+        return {column: np.empty(0) for column in COLUMNS}
+    starts = np.flatnonzero(np.r_[True, plant_ids[1:] != plant_ids[:-1]])
+    counts = np.diff(np.r_[starts, len(plant_ids)])
+    group = np.repeat(np.arange(len(starts)), counts)
+    first_day = days[starts]
+    x = days - first_day[group]
+
+    has_height = ~np.isnan(heights)
+    height_weights = has_height.astype(float)
+    slope, _, r2 = _line(np, starts, height_weights, x, heights)
+    leaf_rate, _, _ = _line(np, starts, (~np.isnan(leaves)).astype(float), x, leaves)
+    points = np.add.reduceat(height_weights, starts)
+    tallest = np.maximum.reduceat(np.where(has_height, heights, -np.inf), starts)
+    # The latest height is at the highest position holding one in each plant's run
+    latest = np.maximum.reduceat(np.where(has_height, np.arange(len(heights)), -1), starts)
+    latest_height = np.where(latest >= 0, heights[np.maximum(latest, 0)], np.nan)
+
+    # Logistic: ln(h / (K - h)) = r t - r t_mid is a straight line in t once K is fixed
+    ceiling = CEILING * tallest
+    usable = has_height & (heights > 0) & (points[group] >= MIN_POINTS)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        logit = np.where(usable, np.log(heights / (ceiling[group] - heights)), 0.0)
+        rate, logit_intercept, _ = _line(np, starts, usable.astype(float), x, logit)
+        fitted = ceiling[group] / (1 + np.exp(-(rate[group] * x + logit_intercept[group])))
+        residual = np.add.reduceat(np.where(usable, (heights - fitted) ** 2, 0.0), starts)
+        mean = np.add.reduceat(np.where(usable, heights, 0.0), starts) / np.add.reduceat(usable, starts)
+        spread = np.add.reduceat(np.where(usable, (heights - mean[group]) ** 2, 0.0), starts)
+        logistic_r2 = np.where(spread > 0, 1 - residual / spread, np.nan)
+        midpoint = -logit_intercept / rate
+    fits = (points >= MIN_POINTS) & (rate > 0)
+
+    # Days from planting, or from the first observation, until height first reached the milestone
+    origin = first_day.copy()
+    if origins:
+        known = np.array([origins.get(int(plant_id), np.nan) for plant_id in plant_ids[starts]], dtype=float)
+        origin = np.where(np.isnan(known), origin, known)
+    reached = np.minimum.reduceat(np.where(has_height & (heights >= milestone_cm), days, np.inf), starts)
+
+    return {
+        "plant_id": plant_ids[starts],
+        "observations": counts,
+        "first_day": first_day,
+        "days_observed": days[starts + counts - 1] - first_day,
+        "latest_height_cm": latest_height,
+        "growth_cm_per_day": slope,
+        "linear_r2": r2,
+        "leaves_per_day": leaf_rate,
+        "logistic_max_height_cm": np.where(fits, ceiling, np.nan),
+        "logistic_rate": np.where(fits, rate, np.nan),
+        "logistic_midpoint_day": np.where(fits, midpoint, np.nan),
+        "logistic_r2": np.where(fits, logistic_r2, np.nan),
+        "days_to_milestone": np.where(np.isinf(reached), np.nan, reached - origin),
+    }
+
+
+def cohorts(stats: dict, labels) -> List[dict]:
+    """
+    Mean statistics per cohort, ignoring plants where a statistic is unknown, again without a loop over plants.
+    """
+    import numpy as np
+
+    names, index = np.unique(np.asarray(labels, dtype=str), return_inverse=True)
+    result = [{"cohort": str(name), "plants": int(count)}
+              for name, count in zip(names, np.bincount(index, minlength=len(names)))]
+    for column in ("growth_cm_per_day", "leaves_per_day", "logistic_max_height_cm", "logistic_rate",
+                   "days_to_milestone"):
+        values = stats[column]
+        known = ~np.isnan(values)
+        totals = np.bincount(index, weights=np.where(known, values, 0.0), minlength=len(names))
+        counts = np.bincount(index, weights=known.astype(float), minlength=len(names))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            means = totals / counts
+        for row, mean in zip(result, means):
+            row[f"mean_{column}"] = None if np.isnan(mean) else float(mean)
+    return result
+
+
+def fetch(db: Session, plant_ids: Optional[List[int]] = None, after: Optional[int] = None):
+    """
+    The observation columns, sorted by plant and date, and each plant's planting day and cohort labels; only of
+    plants past `after` if given.
+    """
+    stmt = select(Observation.plant_id, Observation.date, Observation.height_cm, Observation.leaf_count) \
+        .where(Observation.plant_id.is_not(None), Observation.date.is_not(None)) \
+        .order_by(Observation.plant_id, Observation.date, Observation.observation_id)
+    plants = select(Plant.plant_id, Plant.planted_date, Plant.system_id, Seed.species, Seed.variety, Yield.cross_id) \
+        .outerjoin(Germination, Germination.germination_id == Plant.germination_id) \
+        .outerjoin(Seed, Seed.seed_id == Germination.seed_id) \
+        .outerjoin(Yield, Yield.yield_id == Seed.yield_id)
+    if plant_ids:
+        stmt = stmt.where(Observation.plant_id.in_(plant_ids))
+        plants = plants.where(Plant.plant_id.in_(plant_ids))
+    if after is not None:
+        stmt = stmt.where(Observation.plant_id > after)
+        plants = plants.where(Plant.plant_id > after)
+    columns = list(zip(*db.execute(stmt).all())) or [(), (), (), ()]
+    return columns, {row.plant_id: row for row in db.execute(plants)}
+
+
+def label(plant, cohort: str) -> str:
+    if plant is None:
+        return "unknown"
+    if cohort == "variety":
+        return " ".join(filter(None, (plant.species, plant.variety))) or "unknown"
+    value = plant.cross_id if cohort == "cross" else plant.system_id
+    return f"{cohort} {value}" if value is not None else f"no {cohort}"
+
+
+def report(db: Session, plant_ids: Optional[List[int]], cohort: Optional[str], milestone_cm: float,
+           limit: int, after: Optional[int] = None) -> dict:
+    """
+    One page of plants, by plant_id, starting past `after`. Cohorts cover every plant, so only the first page
+    has them.
+    """
+    import numpy as np
+
+    (ids, dates, heights, leaves), plants = fetch(db, plant_ids, after)
+    origins = {plant_id: plant.planted_date.toordinal() for plant_id, plant in plants.items()
+               if plant.planted_date is not None}
+    stats = analyze(np.array(ids, dtype=int), [day.toordinal() for day in dates],
+                    np.array(heights, dtype=float), np.array(leaves, dtype=float), origins, milestone_cm)
+    rows = []
+    for position in range(min(limit, len(stats["plant_id"]))):
+        row = {}
+        for column, values in stats.items():
+            value = values[position].item()
+            row[column] = None if isinstance(value, float) and np.isnan(value) else value
+        row["first_observed"] = _from_day(row.pop("first_day"))
+        rows.append(row)
+    truncated = len(stats["plant_id"]) > limit
+    return {
+        "plants": rows,
+        "truncated": truncated,
+        "next_cursor": encode_cursor(rows[-1]["plant_id"]) if truncated else None,
+        "cohorts": cohorts(stats, [label(plants.get(int(plant_id)), cohort) for plant_id in stats["plant_id"]])
+        if cohort and after is None else [],
+    }
+
+
+def _from_day(day: float):
+    from datetime import date
+
+    return date.fromordinal(int(day))
+
+
+def read(plant_ids: Optional[List[int]], cohort: Optional[str], milestone_cm: float, limit: int,
+         after: Optional[int] = None) -> dict:
+    db = new_session()
+    try:
+        return report(db, plant_ids, cohort, milestone_cm, limit, after)
+    finally:
+        db.close()
@@ -0,0 +1,219 @@
+"""
+Keeps the plant_lineage closure table in step with the pedigree. A plant's parents are found through
+plant -> germination -> seed -> yield: the plant that bore the yield, and the plants of the cross it came from.
+
+Any write that can change a plant's parents recomputes the closure rows of that plant and of all its descendants,
+parents before children, inside the write's transaction. Ancestor and descendant reads are then one indexed query
+at any depth.
+"""
+from collections import defaultdict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy import Select, delete, insert, select
+from sqlalchemy.orm import Session
+
+import crud
+import schema
+
+Plant, Germination, Seed, Yield, PlantPlantCross, PlantLineage = (
+    schema.Plant, schema.Germination, schema.Seed, schema.Yield, schema.PlantPlantCross, schema.PlantLineage)
+
+
+class Link(NamedTuple):
+    # The column of a written row that finds the plants affected, and the columns that make up the link
+    key: str
+    columns: Tuple[str, ...]
+
+
+# The tables a parent link runs through
+LINKS = {
+    Plant.__tablename__: Link("plant_id", ("germination_id",)),
+    Germination.__tablename__: Link("germination_id", ("seed_id",)),
+    Seed.__tablename__: Link("seed_id", ("yield_id",)),
+    Yield.__tablename__: Link("yield_id", ("plant_id", "cross_id")),
+    PlantPlantCross.__tablename__: Link("cross_id", ("plant_id", "cross_id")),
+}
+
+# IN lists are sent in chunks of this size
+CHUNK_SIZE = 500
+
+
+def chunks(ids: Iterable[int]) -> Iterable[List[int]]:
+    ids = sorted(ids)
+    for start in range(0, len(ids), CHUNK_SIZE):
+        yield ids[start:start + CHUNK_SIZE]
+
+
+def plants_linked_through(db: Session, table_name: str, keys: Set[int]) -> Set[int]:
+    """
+    The plants whose parents are found through the rows of table_name with these keys.
+    """
+    if table_name == Plant.__tablename__:
+        return set(keys)
+    stmt = select(Plant.plant_id).join(Germination, Germination.germination_id == Plant.germination_id)
+    if table_name == Germination.__tablename__:
+        column = Germination.germination_id
+    else:
+        stmt = stmt.join(Seed, Seed.seed_id == Germination.seed_id)
+        if table_name == Seed.__tablename__:
+            column = Seed.seed_id
+        else:
+            stmt = stmt.join(Yield, Yield.yield_id == Seed.yield_id)
+            column = Yield.yield_id if table_name == Yield.__tablename__ else Yield.cross_id
+    plants = set()
+    for chunk in chunks(keys):
+        plants.update(db.scalars(stmt.where(column.in_(chunk))))
+    return plants
+
+
+def origins(db: Session, plant_ids: Optional[Set[int]] = None) -> Dict[int, Tuple[Optional[int], List[int]]]:
+    """
+    For each plant, the plant that bore the yield its seed came from and the plants of that yield's cross, in one
+    query per chunk of plants, or in one query for every plant if plant_ids is None.
+    """
+    origin = (select(Plant.plant_id, Yield.plant_id, PlantPlantCross.plant_id)
+              .select_from(Plant)
+              .outerjoin(Germination, Germination.germination_id == Plant.germination_id)
+              .outerjoin(Seed, Seed.seed_id == Germination.seed_id)
+              .outerjoin(Yield, Yield.yield_id == Seed.yield_id)
+              .outerjoin(PlantPlantCross, PlantPlantCross.cross_id == Yield.cross_id)
+              .order_by(Plant.plant_id, PlantPlantCross.plant_id))
+    found = {}
+    for chunk in ([None] if plant_ids is None else chunks(plant_ids)):
+        query = origin if chunk is None else origin.where(Plant.plant_id.in_(chunk))
+        for plant_id, bearer, crossed in db.execute(query):
+            _, crossed_plants = found.setdefault(plant_id, (bearer, []))
+            if crossed is not None:
+                crossed_plants.append(crossed)
+    return found
+
+
+def parents_of(db: Session, plant_ids: Set[int]) -> Dict[int, Set[int]]:
+    parents = defaultdict(set)
+    for plant_id, (bearer, crossed) in origins(db, plant_ids).items():
+        parents[plant_id].update({bearer, *crossed} - {None, plant_id})
+    return parents
+
+
+def descendants_of(db: Session, plant_ids: Set[int]) -> Set[int]:
+    descendants = set()
+    for chunk in chunks(plant_ids):
+        descendants.update(db.scalars(select(PlantLineage.descendant_id).where(PlantLineage.ancestor_id.in_(chunk))))
+    return descendants
+
+
+def stored_ancestors(db: Session, plant_ids: Set[int]) -> Dict[int, Dict[int, Tuple[int, str]]]:
+    ancestors = defaultdict(dict)
+    for chunk in chunks(plant_ids):
+        rows = db.execute(select(PlantLineage.descendant_id, PlantLineage.ancestor_id, PlantLineage.depth,
+                                 PlantLineage.path).where(PlantLineage.descendant_id.in_(chunk)))
+        for descendant_id, ancestor_id, depth, path in rows:
+            ancestors[descendant_id][ancestor_id] = (depth, path)
+    return ancestors
+
+
+def topological_order(plant_ids: Set[int], parents: Dict[int, Set[int]]) -> List[int]:
+    """
+    The plants with every parent before its children. Plants caught in a cycle, which only bad data can make, come
+    last, in id order.
+    """
+    waiting = {plant_id: len(parents[plant_id] & plant_ids) for plant_id in plant_ids}
+    children = defaultdict(list)
+    for plant_id in plant_ids:
+        for parent_id in parents[plant_id] & plant_ids:
+            children[parent_id].append(plant_id)
+    ready = sorted(plant_id for plant_id, count in waiting.items() if count == 0)
+    order = []
+    while ready:
+        plant_id = ready.pop()
+        order.append(plant_id)
+        for child in children[plant_id]:
+            waiting[child] -= 1
+            if waiting[child] == 0:
+                ready.append(child)
+    placed = set(order)
+    return order + sorted(plant_id for plant_id in plant_ids if plant_id not in placed)
+
+
+def refresh(db: Session, plant_ids: Set[int], descendants: bool = True):
+    """
+    Recomputes the closure rows of these plants and, unless told otherwise, of all their descendants.
+    """
+    stale = set(plant_ids)
+    if descendants:
+        stale |= descendants_of(db, stale)
+    if not stale:
+        return
+    for chunk in chunks(stale):
+        db.execute(delete(PlantLineage).where(PlantLineage.descendant_id.in_(chunk)))
+    existing = set()
+    for chunk in chunks(stale):
+        existing.update(db.scalars(select(Plant.plant_id).where(Plant.plant_id.in_(chunk))))
+    parents = parents_of(db, existing)
+    # Ancestors of parents outside the recomputed set are already correct in the table
+    outside = set().union(*parents.values()) - existing
+    ancestors = stored_ancestors(db, outside)
+    rows = []
+    for plant_id in topological_order(existing, parents):
+        closure = {}
+        for parent_id in sorted(parents[plant_id]):
+            candidates = [(parent_id, 1, f"{parent_id}/{plant_id}")]
+            candidates += [(ancestor_id, depth + 1, f"{path}/{plant_id}")
+                           for ancestor_id, (depth, path) in ancestors[parent_id].items()]
+            for ancestor_id, depth, path in candidates:
+                if ancestor_id != plant_id and (ancestor_id not in closure or depth < closure[ancestor_id][0]):
+                    closure[ancestor_id] = (depth, path)
+        ancestors[plant_id] = closure
+        rows += [{"ancestor_id": ancestor_id, "descendant_id": plant_id, "depth": depth, "path": path}
+                 for ancestor_id, (depth, path) in closure.items()]
+    for start in range(0, len(rows), CHUNK_SIZE):
+        db.execute(insert(PlantLineage), rows[start:start + CHUNK_SIZE])
+
+
+def relatives(plant_id: int, direction: str, max_depth: Optional[int] = None) -> Select:
+    """
+    The plant's ancestors or descendants, with their depth and path, nearest first: one indexed query at any depth.
+    """
+    if direction == "ancestors":
+        stmt = select(PlantLineage.ancestor_id.label("plant_id"), PlantLineage.depth, PlantLineage.path) \
+            .where(PlantLineage.descendant_id == plant_id)
+    else:
+        stmt = select(PlantLineage.descendant_id.label("plant_id"), PlantLineage.depth, PlantLineage.path) \
+            .where(PlantLineage.ancestor_id == plant_id)
+    if max_depth is not None:
+        stmt = stmt.where(PlantLineage.depth <= max_depth)
+    return stmt.order_by(PlantLineage.depth, "plant_id")
+
+
+def rebuild(db: Session):
+    """
+    Recomputes the whole table from the pedigree, for repair.
+    """
+    db.execute(delete(PlantLineage))
+    refresh(db, set(db.scalars(select(Plant.plant_id))), descendants=False)
+    db.commit()
+
+
+def relinked(table_name: str, before: List[dict], after: List[dict]) -> List[dict]:
+    """
+    The written rows, as they were and as they are, of every row inserted, deleted or with a changed link. Other
+    edits, such as comments, leave the pedigree alone.
+    """
+    pk_name = schema.Base.metadata.tables[table_name].primary_key.columns.values()[0].name
+    old = {row[pk_name]: row for row in before}
+    new = {row[pk_name]: row for row in after}
+    rows = []
+    for pk_value in old.keys() | new.keys():
+        was, now = old.get(pk_value), new.get(pk_value)
+        if was is None or now is None or any(was.get(column) != now.get(column)
+                                             for column in LINKS[table_name].columns):
+            rows += [row for row in (was, now) if row is not None]
+    return rows
+
+
+@crud.on_write(*LINKS, derived=(PlantLineage.__tablename__,))
+def on_pedigree_write(db: Session, table_name: str, before: List[dict], after: List[dict]):
+    key = LINKS[table_name].key
+    keys = {row[key] for row in relinked(table_name, before, after) if row.get(key) is not None}
+    if keys:
+        refresh(db, plants_linked_through(db, table_name, keys))
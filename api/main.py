@@ -1,422 +1,567 @@
 import logging
 import os
-from typing import List, Union
+from typing import List, Literal, Optional, Tuple, Union
 
-import sqlparse
-from databases import Database
-from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, Depends, Header
+from fastapi import FastAPI, HTTPException, Body, Depends, Header, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.openapi.docs import get_swagger_ui_html
 from mangum import Mangum
-from sqlalchemy import create_engine, MetaData
-from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy import select
+from sqlalchemy.orm import Session
 from starlette import status
 
+import dossiers
+import growth as growth_analytics
+import lineage  # also registers the write hooks that keep plant_lineage current
 import models
+import openapi_document
+import pedigree
+import pedigree_graph
+import query_guard
+import query_pages
+import rollups  # noqa: F401 - registers the write hooks that keep germination_rollup current
+import saved_queries
 import schema
+import snapshot
+import sql_analysis
+import telemetry
+from cache import MISSING, cached_read, query_cache, read_cache, stamp
+from crud import BatchError, delete, run_batch, upsert
+from database import connect_database, connected_database, disconnect_database, get_engine, is_disconnect, \
+    load_local_env, new_session, ping, retry_on_disconnect
+from filters import DateRange, apply_filters
+from pagination import PageParams, decode_cursor, keyset_page, paginate
+from streaming import stream_sql, stream_select, wants_ndjson
+from validation import validate_select, validator_stats, verdict_cache
+from warmup import is_scheduled_event, warm
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-load_dotenv()
-print('loaded dotenv')
-
-DATABASE_URL = f"mysql+pymysql://{os.getenv('DB_USER')}:" \
-               f"{os.getenv('DB_PASSWORD')}@" \
-               f"{os.getenv('DB_HOST')}/{os.getenv('DB_NAME')}"
-
-metadata = MetaData()
-
-engine = create_engine(DATABASE_URL)
-metadata.create_all(engine)
-
-database = Database(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-print('created sessionmaker')
+load_local_env()
 
 apiGatewayEndpoint = "https://0ybnxa9zak.execute-api.us-east-2.amazonaws.com"
 
-app = FastAPI(servers=[{"url": apiGatewayEndpoint, "description": "AWS API Gateway"}], title="Plant Database API")
+# /openapi.json is served from the prebuilt document below instead of FastAPI's lazily generated one
+app = FastAPI(servers=[{"url": apiGatewayEndpoint, "description": "AWS API Gateway"}], title="Plant Database API",
+              openapi_url=None)
+
+_openapi_bytes = None
 
 
 # Dependency to get the database session
 def get_db():
-    db = SessionLocal()
+    db = new_session()
     try:
         yield db
     finally:
         db.close()
 
 
-@app.on_event("startup")
-async def startup():
-    await database.connect()
+# Dependency for the read endpoints: the async connection pool, so a slow query waits on the event loop instead of
+# holding a threadpool worker
+async def get_async_db():
+    return await connected_database()
+
+
+async def list_rows(request: Request, database, stmt, pk_column, page: PageParams):
+    """
+    List mode of the read endpoints: a keyset page by default, or every remaining row as NDJSON when the client
+    sends `Accept: application/x-ndjson` (limit still applies if given).
+    """
+    if wants_ndjson(request):
+        return stream_select(get_engine(), keyset_page(stmt, pk_column, page.limit, page.after))
+    return await paginate(database, stmt, pk_column, page)
 
 
 @app.on_event("shutdown")
 async def shutdown():
-    await database.disconnect()
+    await disconnect_database()
 
 
-@app.get("/", include_in_schema=False)
-async def root():
-    return {"message": "Hello World"}
+def openapi_bytes() -> bytes:
+    global _openapi_bytes
+    if _openapi_bytes is None:
+        _openapi_bytes = openapi_document.load(app)
+    return _openapi_bytes
 
 
-def get_api_key(api_key: str = Header(...)):
-    if api_key != os.getenv('API_KEY'):
-        raise HTTPException(status_code=400, detail="Invalid API Key")
-    return api_key
+@app.get("/openapi.json", include_in_schema=False)
+async def openapi_json():
+    return Response(content=openapi_bytes(), media_type="application/json")
 
 
-def has_subquery(parsed_query):
-    for token in parsed_query.tokens:
-        if isinstance(token, sqlparse.sql.Parenthesis):
-            subquery = token.get_real_name()
-            if subquery.strip().lower().startswith("select"):
-                return True
-    return False
+@app.get("/docs", include_in_schema=False)
+async def docs():
+    return get_swagger_ui_html(openapi_url="/openapi.json", title=app.title + " - Swagger UI")
 
 
-def is_select_only_subquery(subquery):
-    for token in subquery.tokens:
-        if isinstance(token, sqlparse.sql.Token) and token.value.lower() not in (
-                "select", "from", "where", "join", "left", "right", "inner", "outer"):
-            return False
-    return True
-
+@app.get("/", include_in_schema=False)
+async def root():
+    return {"message": "Hello World"}
 
-@app.post("/run_select_query/", openapi_extra={"x-openai-isConsequential": False}, operation_id="runSelectQuery")
-async def run_select_query(query: str, db: Session = Depends(get_db), api_key: str = Depends(get_api_key)):
-    # Parse the SQL query to check if it's a SELECT statement
-    parsed_query = sqlparse.parse(query)
 
-    # Check that the first token is a SELECT keyword
-    if not parsed_query:
-        raise HTTPException(status_code=400, detail="Invalid SQL query.")
+async def get_api_key(api_key: str = Header(...)):
+    if api_key != os.getenv('API_KEY'):
+        raise HTTPException(status_code=400, detail="Invalid API Key")
+    return api_key
 
-    first_token = parsed_query[0].tokens[0].value.lower()
-    if first_token != "select":
-        raise HTTPException(status_code=400, detail="Only SELECT statements are allowed.")
 
-    # Check for subqueries in the parsed query
-    if has_subquery(parsed_query[0]):
-        for subquery in parsed_query[0].get_sublists():
-            if not is_select_only_subquery(subquery):
-                raise HTTPException(status_code=400, detail="Subqueries must be SELECT-only.")
+@app.post("/run_select_query/", response_model=Union[models.QueryResult, List[models.SavedQuery]],
+          openapi_extra={"x-openai-isConsequential": False},
+          description="Runs a read-only SELECT. Returns at most a few hundred rows; if `truncated` is true, call "
+                      "again with the same query and `continuation_token` set to `next_token` for the next rows, "
+                      "or narrow the query with WHERE, GROUP BY or LIMIT. Without a query, runs the saved analytics "
+                      "query named in the body instead, which is faster than writing the SQL: "
+                      f"{', '.join(saved_queries.SAVED_QUERIES)}; with no name either, lists them with their "
+                      "parameters.",
+          operation_id="runSelectQuery")
+@retry_on_disconnect
+async def run_select_query(request: Request, query: Optional[str] = Query(None, description='The SELECT to run'),
+                           continuation_token: Optional[str] = Query(None, description='next_token from the '
+                                                                                       'previous response'),
+                           saved_query: Optional[models.SavedQueryRun] = Body(None),
+                           database=Depends(get_async_db), api_key: str = Depends(get_api_key)):
+    if query is None:
+        if saved_query is None or saved_query.name is None:
+            return saved_queries.catalog()
+        return await saved_queries.run(database, saved_query.name, saved_query.parameters)
+
+    # Check that it's a SELECT statement; repeats and most simple queries skip sqlparse
+    tokens = sql_analysis.tokenize(query)
+    validate_select(query, tokens)
+
+    # Repeats of a query, up to whitespace, comments and keyword case, are answered from the cache until one of the
+    # tables it reads is written to. NDJSON exports are always streamed from the database.
+    ndjson = wants_ndjson(request)
+    analysis = sql_analysis.analyze(query, tokens)
+    # Snapshot results go stale on their own schedule, so they aren't cached here
+    on_snapshot = snapshot.ENABLED and not ndjson
+    cacheable = analysis.tables is not None and not ndjson and not on_snapshot
+    key = (analysis.fingerprint, continuation_token)
+    if cacheable:
+        result = query_cache.get(key, analysis.tables)
+        if result is not MISSING:
+            return result
+        versions = stamp(analysis.tables)
 
     # Execute the query safely
     try:
-        result = db.execute(query).fetchall()
-        return result
+        if ndjson:
+            # Refuse queries EXPLAIN says are too expensive, and cap how long the rest may run
+            return stream_sql(get_engine(), await query_guard.guard(database, query, tokens))
+        result = None
+        if on_snapshot:
+            try:
+                result = await run_in_threadpool(snapshot.snapshot.run_page, query, tokens, analysis.fingerprint,
+                                                 continuation_token)
+            except snapshot.SnapshotQueryError as e:
+                if "not authorized" in str(e):
+                    raise HTTPException(status_code=400, detail="Only reads are allowed.")
+                # Most likely MySQL-only syntax or functions: run it on the live database instead
+                logger.info("falling back to the live database: %s", e)
+        if result is None:
+            # One bounded page, also while this container has no snapshot yet; run_page applies the same guard to
+            # the limited query
+            result = await query_pages.run_page(database, query, tokens, analysis.fingerprint, continuation_token)
+    except HTTPException:
+        raise
     except Exception as e:
+        # A lost connection is retried by retry_on_disconnect; any other error is the query's fault
+        if is_disconnect(e):
+            raise
+        if isinstance(e, TimeoutError) or query_guard.is_timeout(e):
+            raise HTTPException(status_code=400, detail=f"Query cancelled after {query_guard.TIMEOUT_MS} ms. Filter "
+                                                        f"on indexed columns or split it into smaller queries.")
         raise HTTPException(status_code=400, detail=str(e))
+    if cacheable:
+        query_cache.put(key, versions, result)
+    return result
 
 
 # READ seeds
-@app.get("/seeds/{seed_id}", response_model=Union[List[models.Seed], models.Seed],
+@app.get("/seeds/{seed_id}", response_model=Union[models.Page[models.Seed], models.Seed],
          openapi_extra={"x-openai-isConsequential": False},
-         description="Returns a list of seeds if no seed_id (or 0) is specified, otherwise returns a single seed.",
+         description="Returns a page of seeds if no seed_id (or 0) is specified, otherwise returns a single seed.",
          operation_id="readSeed")
-def read_seed(seed_id: int, db: Session = Depends(get_db), api_key: str = Depends(get_api_key)):
+@cached_read(schema.Seed.__tablename__)
+@retry_on_disconnect
+async def read_seed(seed_id: int, request: Request, page: PageParams = Depends(), database=Depends(get_async_db),
+                    api_key: str = Depends(get_api_key)):
     if not seed_id:
-        return db.query(schema.Seed).all()
+        return await list_rows(request, database, select(schema.Seed), schema.Seed.seed_id, page)
     else:
-        seed = db.query(schema.Seed).filter(schema.Seed.seed_id == seed_id).first()
+        seed = await database.fetch_one(select(schema.Seed).where(schema.Seed.seed_id == seed_id))
         if seed is None:
             raise HTTPException(status_code=404, detail="Seed not found")
         return seed
 
 
 # INSERT/UPDATE a new seed
-@app.post("/seeds/", response_model=models.Seed, status_code=status.HTTP_201_CREATED,
+@app.post("/seeds/", response_model=Union[List[models.Seed], models.Seed],
+          status_code=status.HTTP_201_CREATED,
+          description="Creates or updates a seed. Also accepts a JSON array of seeds, which are written in one "
+                      "transaction and returned in the same order with their ids.",
           openapi_extra={"x-openai-isConsequential": True}, operation_id="upsertSeed")
-def upsert_seed(seed: models.Seed, db: Session = Depends(get_db), api_key: str = Depends(get_api_key)):
-    db_seed = db.query(schema.Seed).filter(schema.Seed.seed_id == seed.seed_id).first()
-    if db_seed is None:
-        db_seed = schema.Seed(**seed.dict())
-        db.add(db_seed)
-        db.commit()
-        db.refresh(db_seed)
-        return db_seed
-    else:
-        for key, value in seed.dict().items():
-            setattr(db_seed, key, value)
-        db.commit()
-        return db_seed
+def upsert_seed(seed: Union[List[models.Seed], models.Seed], db: Session = Depends(get_db),
+                api_key: str = Depends(get_api_key)):
+    return upsert(db, schema.Seed, seed)
 
 
 # DELETE a seed by ID
 @app.delete("/seeds/{seed_id}", response_model=models.Seed, openapi_extra={"x-openai-isConsequential": True},
             operation_id="deleteSeed")
 def delete_seed(seed_id: int, db: Session = Depends(get_db), api_key: str = Depends(get_api_key)):
-    seed = db.query(schema.Seed).filter(schema.Seed.seed_id == seed_id).first()
+    seed = delete(db, schema.Seed, seed_id)
     if seed is None:
         raise HTTPException(status_code=404, detail="Seed not found")
-    db.delete(seed)
-    db.commit()
     return seed
 
 
 # READ germinations
-@app.get("/germinations/{germination_id}", response_model=Union[List[models.Germination], models.Germination],
-         description="Returns all germinations if no germination_id (or 0) is specified, otherwise returns a single germination",
+@app.get("/germinations/{germination_id}",
+         response_model=Union[models.Page[models.Germination], models.Germination, List[models.GerminationRollup]],
+         description="Returns a page of germinations if no germination_id (or 0) is specified, otherwise returns a single germination. "
+                     "With rollups=true, returns germination totals, success rate and median days to germinate per "
+                     "species, variety and method instead, best success rate first; with per_seed=true, per seed and "
+                     "method. Use it to compare germination methods.",
          openapi_extra={"x-openai-isConsequential": False}, operation_id="readGermination")
-def read_germination(germination_id: int, db: Session = Depends(get_db), api_key: str = Depends(get_api_key)):
+@cached_read(schema.Germination.__tablename__,
+             related=lambda kwargs: (schema.GerminationRollup.__tablename__,) if kwargs["rollups"] else ())
+@retry_on_disconnect
+async def read_germination(germination_id: int, request: Request,
+                           seed_id: Optional[int] = Query(None, description='List mode or rollups only: germinations '
+                                                                            'of this seed'),
+                           dates: DateRange = Depends(), page: PageParams = Depends(),
+                           rollups: bool = Query(False, description='Totals per variety and method instead of '
+                                                                    'germinations'),
+                           per_seed: bool = Query(False, description='With rollups, per seed rather than per variety'),
+                           species: Optional[str] = Query(None, description='With rollups, only this species'),
+                           variety: Optional[str] = Query(None, description='With rollups, only this variety'),
+                           method: Optional[str] = Query(None, description='With rollups, only this method'),
+                           database=Depends(get_async_db), api_key: str = Depends(get_api_key)):
+    if rollups:
+        rollup = schema.GerminationRollup
+        stmt = select(rollup).where(rollup.seed_id.is_not(None) if per_seed or seed_id is not None
+                                    else rollup.seed_id.is_(None))
+        stmt = apply_filters(stmt, {rollup.species: species, rollup.variety: variety, rollup.method: method,
+                                    rollup.seed_id: seed_id})
+        return await database.fetch_all(stmt.order_by(rollup.success_rate.desc(), rollup.rollup_id))
     if not germination_id:
-        return db.query(schema.Germination).all()
+        stmt = apply_filters(select(schema.Germination), {schema.Germination.seed_id: seed_id},
+                             schema.Germination.planted_date, dates)
+        return await list_rows(request, database, stmt, schema.Germination.germination_id, page)
     else:
-        germination = db.query(schema.Germination).filter(
-            schema.Germination.germination_id == germination_id).first()
+        germination = await database.fetch_one(
+            select(schema.Germination).where(schema.Germination.germination_id == germination_id))
         if germination is None:
             raise HTTPException(status_code=404, detail="Germination not found")
         return germination
 
 
 # INSERT/UPDATE a new germination
-@app.post("/germinations/", response_model=models.Germination, status_code=status.HTTP_201_CREATED,
+@app.post("/germinations/", response_model=Union[List[models.Germination], models.Germination],
+          status_code=status.HTTP_201_CREATED,
+          description="Creates or updates a germination. Also accepts a JSON array of germinations, which are "
+                      "written in one transaction and returned in the same order with their ids.",
           openapi_extra={"x-openai-isConsequential": True}, operation_id="upsertGermination")
-def upsert_germination(germination: models.Germination, db: Session = Depends(get_db),
+def upsert_germination(germination: Union[List[models.Germination], models.Germination], db: Session = Depends(get_db),
                        api_key: str = Depends(get_api_key)):
-    db_germination = db.query(schema.Germination).filter(
-        schema.Germination.germination_id == germination.germination_id).first()
-    if db_germination is None:
-        db_germination = schema.Germination(**germination.dict())
-        db.add(db_germination)
-        db.commit()
-        db.refresh(db_germination)
-        return db_germination
-    else:
-        for key, value in germination.dict().items():
-            setattr(db_germination, key, value)
-        db.commit()
-        return db_germination
+    return upsert(db, schema.Germination, germination)
 
 
 # DELETE a germination by ID
 @app.delete("/germinations/{germination_id}", response_model=models.Germination,
             openapi_extra={"x-openai-isConsequential": True}, operation_id="deleteGermination")
 def delete_germination(germination_id: int, db: Session = Depends(get_db), api_key: str = Depends(get_api_key)):
-    germination = db.query(schema.Germination).filter(schema.Germination.germination_id == germination_id).first()
+    germination = delete(db, schema.Germination, germination_id)
     if germination is None:
         raise HTTPException(status_code=404, detail="Germination not found")
-    db.delete(germination)
-    db.commit()
     return germination
 
 
+def one_view(**views):
+    """
+    Raises a 400 if a read asks for more than one of its alternative views.
+    """
+    chosen = [name for name, value in views.items() if value]
+    if len(chosen) > 1:
+        raise HTTPException(status_code=400, detail=f"Ask for one of {', '.join(views)} at a time.")
+
+
+def plant_view_tables(kwargs) -> Tuple[str, ...]:
+    # The tables a readPlant view reads besides plants, for caching
+    if kwargs["dossier"]:
+        return dossiers.TABLES
+    if kwargs["graph"]:
+        return pedigree_graph.TABLES
+    if kwargs["relatives"]:
+        return (schema.PlantLineage.__tablename__,)
+    if kwargs["kinship"]:
+        return pedigree.TABLES
+    return ()
+
+
+async def pedigree_tree(plant_id: Optional[int], direction: str, depth: Optional[int], max_nodes: int, format: str):
+    # Every render shares one bulk read of the graph until a pedigree table is written to
+    graph = read_cache.get(("pedigree_graph",), pedigree_graph.TABLES)
+    if graph is MISSING:
+        versions = stamp(pedigree_graph.TABLES)
+        graph = await run_in_threadpool(pedigree_graph.read)
+        read_cache.put(("pedigree_graph",), versions, graph)
+    root = None
+    if plant_id is not None:
+        root = f"plant:{plant_id}"
+        if root not in graph.nodes:
+            raise HTTPException(status_code=404, detail="Plant not found")
+    result = pedigree_graph.subgraph(graph, root, direction, depth, max_nodes)
+    if format == "dot":
+        return Response(content=pedigree_graph.to_dot(result), media_type="text/vnd.graphviz")
+    return result
+
+
 # READ plants
-@app.get("/plants/{plant_id}", response_model=Union[List[models.Plant], models.Plant],
-         description="Returns all plants if no plant_id (or 0) is specified, otherwise returns a single plant",
+@app.get("/plants/{plant_id}",
+         response_model=Union[models.Page[models.Plant], models.PlantDossier, models.Plant, List[models.Relative],
+                              models.Kinship, models.PedigreeGraph],
+         responses={200: {"content": {"text/vnd.graphviz": {}}}},
+         description="Returns a page of plants if no plant_id (or 0) is specified, otherwise returns a single plant. "
+                     "With dossier=true, the plant comes with its germination, seed, system, observations, taste "
+                     "tests, yields and crosses in one call. With relatives=ancestors, returns every ancestor of the "
+                     "plant instead (parents, grandparents and so on), or with relatives=descendants every plant "
+                     "bred from it, nearest first. Parents are the plant that bore the yield its seed came from and "
+                     "the plants of that yield's cross. With kinship=true, returns the inbreeding coefficient of "
+                     "the plant and of each of plant_ids, and the kinship of each pair; use it before planning a "
+                     "cross: the kinship of two plants is the inbreeding coefficient their offspring would have. "
+                     "With graph=json, returns the family tree around the plant, or the whole graph for plant_id 0, as "
+                     "nodes and edges: plants, crosses, yields and seeds, linked along the pedigree; relatives limits "
+                     "it to one side. With graph=dot the tree comes back as Graphviz DOT text.",
          openapi_extra={"x-openai-isConsequential": False}, operation_id="readPlant")
-def read_plant(plant_id: int, db: Session = Depends(get_db), api_key: str = Depends(get_api_key)):
+@cached_read(schema.Plant.__tablename__, related=plant_view_tables)
+@retry_on_disconnect
+async def read_plant(plant_id: int, request: Request, page: PageParams = Depends(),
+                     dossier: bool = Query(False, description='Include everything recorded about the plant'),
+                     section_limit: Optional[int] = Query(None, ge=1, description='With dossier, the most rows '
+                                                                                   'to return per list'),
+                     relatives: Optional[Literal["ancestors", "descendants"]] = Query(
+                         None, description="The plant's ancestors or descendants instead of the plant"),
+                     max_depth: Optional[int] = Query(None, ge=1, description='With relatives or graph, the most '
+                                                                              'plant generations to go'),
+                     kinship: bool = Query(False, description='Inbreeding and kinship instead of the plant'),
+                     plant_ids: Optional[List[int]] = Query(None, description='With kinship, the plants to compare '
+                                                                              'with this one'),
+                     graph: Optional[Literal["json", "dot"]] = Query(None, description='The family tree instead of '
+                                                                                       'the plant'),
+                     max_nodes: int = Query(200, ge=1, le=2000, description='With graph, the most nodes to return'),
+                     database=Depends(get_async_db), api_key: str = Depends(get_api_key)):
+    # With graph, relatives only picks the side of the tree
+    one_view(dossier=dossier, relatives=relatives and not graph, kinship=kinship, graph=graph)
+    if kinship:
+        # plant_id 0 compares plant_ids among themselves
+        compared = list(dict.fromkeys(([plant_id] if plant_id else []) + (plant_ids or [])))
+        if not compared:
+            raise HTTPException(status_code=400, detail="kinship needs a plant_id or plant_ids.")
+        # The matrix update is CPU-bound, so it runs in the threadpool
+        result = await run_in_threadpool(pedigree.read, compared)
+        if result is None:
+            raise HTTPException(status_code=404, detail="Plant not found")
+        return result
+    if graph:
+        return await pedigree_tree(plant_id or None, relatives or "both", max_depth, max_nodes, graph)
     if not plant_id:
-        return db.query(schema.Plant).all()
+        return await list_rows(request, database, select(schema.Plant), schema.Plant.plant_id, page)
+    elif dossier:
+        plant_dossier = await run_in_threadpool(dossiers.read, plant_id, section_limit)
+        if plant_dossier is None:
+            raise HTTPException(status_code=404, detail="Plant not found")
+        return plant_dossier
+    elif relatives:
+        rows = await database.fetch_all(lineage.relatives(plant_id, relatives, max_depth))
+        return [dict(row._mapping) for row in rows]
     else:
-        plant = db.query(schema.Plant).filter(schema.Plant.plant_id == plant_id).first()
+        plant = await database.fetch_one(select(schema.Plant).where(schema.Plant.plant_id == plant_id))
         if plant is None:
             raise HTTPException(status_code=404, detail="Plant not found")
         return plant
 
 
 # INSERT/UPDATE a new plant
-@app.post("/plants/", response_model=models.Plant, status_code=status.HTTP_201_CREATED,
+@app.post("/plants/", response_model=Union[List[models.Plant], models.Plant],
+          status_code=status.HTTP_201_CREATED,
+          description="Creates or updates a plant. Also accepts a JSON array of plants, which are written in "
+                      "one transaction and returned in the same order with their ids.",
           openapi_extra={"x-openai-isConsequential": True}, operation_id="upsertPlant")
-def upsert_plant(plant: models.Plant, db: Session = Depends(get_db), api_key: str = Depends(get_api_key)):
-    db_plant = db.query(schema.Plant).filter(schema.Plant.plant_id == plant.plant_id).first()
-    if db_plant is None:
-        db_plant = schema.Plant(**plant.dict())
-        db.add(db_plant)
-        db.commit()
-        db.refresh(db_plant)
-        return db_plant
-    else:
-        for key, value in plant.dict().items():
-            setattr(db_plant, key, value)
-        db.commit()
-        return db_plant
+def upsert_plant(plant: Union[List[models.Plant], models.Plant], db: Session = Depends(get_db),
+                 api_key: str = Depends(get_api_key)):
+    return upsert(db, schema.Plant, plant)
 
 
 # DELETE a plant by ID
 @app.delete("/plants/{plant_id}", response_model=models.Plant, openapi_extra={"x-openai-isConsequential": True},
             operation_id="deletePlant")
 def delete_plant(plant_id: int, db: Session = Depends(get_db), api_key: str = Depends(get_api_key)):
-    plant = db.query(schema.Plant).filter(schema.Plant.plant_id == plant_id).first()
+    plant = delete(db, schema.Plant, plant_id)
     if plant is None:
         raise HTTPException(status_code=404, detail="Plant not found")
-    db.delete(plant)
-    db.commit()
     return plant
 
 
 # READ yields
-@app.get("/yields/{yield_id}", response_model=Union[List[models.Yield], models.Yield],
-         description="Returns all yields if no yield_id (or 0) is specified, otherwise returns a single yield",
+@app.get("/yields/{yield_id}", response_model=Union[models.Page[models.Yield], models.Yield],
+         description="Returns a page of yields if no yield_id (or 0) is specified, otherwise returns a single yield",
          openapi_extra={"x-openai-isConsequential": False}, operation_id="readYield")
-def read_yield(yield_id: int, db: Session = Depends(get_db), api_key: str = Depends(get_api_key)):
+@cached_read(schema.Yield.__tablename__)
+@retry_on_disconnect
+async def read_yield(yield_id: int, request: Request,
+                     plant_id: Optional[int] = Query(None, description='List mode only: yields of this plant'),
+                     cross_id: Optional[int] = Query(None, description='List mode only: yields of this cross'),
+                     dates: DateRange = Depends(), page: PageParams = Depends(), database=Depends(get_async_db),
+                     api_key: str = Depends(get_api_key)):
     if not yield_id:
-        return db.query(schema.Yield).all()
+        stmt = apply_filters(select(schema.Yield), {schema.Yield.plant_id: plant_id, schema.Yield.cross_id: cross_id},
+                             schema.Yield.date, dates)
+        return await list_rows(request, database, stmt, schema.Yield.yield_id, page)
     else:
-        yield_ = db.query(schema.Yield).filter(schema.Yield.yield_id == yield_id).first()
+        yield_ = await database.fetch_one(select(schema.Yield).where(schema.Yield.yield_id == yield_id))
         if yield_ is None:
             raise HTTPException(status_code=404, detail="Yield not found")
         return yield_
 
 
 # INSERT/UPDATE a new yield
-@app.post("/yields/", response_model=models.Yield, status_code=status.HTTP_201_CREATED,
+@app.post("/yields/", response_model=Union[List[models.Yield], models.Yield],
+          status_code=status.HTTP_201_CREATED,
+          description="Creates or updates a yield. Also accepts a JSON array of yields, which are written in "
+                      "one transaction and returned in the same order with their ids.",
           openapi_extra={"x-openai-isConsequential": True}, operation_id="upsertYield")
-def upsert_yield(yield_: models.Yield, db: Session = Depends(get_db), api_key: str = Depends(get_api_key)):
-    db_yield = db.query(schema.Yield).filter(schema.Yield.yield_id == yield_.yield_id).first()
-    if db_yield is None:
-        db_yield = schema.Yield(**yield_.dict())
-        db.add(db_yield)
-        db.commit()
-        db.refresh(db_yield)
-        return db_yield
-    else:
-        for key, value in yield_.dict().items():
-            setattr(db_yield, key, value)
-        db.commit()
-        return db_yield
+def upsert_yield(yield_: Union[List[models.Yield], models.Yield], db: Session = Depends(get_db),
+                 api_key: str = Depends(get_api_key)):
+    return upsert(db, schema.Yield, yield_)
 
 
 # DELETE a yield by ID
 @app.delete("/yields/{yield_id}", response_model=models.Yield, openapi_extra={"x-openai-isConsequential": True},
             operation_id="deleteYield")
 def delete_yield(yield_id: int, db: Session = Depends(get_db), api_key: str = Depends(get_api_key)):
-    yield_ = db.query(schema.Yield).filter(schema.Yield.yield_id == yield_id).first()
+    yield_ = delete(db, schema.Yield, yield_id)
     if yield_ is None:
         raise HTTPException(status_code=404, detail="Yield not found")
-    db.delete(yield_)
-    db.commit()
     return yield_
 
 
 # READ plant_crosses
-@app.get("/plant_crosses/{cross_id}", response_model=Union[List[models.PlantCross], models.PlantCross],
-         description="Returns all plant_crosses if no cross_id (or 0) is specified, otherwise returns a single plant_cross",
+@app.get("/plant_crosses/{cross_id}", response_model=Union[models.Page[models.PlantCross], models.PlantCross],
+         description="Returns a page of plant_crosses if no cross_id (or 0) is specified, otherwise returns a single plant_cross",
          openapi_extra={"x-openai-isConsequential": False}, operation_id="readPlantCross")
-def read_plant_cross(cross_id: int, db: Session = Depends(get_db), api_key: str = Depends(get_api_key)):
+@cached_read(schema.PlantCross.__tablename__)
+@retry_on_disconnect
+async def read_plant_cross(cross_id: int, request: Request, page: PageParams = Depends(),
+                           database=Depends(get_async_db), api_key: str = Depends(get_api_key)):
     if not cross_id:
-        return db.query(schema.PlantCross).all()
+        return await list_rows(request, database, select(schema.PlantCross), schema.PlantCross.cross_id, page)
     else:
-        plant_cross = db.query(schema.PlantCross).filter(schema.PlantCross.cross_id == cross_id).first()
+        plant_cross = await database.fetch_one(select(schema.PlantCross).where(schema.PlantCross.cross_id == cross_id))
         if plant_cross is None:
             raise HTTPException(status_code=404, detail="PlantCross not found")
         return plant_cross
 
 
 # INSERT/UPDATE a new plant_cross
-@app.post("/plant_crosses/", response_model=models.PlantCross, status_code=status.HTTP_201_CREATED,
+@app.post("/plant_crosses/", response_model=Union[List[models.PlantCross], models.PlantCross],
+          status_code=status.HTTP_201_CREATED,
+          description="Creates or updates a plant cross. Also accepts a JSON array of plant crosses, which are "
+                      "written in one transaction and returned in the same order with their ids.",
           openapi_extra={"x-openai-isConsequential": True}, operation_id="upsertPlantCross")
-def upsert_plant_cross(plant_cross: models.PlantCross, db: Session = Depends(get_db),
+def upsert_plant_cross(plant_cross: Union[List[models.PlantCross], models.PlantCross], db: Session = Depends(get_db),
                        api_key: str = Depends(get_api_key)):
-    db_plant_cross = db.query(schema.PlantCross).filter(schema.PlantCross.cross_id == plant_cross.cross_id).first()
-    if db_plant_cross is None:
-        db_plant_cross = schema.PlantCross(**plant_cross.dict())
-        db.add(db_plant_cross)
-        db.commit()
-        db.refresh(db_plant_cross)
-        return db_plant_cross
-    else:
-        for key, value in plant_cross.dict().items():
-            setattr(db_plant_cross, key, value)
-        db.commit()
-        return db_plant_cross
+    return upsert(db, schema.PlantCross, plant_cross)
 
 
 # DELETE a plant_cross by ID
 @app.delete("/plant_crosses/{cross_id}", response_model=models.PlantCross,
             openapi_extra={"x-openai-isConsequential": True}, operation_id="deletePlantCross")
 def delete_plant_cross(cross_id: int, db: Session = Depends(get_db), api_key: str = Depends(get_api_key)):
-    plant_cross = db.query(schema.PlantCross).filter(schema.PlantCross.cross_id == cross_id).first()
+    plant_cross = delete(db, schema.PlantCross, cross_id)
     if plant_cross is None:
         raise HTTPException(status_code=404, detail="PlantCross not found")
-    db.delete(plant_cross)
-    db.commit()
     return plant_cross
 
 
 # READ plant_plant_crosses
-@app.get("/plant_plant_crosses/{id}", response_model=Union[List[models.PlantPlantCross], models.PlantPlantCross],
-         description="Returns all plant_plant_crosses if no id (or 0) is specified, otherwise returns a single plant_plant_cross",
+@app.get("/plant_plant_crosses/{id}", response_model=Union[models.Page[models.PlantPlantCross], models.PlantPlantCross],
+         description="Returns a page of plant_plant_crosses if no id (or 0) is specified, otherwise returns a single plant_plant_cross",
          openapi_extra={"x-openai-isConsequential": False}, operation_id="readPlantPlantCross")
-def read_plant_plant_cross(id: int, db: Session = Depends(get_db), api_key: str = Depends(get_api_key)):
+@cached_read(schema.PlantPlantCross.__tablename__)
+@retry_on_disconnect
+async def read_plant_plant_cross(id: int, request: Request, page: PageParams = Depends(),
+                                 database=Depends(get_async_db), api_key: str = Depends(get_api_key)):
     if not id:
-        return db.query(schema.PlantPlantCross).all()
+        return await list_rows(request, database, select(schema.PlantPlantCross), schema.PlantPlantCross.id, page)
     else:
-        plant_plant_cross = db.query(schema.PlantPlantCross).filter(schema.PlantPlantCross.id == id).first()
+        plant_plant_cross = await database.fetch_one(
+            select(schema.PlantPlantCross).where(schema.PlantPlantCross.id == id))
         if plant_plant_cross is None:
             raise HTTPException(status_code=404, detail="PlantPlantCross not found")
         return plant_plant_cross
 
 
 # INSERT/UPDATE a new plant_plant_cross
-@app.post("/plant_plant_crosses/", response_model=models.PlantPlantCross, status_code=status.HTTP_201_CREATED,
+@app.post("/plant_plant_crosses/", response_model=Union[List[models.PlantPlantCross], models.PlantPlantCross],
+          status_code=status.HTTP_201_CREATED,
+          description="Creates or updates a plant-plant cross entry. Also accepts a JSON array of plant-plant "
+                      "cross entries, which are written in one transaction and returned in the same order with "
+                      "their ids.",
           openapi_extra={"x-openai-isConsequential": True}, operation_id="upsertPlantPlantCross")
-def upsert_plant_plant_cross(plant_plant_cross: models.PlantPlantCross, db: Session = Depends(get_db),
-                             api_key: str = Depends(get_api_key)):
-    db_plant_plant_cross = db.query(schema.PlantPlantCross).filter(
-        schema.PlantPlantCross.id == plant_plant_cross.id).first()
-    if db_plant_plant_cross is None:
-        db_plant_plant_cross = schema.PlantPlantCross(**plant_plant_cross.dict())
-        db.add(db_plant_plant_cross)
-        db.commit()
-        db.refresh(db_plant_plant_cross)
-        return db_plant_plant_cross
-    else:
-        for key, value in plant_plant_cross.dict().items():
-            setattr(db_plant_plant_cross, key, value)
-        db.commit()
-        return db_plant_plant_cross
+def upsert_plant_plant_cross(plant_plant_cross: Union[List[models.PlantPlantCross], models.PlantPlantCross],
+                             db: Session = Depends(get_db), api_key: str = Depends(get_api_key)):
+    return upsert(db, schema.PlantPlantCross, plant_plant_cross)
 
 
-# DELETE a plant_plant_cross by ID
-@app.delete("/plant_plant_crosses/{id}", response_model=models.PlantPlantCross,
-            openapi_extra={"x-openai-isConsequential": True}, operation_id="deletePlantPlantCross")
+# DELETE a plant_plant_cross by ID. Left out of the GPT actions to stay within the operation limit; the GPT deletes
+# these through runBatch.
+@app.delete("/plant_plant_crosses/{id}", response_model=models.PlantPlantCross, include_in_schema=False)
 def delete_plant_plant_cross(id: int, db: Session = Depends(get_db), api_key: str = Depends(get_api_key)):
-    plant_plant_cross = db.query(schema.PlantPlantCross).filter(schema.PlantPlantCross.id == id).first()
+    plant_plant_cross = delete(db, schema.PlantPlantCross, id)
     if plant_plant_cross is None:
         raise HTTPException(status_code=404, detail="PlantPlantCross not found")
-    db.delete(plant_plant_cross)
-    db.commit()
     return plant_plant_cross
 
 
 # READ taste_tests
-@app.get("/taste_tests/{taste_test_id}", response_model=Union[List[models.TasteTest], models.TasteTest],
-         description="Returns all taste_tests if no taste_test_id (or 0) is specified, otherwise returns a single taste_test",
+@app.get("/taste_tests/{taste_test_id}", response_model=Union[models.Page[models.TasteTest], models.TasteTest],
+         description="Returns a page of taste_tests if no taste_test_id (or 0) is specified, otherwise returns a single taste_test",
          openapi_extra={"x-openai-isConsequential": False}, operation_id="readTasteTest")
-def read_taste_test(taste_test_id: int, db: Session = Depends(get_db), api_key: str = Depends(get_api_key)):
+@cached_read(schema.TasteTest.__tablename__)
+@retry_on_disconnect
+async def read_taste_test(taste_test_id: int, request: Request,
+                          plant_id: Optional[int] = Query(None, description='List mode only: taste tests of this plant'),
+                          dates: DateRange = Depends(), page: PageParams = Depends(), database=Depends(get_async_db),
+                          api_key: str = Depends(get_api_key)):
     if not taste_test_id:
-        return db.query(schema.TasteTest).all()
+        stmt = apply_filters(select(schema.TasteTest), {schema.TasteTest.plant_id: plant_id},
+                             schema.TasteTest.date, dates)
+        return await list_rows(request, database, stmt, schema.TasteTest.taste_test_id, page)
     else:
-        taste_test = db.query(schema.TasteTest).filter(schema.TasteTest.taste_test_id == taste_test_id).first()
+        taste_test = await database.fetch_one(
+            select(schema.TasteTest).where(schema.TasteTest.taste_test_id == taste_test_id))
         if taste_test is None:
             raise HTTPException(status_code=404, detail="TasteTest not found")
         return taste_test
 
 
 # INSERT/UPDATE a new taste_test
-@app.post("/taste_tests/", response_model=models.TasteTest, status_code=status.HTTP_201_CREATED,
+@app.post("/taste_tests/", response_model=Union[List[models.TasteTest], models.TasteTest],
+          status_code=status.HTTP_201_CREATED,
+          description="Creates or updates a taste test. Also accepts a JSON array of taste tests, which are "
+                      "written in one transaction and returned in the same order with their ids.",
           openapi_extra={"x-openai-isConsequential": True}, operation_id="upsertTasteTest")
-def upsert_taste_test(taste_test: models.TasteTest, db: Session = Depends(get_db), api_key: str = Depends(get_api_key)):
-    db_taste_test = db.query(schema.TasteTest).filter(
-        schema.TasteTest.taste_test_id == taste_test.taste_test_id).first()
-    if db_taste_test is None:
-        db_taste_test = schema.TasteTest(**taste_test.dict())
-        db.add(db_taste_test)
-        db.commit()
-        db.refresh(db_taste_test)
-        return db_taste_test
-    else:
-        for key, value in taste_test.dict().items():
-            setattr(db_taste_test, key, value)
-        db.commit()
-        return db_taste_test
+def upsert_taste_test(taste_test: Union[List[models.TasteTest], models.TasteTest], db: Session = Depends(get_db),
+                      api_key: str = Depends(get_api_key)):
+    return upsert(db, schema.TasteTest, taste_test)
 
 
-# Commented out to save space for the select query endpoint (30 endpoints is the limit)
+# Commented out to save space for the select query endpoint (30 endpoints is the limit, see
+# openapi_document.MAX_OPERATIONS); taste tests are deleted through runBatch
 # DELETE a taste_test by ID
 # @app.delete("/taste_tests/{taste_test_id}", response_model=models.TasteTest,
 #             openapi_extra={"x-openai-isConsequential": True}, operation_id="deleteTasteTest")
@@ -430,148 +575,203 @@ def upsert_taste_test(taste_test: models.TasteTest, db: Session = Depends(get_db
 
 
 # READ observations
-@app.get("/observations/{observation_id}", response_model=Union[List[models.Observation], models.Observation],
-         description="Returns all observations if no observation_id (or 0) is specified, otherwise returns a single observation",
+@app.get("/observations/{observation_id}",
+         response_model=Union[models.Page[models.Observation], models.Observation, models.Growth],
+         description="Returns a page of observations if no observation_id (or 0) is specified, otherwise returns a single observation. "
+                     "With growth=true, returns each plant's growth from its observations instead: height and leaf "
+                     "growth per day, a fitted S-curve and days until height reached milestone_cm, for up to limit "
+                     "plants per page. With cohort, also compares the means per variety, cross or hydroponic system.",
          openapi_extra={"x-openai-isConsequential": False}, operation_id="readObservation")
-def read_observation(observation_id: int, db: Session = Depends(get_db), api_key: str = Depends(get_api_key)):
+@cached_read(schema.Observation.__tablename__,
+             related=lambda kwargs: growth_analytics.TABLES if kwargs["growth"] else ())
+@retry_on_disconnect
+async def read_observation(observation_id: int, request: Request,
+                           plant_id: Optional[int] = Query(
+                               None, description='List mode or growth only: observations of this plant'),
+                           dates: DateRange = Depends(), page: PageParams = Depends(),
+                           growth: bool = Query(False, description='Growth per plant instead of observations'),
+                           plant_ids: Optional[List[int]] = Query(None, description='With growth, only these plants; '
+                                                                                    'all if left out'),
+                           cohort: Optional[Literal["variety", "cross", "system"]] = Query(
+                               None, description='With growth, group plants by variety, cross or hydroponic system'),
+                           milestone_cm: float = Query(30.0, gt=0, description='With growth, the height milestone, '
+                                                                               'in cm'),
+                           database=Depends(get_async_db), api_key: str = Depends(get_api_key)):
+    if growth:
+        plants = (plant_ids or []) + ([plant_id] if plant_id is not None else [])
+        # The fits are NumPy over every observation, so they run in the threadpool
+        after = decode_cursor(page.after) if page.after else None
+        return await run_in_threadpool(growth_analytics.read, plants or None, cohort, milestone_cm, page.size, after)
     if not observation_id:
-        return db.query(schema.Observation).all()
+        stmt = apply_filters(select(schema.Observation), {schema.Observation.plant_id: plant_id},
+                             schema.Observation.date, dates)
+        return await list_rows(request, database, stmt, schema.Observation.observation_id, page)
     else:
-        observation = db.query(schema.Observation).filter(
-            schema.Observation.observation_id == observation_id).first()
+        observation = await database.fetch_one(
+            select(schema.Observation).where(schema.Observation.observation_id == observation_id))
         if observation is None:
             raise HTTPException(status_code=404, detail="Observation not found")
         return observation
 
 
 # INSERT/UPDATE a new observation
-@app.post("/observations/", response_model=models.Observation, status_code=status.HTTP_201_CREATED,
+@app.post("/observations/", response_model=Union[List[models.Observation], models.Observation],
+          status_code=status.HTTP_201_CREATED,
+          description="Creates or updates a observation. Also accepts a JSON array of observations, which are "
+                      "written in one transaction and returned in the same order with their ids.",
           openapi_extra={"x-openai-isConsequential": True}, operation_id="upsertObservation")
-def upsert_observation(observation: models.Observation, db: Session = Depends(get_db),
+def upsert_observation(observation: Union[List[models.Observation], models.Observation], db: Session = Depends(get_db),
                        api_key: str = Depends(get_api_key)):
-    db_observation = db.query(schema.Observation).filter(
-        schema.Observation.observation_id == observation.observation_id).first()
-    if db_observation is None:
-        db_observation = schema.Observation(**observation.dict())
-        db.add(db_observation)
-        db.commit()
-        db.refresh(db_observation)
-        return db_observation
-    else:
-        for key, value in observation.dict().items():
-            setattr(db_observation, key, value)
-        db.commit()
-        return db_observation
+    return upsert(db, schema.Observation, observation)
 
 
 # DELETE an observation by ID
 @app.delete("/observations/{observation_id}", response_model=models.Observation,
             openapi_extra={"x-openai-isConsequential": True}, operation_id="deleteObservation")
 def delete_observation(observation_id: int, db: Session = Depends(get_db), api_key: str = Depends(get_api_key)):
-    observation = db.query(schema.Observation).filter(schema.Observation.observation_id == observation_id).first()
+    observation = delete(db, schema.Observation, observation_id)
     if observation is None:
         raise HTTPException(status_code=404, detail="Observation not found")
-    db.delete(observation)
-    db.commit()
     return observation
 
 
 # READ hydroponic_systems
 @app.get("/hydroponic_systems/{system_id}",
-         response_model=Union[List[models.HydroponicSystem], models.HydroponicSystem],
-         description="Returns all hydroponic_systems if no system_id (or 0) is specified, otherwise returns a single hydroponic_system",
+         response_model=Union[models.Page[models.HydroponicSystem], models.HydroponicSystem],
+         description="Returns a page of hydroponic_systems if no system_id (or 0) is specified, otherwise returns a single hydroponic_system",
          openapi_extra={"x-openai-isConsequential": False}, operation_id="readHydroponicSystem")
-def read_hydroponic_system(system_id: int, db: Session = Depends(get_db), api_key: str = Depends(get_api_key)):
+@cached_read(schema.HydroponicSystem.__tablename__)
+@retry_on_disconnect
+async def read_hydroponic_system(system_id: int, request: Request, page: PageParams = Depends(),
+                                 database=Depends(get_async_db), api_key: str = Depends(get_api_key)):
     if not system_id:
-        return db.query(schema.HydroponicSystem).all()
+        return await list_rows(request, database, select(schema.HydroponicSystem), schema.HydroponicSystem.system_id,
+                               page)
     else:
-        hydroponic_system = db.query(schema.HydroponicSystem).filter(
-            schema.HydroponicSystem.system_id == system_id).first()
+        hydroponic_system = await database.fetch_one(
+            select(schema.HydroponicSystem).where(schema.HydroponicSystem.system_id == system_id))
         if hydroponic_system is None:
             raise HTTPException(status_code=404, detail="HydroponicSystem not found")
         return hydroponic_system
 
 
 # INSERT/UPDATE a new hydroponic_system
-@app.post("/hydroponic_systems/", response_model=models.HydroponicSystem, status_code=status.HTTP_201_CREATED,
+@app.post("/hydroponic_systems/", response_model=Union[List[models.HydroponicSystem], models.HydroponicSystem],
+          status_code=status.HTTP_201_CREATED,
+          description="Creates or updates a hydroponic system. Also accepts a JSON array of hydroponic systems,"
+                      " which are written in one transaction and returned in the same order with their ids.",
           openapi_extra={"x-openai-isConsequential": True}, operation_id="upsertHydroponicSystem")
-def upsert_hydroponic_system(hydroponic_system: models.HydroponicSystem, db: Session = Depends(get_db),
-                             api_key: str = Depends(get_api_key)):
-    db_hydroponic_system = db.query(schema.HydroponicSystem).filter(
-        schema.HydroponicSystem.system_id == hydroponic_system.system_id).first()
-    if db_hydroponic_system is None:
-        db_hydroponic_system = schema.HydroponicSystem(**hydroponic_system.dict())
-        db.add(db_hydroponic_system)
-        db.commit()
-        db.refresh(db_hydroponic_system)
-        return db_hydroponic_system
-    else:
-        for key, value in hydroponic_system.dict().items():
-            setattr(db_hydroponic_system, key, value)
-        db.commit()
-        return db_hydroponic_system
+def upsert_hydroponic_system(hydroponic_system: Union[List[models.HydroponicSystem], models.HydroponicSystem],
+                             db: Session = Depends(get_db), api_key: str = Depends(get_api_key)):
+    return upsert(db, schema.HydroponicSystem, hydroponic_system)
 
 
 # DELETE a hydroponic_system by ID
 @app.delete("/hydroponic_systems/{system_id}", response_model=models.HydroponicSystem,
             openapi_extra={"x-openai-isConsequential": True}, operation_id="deleteHydroponicSystem")
 def delete_hydroponic_system(system_id: int, db: Session = Depends(get_db), api_key: str = Depends(get_api_key)):
-    hydroponic_system = db.query(schema.HydroponicSystem).filter(
-        schema.HydroponicSystem.system_id == system_id).first()
+    hydroponic_system = delete(db, schema.HydroponicSystem, system_id)
     if hydroponic_system is None:
         raise HTTPException(status_code=404, detail="HydroponicSystem not found")
-    db.delete(hydroponic_system)
-    db.commit()
     return hydroponic_system
 
 
 # READ hydroponic_conditions
 @app.get("/hydroponic_conditions/{condition_id}",
-         response_model=Union[List[models.HydroponicCondition], models.HydroponicCondition],
-         description="Returns all hydroponic_conditions if no condition_id (or 0) is specified, otherwise returns a single hydroponic_condition",
+         response_model=Union[models.Page[models.HydroponicCondition], models.HydroponicCondition],
+         description="Returns a page of hydroponic_conditions if no condition_id (or 0) is specified, otherwise returns a single hydroponic_condition",
          openapi_extra={"x-openai-isConsequential": False}, operation_id="readHydroponicCondition")
-def read_hydroponic_condition(condition_id: int, db: Session = Depends(get_db), api_key: str = Depends(get_api_key)):
+@cached_read(schema.HydroponicCondition.__tablename__)
+@retry_on_disconnect
+async def read_hydroponic_condition(condition_id: int, request: Request,
+                                    system_id: Optional[int] = Query(None, description='List mode only: conditions of '
+                                                                                       'this hydroponic system'),
+                                    dates: DateRange = Depends(), page: PageParams = Depends(),
+                                    database=Depends(get_async_db), api_key: str = Depends(get_api_key)):
     if not condition_id:
-        return db.query(schema.HydroponicCondition).all()
+        stmt = apply_filters(select(schema.HydroponicCondition), {schema.HydroponicCondition.system_id: system_id},
+                             schema.HydroponicCondition.date, dates)
+        return await list_rows(request, database, stmt, schema.HydroponicCondition.condition_id, page)
     else:
-        hydroponic_condition = db.query(schema.HydroponicCondition).filter(
-            schema.HydroponicCondition.condition_id == condition_id).first()
+        hydroponic_condition = await database.fetch_one(
+            select(schema.HydroponicCondition).where(schema.HydroponicCondition.condition_id == condition_id))
         if hydroponic_condition is None:
             raise HTTPException(status_code=404, detail="HydroponicCondition not found")
         return hydroponic_condition
 
 
 # INSERT/UPDATE a new hydroponic_condition
-@app.post("/hydroponic_conditions/", response_model=models.HydroponicCondition, status_code=status.HTTP_201_CREATED,
+@app.post("/hydroponic_conditions/", response_model=Union[List[models.HydroponicCondition], models.HydroponicCondition],
+          status_code=status.HTTP_201_CREATED,
+          description="Creates or updates a hydroponic condition. Also accepts a JSON array of hydroponic "
+                      "conditions, which are written in one transaction and returned in the same order with "
+                      "their ids.",
           openapi_extra={"x-openai-isConsequential": True}, operation_id="upsertHydroponicCondition")
-def upsert_hydroponic_condition(hydroponic_condition: models.HydroponicCondition, db: Session = Depends(get_db),
-                                api_key: str = Depends(get_api_key)):
-    db_hydroponic_condition = db.query(schema.HydroponicCondition).filter(
-        schema.HydroponicCondition.condition_id == hydroponic_condition.condition_id).first()
-    if db_hydroponic_condition is None:
-        db_hydroponic_condition = schema.HydroponicCondition(**hydroponic_condition.dict())
-        db.add(db_hydroponic_condition)
-        db.commit()
-        db.refresh(db_hydroponic_condition)
-        return db_hydroponic_condition
-    else:
-        for key, value in hydroponic_condition.dict().items():
-            setattr(db_hydroponic_condition, key, value)
-        db.commit()
-        return db_hydroponic_condition
+def upsert_hydroponic_condition(hydroponic_condition: Union[List[models.HydroponicCondition], models.HydroponicCondition],
+                                db: Session = Depends(get_db), api_key: str = Depends(get_api_key)):
+    return upsert(db, schema.HydroponicCondition, hydroponic_condition)
 
 
 # DELETE a hydroponic_condition by ID
 @app.delete("/hydroponic_conditions/{condition_id}", response_model=models.HydroponicCondition,
             openapi_extra={"x-openai-isConsequential": True}, operation_id="deleteHydroponicCondition")
 def delete_hydroponic_condition(condition_id: int, db: Session = Depends(get_db), api_key: str = Depends(get_api_key)):
-    hydroponic_condition = db.query(schema.HydroponicCondition).filter(
-        schema.HydroponicCondition.condition_id == condition_id).first()
+    hydroponic_condition = delete(db, schema.HydroponicCondition, condition_id)
     if hydroponic_condition is None:
         raise HTTPException(status_code=404, detail="HydroponicCondition not found")
-    db.delete(hydroponic_condition)
-    db.commit()
     return hydroponic_condition
 
 
-handler = Mangum(app)
+# Bulk sensor readings into hydroponic_conditions; see telemetry.py for the columnar format. Not a GPT action.
+@app.post("/telemetry/hydroponic_conditions/", status_code=status.HTTP_201_CREATED, include_in_schema=False)
+async def ingest_hydroponic_telemetry(request: Request, api_key: str = Depends(get_api_key)):
+    # The body is parsed and checked as columns rather than a model per reading, in the threadpool with the write
+    return await run_in_threadpool(telemetry.receive, await request.body())
+
+
+# Run several writes in one transaction
+@app.post("/batch/", response_model=models.BatchResult, openapi_extra={"x-openai-isConsequential": True},
+          description="Runs a list of upserts and deletes in order, in one transaction. Use it for multi-step entries "
+                      "such as germination, then plant, then first observation; later operations can use \"$N\" "
+                      "for the id written by operation N. If any operation fails nothing is saved, and the error "
+                      "says which operation failed. Taste tests and plant-plant cross entries are deleted through "
+                      "it too.",
+          operation_id="runBatch")
+def batch(batch: models.Batch, db: Session = Depends(get_db), api_key: str = Depends(get_api_key)):
+    try:
+        return {"results": run_batch(db, batch.operations)}
+    except BatchError as e:
+        raise HTTPException(status_code=400, detail={"failed_operation": e.index, "error": e.message})
+
+
+# Hit rates of the in-process response caches, for tuning CACHE_MAX_ENTRIES and CACHE_TTL. Not a GPT action.
+@app.get("/cache_stats", include_in_schema=False)
+async def cache_stats(api_key: str = Depends(get_api_key)):
+    return {"reads": read_cache.stats(), "queries": query_cache.stats(),
+            "validation": {**verdict_cache.stats(), **validator_stats}}
+
+
+def warm_sql_validator():
+    import sqlparse
+    sqlparse.parse("SELECT 1 FROM plants WHERE plant_id IN (SELECT 1)")
+
+
+# What the keep-warm ping prepares: live connections in both pools, the OpenAPI document ChatGPT fetches, and the
+# lazily imported SQL parser with its compiled lexer
+WARMUP_STEPS = [
+    ("database", ping),
+    ("async_database", connect_database),
+    ("openapi", openapi_bytes),
+    ("sql_validator", warm_sql_validator),
+    ("analytics_snapshot", snapshot.warm),
+]
+
+# Lifespan events are left to uvicorn: Mangum would otherwise run startup and shutdown around every invocation
+asgi_handler = Mangum(app, lifespan="off")
+
+
+def handler(event, context):
+    # Scheduled keep-warm pings are answered here, before Mangum, which can't handle them
+    if is_scheduled_event(event):
+        return warm(WARMUP_STEPS)
+    return asgi_handler(event, context)
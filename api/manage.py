@@ -0,0 +1,85 @@
+"""
+Build and maintenance commands. Run from the api directory:
+
+    python manage.py openapi            render openapi.json from the live routes
+    python manage.py openapi --check    exit non-zero if openapi.json has drifted from the routes
+    python manage.py snapshot           rebuild the analytics snapshot from the database
+    python manage.py lineage            rebuild the plant_lineage closure table from the pedigree
+    python manage.py rollups            rebuild the germination_rollup table from germination
+"""
+import argparse
+import sys
+
+
+def openapi(args) -> int:
+    import openapi_document
+    from main import app
+
+    if args.check:
+        if openapi_document.drift(app):
+            print(f"{openapi_document.OPENAPI_PATH} is out of date, run `python manage.py openapi`", file=sys.stderr)
+            return 1
+        return 0
+    with open(openapi_document.OPENAPI_PATH, "w", encoding="utf-8") as f:
+        f.write(openapi_document.render(app))
+    print(f"wrote {openapi_document.OPENAPI_PATH}")
+    return 0
+
+
+def rebuild_snapshot(args) -> int:
+    import snapshot
+
+    snapshot.snapshot.refresh(full=True)
+    print(f"wrote {snapshot.PATH}")
+    return 0
+
+
+def rebuild_lineage(args) -> int:
+    import lineage
+    from database import new_session
+
+    db = new_session()
+    try:
+        lineage.rebuild(db)
+    finally:
+        db.close()
+    print("rebuilt plant_lineage")
+    return 0
+
+
+def rebuild_rollups(args) -> int:
+    import rollups
+    from database import new_session
+
+    db = new_session()
+    try:
+        rollups.rebuild(db)
+    finally:
+        db.close()
+    print("rebuilt germination_rollup")
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    openapi_parser = commands.add_parser("openapi", help="render or check the static OpenAPI document")
+    openapi_parser.add_argument("--check", action="store_true", help="fail if openapi.json has drifted")
+    openapi_parser.set_defaults(func=openapi)
+
+    snapshot_parser = commands.add_parser("snapshot", help="rebuild the analytics snapshot")
+    snapshot_parser.set_defaults(func=rebuild_snapshot)
+
+    lineage_parser = commands.add_parser("lineage", help="rebuild the plant_lineage closure table")
+    lineage_parser.set_defaults(func=rebuild_lineage)
+
+    rollups_parser = commands.add_parser("rollups", help="rebuild the germination_rollup table")
+    rollups_parser.set_defaults(func=rebuild_rollups)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
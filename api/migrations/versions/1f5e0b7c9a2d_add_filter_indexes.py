@@ -0,0 +1,44 @@
+"""add composite indexes for list filters
+
+Revision ID: 1f5e0b7c9a2d
+Revises: f419d6b5d118
+Create Date: 2024-03-09 14:12:31.527104
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '1f5e0b7c9a2d'
+down_revision: Union[str, None] = 'f419d6b5d118'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_observations_plant_id_date', 'observations', ['plant_id', 'date'], unique=False)
+    op.create_index('ix_taste_test_plant_id_date', 'taste_test', ['plant_id', 'date'], unique=False)
+    op.create_index('ix_yield_plant_id_date', 'yield', ['plant_id', 'date'], unique=False)
+    op.create_index('ix_yield_cross_id_date', 'yield', ['cross_id', 'date'], unique=False)
+    op.create_index('ix_hydroponic_conditions_system_id_date', 'hydroponic_conditions', ['system_id', 'date'],
+                    unique=False)
+    op.create_index('ix_germination_seed_id_planted_date', 'germination', ['seed_id', 'planted_date'], unique=False)
+
+
+def downgrade() -> None:
+    # MySQL drops the implicit foreign key indexes once the composite ones cover them, so the foreign keys need a
+    # plain index back before the composite ones can go.
+    op.create_index('ix_germination_seed_id', 'germination', ['seed_id'], unique=False)
+    op.drop_index('ix_germination_seed_id_planted_date', table_name='germination')
+    op.create_index('ix_hydroponic_conditions_system_id', 'hydroponic_conditions', ['system_id'], unique=False)
+    op.drop_index('ix_hydroponic_conditions_system_id_date', table_name='hydroponic_conditions')
+    op.create_index('ix_yield_cross_id', 'yield', ['cross_id'], unique=False)
+    op.drop_index('ix_yield_cross_id_date', table_name='yield')
+    op.create_index('ix_yield_plant_id', 'yield', ['plant_id'], unique=False)
+    op.drop_index('ix_yield_plant_id_date', table_name='yield')
+    op.create_index('ix_taste_test_plant_id', 'taste_test', ['plant_id'], unique=False)
+    op.drop_index('ix_taste_test_plant_id_date', table_name='taste_test')
+    op.create_index('ix_observations_plant_id', 'observations', ['plant_id'], unique=False)
+    op.drop_index('ix_observations_plant_id_date', table_name='observations')
@@ -0,0 +1,28 @@
+"""add hydroponic_conditions.recorded_at
+
+Revision ID: 3c8e1b6f4d27
+Revises: 9d3f5a7c2e41
+Create Date: 2024-04-06 10:12:37.518264
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '3c8e1b6f4d27'
+down_revision: Union[str, None] = '9d3f5a7c2e41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('hydroponic_conditions', sa.Column('recorded_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_hydroponic_conditions_system_id_recorded_at', 'hydroponic_conditions',
+                    ['system_id', 'recorded_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_hydroponic_conditions_system_id_recorded_at', table_name='hydroponic_conditions')
+    op.drop_column('hydroponic_conditions', 'recorded_at')
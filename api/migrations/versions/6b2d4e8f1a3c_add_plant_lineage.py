@@ -0,0 +1,39 @@
+"""add plant_lineage closure table
+
+Revision ID: 6b2d4e8f1a3c
+Revises: 1f5e0b7c9a2d
+Create Date: 2024-03-23 10:41:07.218334
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '6b2d4e8f1a3c'
+down_revision: Union[str, None] = '1f5e0b7c9a2d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Fill it afterwards with `python manage.py lineage`
+    op.create_table('plant_lineage',
+    sa.Column('ancestor_id', sa.Integer(), nullable=False),
+    sa.Column('descendant_id', sa.Integer(), nullable=False),
+    sa.Column('depth', sa.Integer(), nullable=False),
+    sa.Column('path', sa.String(length=1024), nullable=False),
+    sa.ForeignKeyConstraint(['ancestor_id'], ['plants.plant_id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['descendant_id'], ['plants.plant_id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('ancestor_id', 'descendant_id')
+    )
+    op.create_index('ix_plant_lineage_ancestor_id_depth', 'plant_lineage', ['ancestor_id', 'depth'], unique=False)
+    op.create_index('ix_plant_lineage_descendant_id_depth', 'plant_lineage', ['descendant_id', 'depth'],
+                    unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_plant_lineage_descendant_id_depth', table_name='plant_lineage')
+    op.drop_index('ix_plant_lineage_ancestor_id_depth', table_name='plant_lineage')
+    op.drop_table('plant_lineage')
@@ -0,0 +1,50 @@
+"""add germination_rollup table
+
+Revision ID: 9d3f5a7c2e41
+Revises: 6b2d4e8f1a3c
+Create Date: 2024-03-30 16:05:52.904117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '9d3f5a7c2e41'
+down_revision: Union[str, None] = '6b2d4e8f1a3c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Fill it afterwards with `python manage.py rollups`
+    op.create_table('germination_rollup',
+    sa.Column('rollup_id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('seed_id', sa.Integer(), nullable=True),
+    sa.Column('species', sa.String(length=255), nullable=True),
+    sa.Column('variety', sa.String(length=255), nullable=True),
+    sa.Column('method', sa.String(length=255), nullable=True),
+    sa.Column('sowings', sa.Integer(), nullable=False),
+    sa.Column('seeds_attempted', sa.Integer(), nullable=False),
+    sa.Column('seeds_successful', sa.Integer(), nullable=False),
+    sa.Column('success_rate', sa.Float(), nullable=True),
+    sa.Column('median_days', sa.Float(), nullable=True),
+    sa.Column('days_histogram', sa.Text(), nullable=False),
+    sa.Column('seed_key', sa.String(length=64), nullable=True),
+    sa.Column('variety_key', sa.String(length=64), nullable=True),
+    sa.ForeignKeyConstraint(['seed_id'], ['seeds.seed_id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('rollup_id'),
+    sa.UniqueConstraint('seed_key', name='uq_germination_rollup_seed_key'),
+    sa.UniqueConstraint('variety_key', name='uq_germination_rollup_variety_key')
+    )
+    op.create_index('ix_germination_rollup_seed_id_method', 'germination_rollup', ['seed_id', 'method'],
+                    unique=False)
+    op.create_index('ix_germination_rollup_species_variety_method', 'germination_rollup',
+                    ['species', 'variety', 'method'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_germination_rollup_species_variety_method', table_name='germination_rollup')
+    op.drop_index('ix_germination_rollup_seed_id_method', table_name='germination_rollup')
+    op.drop_table('germination_rollup')
@@ -1,8 +1,18 @@
-from datetime import date
-from typing import Optional
+from datetime import date, datetime
+from typing import Any, Dict, Generic, List, Literal, Optional, TypeVar
 
 from pydantic import BaseModel, Field
 
+T = TypeVar('T')
+
+
+class Page(BaseModel, Generic[T]):
+    """
+    One page of a list endpoint. Pass next_cursor as `after` to get the following page; it is null on the last page.
+    """
+    items: List[T] = Field(..., description='Items on this page')
+    next_cursor: Optional[str] = Field(None, description='Cursor for the next page, null if this is the last page')
+
 
 class Seed(BaseModel):
     """
@@ -125,9 +135,181 @@ class HydroponicCondition(BaseModel):
     condition_id: Optional[int] = Field(None, description='id')
     system_id: int = Field(..., description='System ID (FK)')
     date: date
+    recorded_at: Optional[datetime] = Field(None, description='Time of a sensor reading, UTC - Optional')
     water_ph: Optional[float] = Field(None, description='Water pH - Optional')
     electrical_conductivity_us_cm: Optional[float] = Field(None,
                                                            description='Electrical Conductivity (uS/cm) - Optional')
     water_temperature_f: Optional[float] = Field(None,
                                                  description='Water Temperature (F), convert to F if provided in C - Optional')
     comments: Optional[str] = Field(None, description='Comments - Optional')
+
+
+class BatchOperation(BaseModel):
+    """
+    One step of a batch. For "upsert" the payload is the item exactly as it would be posted to the resource; for
+    "delete" it is {"id": <id>}. Any payload value written as "$N" is replaced with the id of the item written by
+    operation N (counting from 0) of the same batch, e.g. {"germination_id": "$0"}.
+    """
+    resource: Literal["seeds", "germinations", "plants", "yields", "plant_crosses", "plant_plant_crosses",
+                      "taste_tests", "observations", "hydroponic_systems", "hydroponic_conditions"]
+    verb: Literal["upsert", "delete"]
+    payload: Dict[str, Any] = Field(..., description='Item to upsert, or {"id": <id>} to delete')
+
+
+class Batch(BaseModel):
+    """
+    Used to run several writes in one call and one transaction. If any operation fails, none of them are saved.
+    """
+    operations: List[BatchOperation] = Field(..., description='Operations, run in order')
+
+
+class BatchResult(BaseModel):
+    results: List[Dict[str, Any]] = Field(..., description='The written or deleted item of each operation, in order')
+
+
+class QueryResult(BaseModel):
+    """
+    One bounded page of a run_select_query result.
+    """
+    rows: List[Dict[str, Any]] = Field(..., description='Result rows, in the order the query returned them')
+    truncated: bool = Field(..., description='True if the result has more rows than were returned')
+    total: Optional[int] = Field(None, description='Total number of rows, null while the result is truncated')
+    next_token: Optional[str] = Field(None, description='Pass as continuation_token with the same query to get '
+                                                        'the next rows')
+    snapshot_age_seconds: Optional[float] = Field(None, description='Seconds since the analytics snapshot the query '
+                                                                    'ran on last took in new rows; null for live data')
+    snapshot_rebuilt_age_seconds: Optional[float] = Field(None, description='Seconds since that snapshot was last '
+                                                                            'rebuilt. Edits and deletes can be this '
+                                                                            'old; null for live data')
+
+
+class SavedQueryRun(BaseModel):
+    """
+    Used to run a saved query through runSelectQuery in place of SQL, or, without a name, to list them with their
+    parameters.
+    """
+    name: Optional[str] = Field(None, description='Saved query to run; leave out to list the saved queries')
+    parameters: Dict[str, Any] = Field({}, description='Parameter values by name, dates as YYYY-MM-DD')
+
+
+class SavedQueryParameter(BaseModel):
+    name: str
+    type: Literal["integer", "number", "string", "date"]
+    description: str
+    required: bool
+    default: Optional[Any] = None
+
+
+class SavedQuery(BaseModel):
+    name: str
+    description: str
+    parameters: List[SavedQueryParameter]
+
+
+class PlantDossier(Plant):
+    """
+    A plant with everything recorded about it. Lists are newest first.
+    """
+    germination: Optional[Germination] = Field(None, description='The germination the plant came from')
+    seed: Optional[Seed] = Field(None, description='The seed the plant was grown from')
+    system: Optional[HydroponicSystem] = Field(None, description='The hydroponic system the plant grows in')
+    observations: List[Observation] = Field(..., description='Observations of the plant')
+    taste_tests: List[TasteTest] = Field(..., description='Taste tests of its fruit')
+    yields: List[Yield] = Field(..., description='Its yields')
+    crosses: List[PlantCross] = Field(..., description='Crosses it took part in')
+    truncated: List[str] = Field(..., description='Sections cut short by section_limit')
+
+
+class Relative(BaseModel):
+    plant_id: int = Field(..., description='The ancestor or descendant')
+    depth: int = Field(..., description='Generations apart: 1 for a parent or child, 2 for a grandparent or '
+                                        'grandchild, and so on')
+    path: str = Field(..., description='Plant ids from the ancestor down to the descendant, separated by "/"')
+
+
+class Inbreeding(BaseModel):
+    plant_id: int
+    inbreeding: float = Field(..., description='Inbreeding coefficient: the probability that the two copies of a '
+                                               'gene in the plant are identical by descent, 0 for an outbred plant')
+
+
+class KinshipPair(BaseModel):
+    plant_id: int
+    other_id: int
+    kinship: float = Field(..., description='Kinship coefficient, which is also the inbreeding coefficient a child of '
+                                            'the two would have: 0.5 for selfing, 0.25 for full siblings, 0 for '
+                                            'unrelated plants')
+
+
+class Kinship(BaseModel):
+    plants: List[Inbreeding] = Field(..., description='Inbreeding coefficient of each plant')
+    pairs: List[KinshipPair] = Field(..., description='Kinship of each pair of plants')
+
+
+class GraphNode(BaseModel):
+    id: str = Field(..., description='"plant:7", "cross:3", "yield:12" or "seed:5"')
+    kind: Literal["plant", "cross", "yield", "seed"]
+    label: str
+
+    model_config = {"extra": "allow"}
+
+
+class GraphEdge(BaseModel):
+    source: str
+    target: str
+    label: str = Field(..., description='parent (plant to cross), bore (plant to yield), pollinated (cross to '
+                                        'yield), saved (yield to seed) or grown (seed to plant)')
+
+
+class PedigreeGraph(BaseModel):
+    nodes: List[GraphNode]
+    edges: List[GraphEdge]
+    truncated: bool = Field(..., description='True if nodes were left out to stay under max_nodes')
+
+
+class GerminationRollup(BaseModel):
+    seed_id: Optional[int] = Field(None, description='The seed, for per-seed rollups; null for per-variety rollups')
+    species: Optional[str] = None
+    variety: Optional[str] = None
+    method: Optional[str] = Field(None, description='Germination method')
+    sowings: int = Field(..., description='Germination attempts')
+    seeds_attempted: int
+    seeds_successful: int
+    success_rate: Optional[float] = Field(None, description='seeds_successful / seeds_attempted, 0-1')
+    median_days: Optional[float] = Field(None, description='Median days from planting to germination')
+
+
+class PlantGrowth(BaseModel):
+    plant_id: int
+    observations: int
+    first_observed: date
+    days_observed: float = Field(..., description='Days from the first to the last observation')
+    latest_height_cm: Optional[float] = None
+    growth_cm_per_day: Optional[float] = Field(None, description='Slope of a straight line fitted to height')
+    linear_r2: Optional[float] = Field(None, description='R² of the straight line, 0-1')
+    leaves_per_day: Optional[float] = Field(None, description='Slope of a straight line fitted to leaf count')
+    logistic_max_height_cm: Optional[float] = Field(None, description='Height the fitted S-curve levels off at')
+    logistic_rate: Optional[float] = Field(None, description='Growth rate of the S-curve, per day')
+    logistic_midpoint_day: Optional[float] = Field(None, description='Days after the first observation when the '
+                                                                     'S-curve grows fastest, at half its height')
+    logistic_r2: Optional[float] = Field(None, description='R² of the S-curve; null with under 3 heights')
+    days_to_milestone: Optional[float] = Field(None, description='Days from planting (or the first observation) '
+                                                                 'until height first reached milestone_cm')
+
+
+class GrowthCohort(BaseModel):
+    cohort: str = Field(..., description='Variety, "cross 3" or "system 2"')
+    plants: int
+    mean_growth_cm_per_day: Optional[float] = None
+    mean_leaves_per_day: Optional[float] = None
+    mean_logistic_max_height_cm: Optional[float] = None
+    mean_logistic_rate: Optional[float] = None
+    mean_days_to_milestone: Optional[float] = Field(None, description='Over the plants that reached it')
+
+
+class Growth(BaseModel):
+    plants: List[PlantGrowth] = Field(..., description='Per-plant growth, by plant_id')
+    truncated: bool = Field(..., description='True if more plants follow; pass next_cursor as after for them')
+    next_cursor: Optional[str] = Field(None, description='Cursor for the next plants, null on the last page')
+    cohorts: List[GrowthCohort] = Field(..., description='Means per cohort over every plant, if a cohort was asked '
+                                                         'for; on the first page only')
@@ -0,0 +1,39 @@
+import json
+import os
+
+# Rendered at build time by `python manage.py openapi` and shipped with the function
+OPENAPI_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "openapi.json")
+
+# ChatGPT actions accept at most this many operations
+MAX_OPERATIONS = 30
+
+
+def render(app) -> str:
+    """
+    The OpenAPI document exactly as FastAPI would generate it, including the servers entry and the
+    x-openai-isConsequential extras, formatted for a readable diff.
+    """
+    return json.dumps(app.openapi(), indent=2, ensure_ascii=False) + "\n"
+
+
+def load(app) -> bytes:
+    """
+    The pre-encoded document. Falls back to rendering from the live routes when the artifact hasn't been built,
+    e.g. when running from a fresh checkout.
+    """
+    try:
+        with open(OPENAPI_PATH, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return render(app).encode()
+
+
+def drift(app) -> bool:
+    """
+    True if the artifact is missing or no longer matches the live routes.
+    """
+    try:
+        with open(OPENAPI_PATH, encoding="utf-8") as f:
+            return json.load(f) != app.openapi()
+    except FileNotFoundError:
+        return True
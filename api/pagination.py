@@ -0,0 +1,88 @@
+import base64
+import binascii
+import json
+from typing import Optional
+
+from fastapi import HTTPException, Query
+from sqlalchemy import Select
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(last_id: int) -> str:
+    """
+    Turns the last primary key of a page into an opaque cursor string.
+    """
+    raw = json.dumps({"id": last_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    """
+    Reverses encode_cursor. Raises a 400 if the cursor was not produced by this API.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        last_id = json.loads(base64.urlsafe_b64decode(padded.encode()))["id"]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+    if not isinstance(last_id, int):
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+    return last_id
+
+
+class PageParams:
+    """
+    Query parameters shared by every list endpoint.
+    """
+
+    def __init__(self,
+                 limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE,
+                                              description=f'Maximum number of items to return (default '
+                                                          f'{DEFAULT_PAGE_SIZE})'),
+                 after: Optional[str] = Query(None, description='next_cursor from the previous page, omit for the '
+                                                                'first page')):
+        self.limit = limit
+        self.after = after
+
+    @property
+    def size(self) -> int:
+        return self.limit or DEFAULT_PAGE_SIZE
+
+
+def keyset_page(stmt: Select, pk_column, limit: Optional[int], after: Optional[str]) -> Select:
+    """
+    Restricts a SELECT to one keyset page: rows with a primary key greater than the cursor, in primary key order.
+    Without a limit every remaining row is selected, which is what the streaming export uses.
+    """
+    if after:
+        stmt = stmt.where(pk_column > decode_cursor(after))
+    stmt = stmt.order_by(pk_column)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+
+def build_page(rows: list, pk_name: str, limit: int) -> dict:
+    """
+    Trims the look-ahead row from a keyset page and works out the next cursor.
+    """
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = None
+    if has_more:
+        last = rows[-1]
+        last_id = last[pk_name] if isinstance(last, dict) else getattr(last, pk_name)
+        next_cursor = encode_cursor(last_id)
+    return {"items": rows, "next_cursor": next_cursor}
+
+
+async def paginate(database, stmt: Select, pk_column, page: PageParams) -> dict:
+    """
+    Runs a keyset-paginated list query on the async pool. Cost per call depends on the page size, not the table
+    size.
+    """
+    # One extra row is requested so we can tell whether another page exists
+    rows = await database.fetch_all(keyset_page(stmt, pk_column, page.size + 1, page.after))
+    return build_page([dict(row._mapping) for row in rows], pk_column.key, page.size)
@@ -0,0 +1,283 @@
+"""
+Kinship and inbreeding from the pedigree, through the additive relationship matrix A. A[i, j] is twice the kinship
+of plants i and j, which is also the inbreeding coefficient a child of theirs would have; A[i, i] is 1 plus the
+inbreeding coefficient of plant i.
+
+A plant's dam is the plant that bore the yield its seed came from. Its sires are the other plants of that yield's
+cross; several sires are treated as a pollen mix and averaged. A yield without a cross, or whose cross lists no
+other plant, was selfed.
+
+The matrix is built with NumPy one generation at a time: every row of a generation is gathered from its parents'
+rows in one step, so only parent rows are ever read. It is stored as one block per family, the plants joined
+through the pedigree; plants of different families are unrelated, so the entries between them are never stored.
+It is kept in memory and updated incrementally: when parents change, only the rows of the plants concerned and of
+their descendants are recomputed, new plants are appended to their family, and a cross between two families joins
+their blocks.
+"""
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+import cache
+import lineage
+import schema
+from database import new_session
+
+Plant, Germination, Seed, Yield, PlantPlantCross = (
+    schema.Plant, schema.Germination, schema.Seed, schema.Yield, schema.PlantPlantCross)
+
+# The tables a plant's parents are read from
+TABLES = (Plant.__tablename__, Germination.__tablename__, Seed.__tablename__, Yield.__tablename__,
+          PlantPlantCross.__tablename__)
+
+# Rows allocated when a family's block is first built; it doubles whenever it fills up
+INITIAL_CAPACITY = 16
+
+# (dam or None, sires); no sires means the sire is unknown
+Parents = Tuple[Optional[int], Tuple[int, ...]]
+
+
+def read_parents(db: Session) -> Dict[int, Parents]:
+    """
+    The dam and sires of every plant, from the origins the lineage reads.
+    """
+    origins = lineage.origins(db)
+    parents = {}
+    for plant_id, (bearer, crossed) in origins.items():
+        # SQLite doesn't enforce the foreign keys, so a deleted plant can still be named
+        crossed = [plant for plant in crossed if plant in origins]
+        if bearer not in origins:
+            bearer = None
+        dam = bearer if bearer is not None else next(iter(crossed), None)
+        sires = tuple(sorted(set(plant for plant in crossed if plant != dam)))
+        if dam is not None and not sires:
+            sires = (dam,)
+        if dam == plant_id or plant_id in sires:
+            dam, sires = None, ()
+        parents[plant_id] = (dam, sires)
+    return parents
+
+
+def generations(plant_ids: Set[int], parents: Dict[int, Parents]) -> List[List[int]]:
+    """
+    Groups plants so that every plant comes after the groups holding its parents, and no plant is in the same
+    group as one of its parents. Plants caught in a cycle, which only bad data can make, are given no parents.
+    """
+    level = {}
+    remaining = sorted(plant_ids)
+    while remaining:
+        waiting = []
+        for plant_id in remaining:
+            dam, sires = parents.get(plant_id, (None, ()))
+            pending = [parent for parent in (dam, *sires) if parent in plant_ids and parent not in level]
+            if pending:
+                waiting.append(plant_id)
+            else:
+                level[plant_id] = 1 + max((level[parent] for parent in (dam, *sires) if parent in level), default=-1)
+        if len(waiting) == len(remaining):
+            for plant_id in waiting:
+                parents[plant_id] = (None, ())
+        remaining = waiting
+    groups = defaultdict(list)
+    for plant_id, depth in level.items():
+        groups[depth].append(plant_id)
+    return [sorted(groups[depth]) for depth in sorted(groups)]
+
+
+class Family:
+    """
+    Plants joined through the pedigree, and their block of the matrix.
+    """
+
+    def __init__(self):
+        self.matrix = None
+        # Row of each plant
+        self.index = {}
+
+    def _grow(self, size: int):
+        import numpy as np
+
+        capacity = INITIAL_CAPACITY if self.matrix is None else len(self.matrix)
+        if self.matrix is not None and size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        grown = np.zeros((capacity, capacity))
+        if self.matrix is not None:
+            used = len(self.matrix)
+            grown[:used, :used] = self.matrix
+        self.matrix = grown
+
+    def add(self, plant_ids: Iterable[int]):
+        for plant_id in plant_ids:
+            self.index.setdefault(plant_id, len(self.index))
+        self._grow(len(self.index))
+
+    def absorb(self, other: "Family"):
+        """
+        Appends the plants of another family, with its block; they are unrelated to this family's plants so far.
+        """
+        start, size = len(self.index), len(other.index)
+        for plant_id, row in sorted(other.index.items(), key=lambda item: item[1]):
+            self.index[plant_id] = start + row
+        self._grow(len(self.index))
+        self.matrix[start:start + size, start:start + size] = other.matrix[:size, :size]
+
+    def compute(self, plant_ids: Set[int], parents: Dict[int, Parents]):
+        """
+        Recomputes the rows and columns of these plants, which must include every descendant of each of them,
+        generation by generation. A row comes from the parents' rows: A[i, j] = (A[dam, j] + mean of A[sire, j])
+        / 2, which holds for any j that is not a descendant of i; those are fixed when their own generation comes.
+        """
+        import numpy as np
+
+        # generations cuts cycles by dropping parents; that stays local, so the next sync doesn't see a change
+        parents = dict(parents)
+        size = len(self.index)
+        matrix = self.matrix
+        for group in generations(plant_ids, parents):
+            rows = np.array([self.index[plant_id] for plant_id in group])
+            # Sparse gather: (row within the group, parent row, weight) for every known parent
+            targets, sources, weights = [], [], []
+            for position, plant_id in enumerate(group):
+                dam, sires = parents[plant_id]
+                weighted = [(dam, 0.5)] if dam is not None else []
+                weighted += [(sire, 0.5 / len(sires)) for sire in sires]
+                for parent, weight in weighted:
+                    targets.append(position)
+                    sources.append(self.index[parent])
+                    weights.append(weight)
+            targets, sources, weights = np.array(targets, int), np.array(sources, int), np.array(weights)
+            block = np.zeros((len(group), size))
+            if len(targets):
+                np.add.at(block, targets, weights[:, None] * matrix[sources, :size])
+            matrix[rows, :size] = block
+            matrix[:size, rows] = block.T
+            # Within the group the rows just written are current, so the same gather gives the group's own block
+            inner = np.zeros((len(group), len(group)))
+            if len(targets):
+                np.add.at(inner, targets, weights[:, None] * matrix[np.ix_(sources, rows)])
+            matrix[np.ix_(rows, rows)] = inner
+            # Diagonal: 1 plus the plant's inbreeding coefficient, half the relationship of its dam and sires
+            for position, plant_id in enumerate(group):
+                dam, sires = parents[plant_id]
+                inbreeding = 0.0
+                if dam is not None and sires:
+                    inbreeding = 0.5 * float(np.mean(matrix[self.index[dam], [self.index[sire] for sire in sires]]))
+                matrix[rows[position], rows[position]] = 1.0 + inbreeding
+
+
+class RelationshipMatrix:
+    def __init__(self):
+        # Family of each plant, and the parents its row was computed from
+        self.families: Dict[int, Family] = {}
+        self.parents = {}
+        self.children = defaultdict(set)
+        self.versions = None
+        self.synced_at = None
+        self._lock = threading.Lock()
+
+    def _join(self, plant_ids: List[int]):
+        """
+        Puts these plants in one family: the largest of theirs absorbs the others, and plants new to the matrix
+        are appended to it.
+        """
+        families = {id(family): family for family in map(self.families.get, plant_ids) if family is not None}
+        family = max(families.values(), key=lambda family: len(family.index), default=None) or Family()
+        for other in families.values():
+            if other is not family:
+                family.absorb(other)
+                for plant_id in other.index:
+                    self.families[plant_id] = family
+        family.add(plant_ids)
+        for plant_id in plant_ids:
+            self.families[plant_id] = family
+
+    def descendants(self, plant_ids: Iterable[int]) -> Set[int]:
+        found = set(plant_ids)
+        frontier = list(found)
+        while frontier:
+            for child in self.children.get(frontier.pop(), ()):
+                if child not in found:
+                    found.add(child)
+                    frontier.append(child)
+        return found
+
+    def sync(self, db: Session):
+        """
+        Brings the matrix up to date with the pedigree. Only plants whose parents changed, new plants and their
+        descendants are recomputed, each within its own family; a deleted plant rebuilds the whole matrix.
+        """
+        parents = read_parents(db)
+        if set(self.families) - set(parents):
+            self.families, self.parents, self.children = {}, {}, defaultdict(set)
+        changed = {plant_id for plant_id, pair in parents.items() if self.parents.get(plant_id) != pair}
+        for plant_id in sorted(changed):
+            old_dam, old_sires = self.parents.get(plant_id, (None, ()))
+            for parent in {old_dam, *old_sires} - {None}:
+                self.children[parent].discard(plant_id)
+            dam, sires = parents[plant_id]
+            for parent in {dam, *sires} - {None}:
+                self.children[parent].add(plant_id)
+            self._join([plant_id, *sorted({dam, *sires} - {None})])
+        self.parents = parents
+        if changed:
+            # Descendants always share their parents' family, since families are only ever joined
+            recomputed = self.descendants(changed)
+            families = {id(self.families[plant_id]): self.families[plant_id] for plant_id in recomputed}
+            for family in families.values():
+                family.compute(recomputed & family.index.keys(), self.parents)
+
+    @contextmanager
+    def fresh(self, db: Session):
+        """
+        Brings the matrix up to date and holds it for reading: reads run in the threadpool, and a sync from another
+        thread would otherwise swap or grow the families under them.
+        """
+        versions = cache.stamp(TABLES)
+        with self._lock:
+            # The TTL bounds how long a pedigree change made by another container can go unnoticed
+            if versions != self.versions or self.synced_at is None or time.monotonic() - self.synced_at > cache.TTL:
+                self.sync(db)
+                self.versions = versions
+                self.synced_at = time.monotonic()
+            yield self
+
+    def relationship(self, plant_id: int, other_id: int) -> float:
+        family = self.families[plant_id]
+        if self.families[other_id] is not family:
+            return 0.0
+        return float(family.matrix[family.index[plant_id], family.index[other_id]])
+
+    def inbreeding(self, plant_id: int) -> float:
+        return self.relationship(plant_id, plant_id) - 1.0
+
+
+relationship_matrix = RelationshipMatrix()
+
+
+def kinship(db: Session, plant_ids: List[int]) -> Optional[dict]:
+    """
+    The inbreeding coefficient of each plant and the kinship of each pair, or None if a plant doesn't exist.
+    """
+    with relationship_matrix.fresh(db) as matrix:
+        if any(plant_id not in matrix.families for plant_id in plant_ids):
+            return None
+        return {
+            "plants": [{"plant_id": plant_id, "inbreeding": matrix.inbreeding(plant_id)} for plant_id in plant_ids],
+            "pairs": [{"plant_id": plant_id, "other_id": other_id,
+                       "kinship": matrix.relationship(plant_id, other_id) / 2}
+                      for position, plant_id in enumerate(plant_ids) for other_id in plant_ids[position + 1:]],
+        }
+
+
+def read(plant_ids: List[int]) -> Optional[dict]:
+    db = new_session()
+    try:
+        return kinship(db, plant_ids)
+    finally:
+        db.close()
@@ -0,0 +1,145 @@
+"""
+The breeding graph for family trees: plants, crosses, yields and seeds as nodes, with edges along the pedigree,
+plant -> yield -> seed -> plant and plant -> cross -> yield. It is read from the database in one bulk read of each
+table and kept in read_cache until one of them is written to; rendering a tree is then a walk over memory.
+"""
+from collections import defaultdict, deque
+from typing import Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+import schema
+from database import new_session
+
+Plant, Germination, Seed, Yield, PlantCross, PlantPlantCross = (
+    schema.Plant, schema.Germination, schema.Seed, schema.Yield, schema.PlantCross, schema.PlantPlantCross)
+
+TABLES = (Plant.__tablename__, Germination.__tablename__, Seed.__tablename__, Yield.__tablename__,
+          PlantCross.__tablename__, PlantPlantCross.__tablename__)
+
+# Graphviz shape of each kind of node
+SHAPES = {"plant": "ellipse", "cross": "diamond", "yield": "house", "seed": "box"}
+
+
+class Graph:
+    def __init__(self):
+        self.nodes: Dict[str, dict] = {}
+        self.edges: List[dict] = []
+        self.forward = defaultdict(list)
+        self.backward = defaultdict(list)
+
+    def add_node(self, node_id: str, kind: str, label: str, **attributes):
+        self.nodes[node_id] = {"id": node_id, "kind": kind, "label": label, **attributes}
+
+    def add_edge(self, source: str, target: str, label: str):
+        if source in self.nodes and target in self.nodes:
+            self.edges.append({"source": source, "target": target, "label": label})
+            self.forward[source].append(target)
+            self.backward[target].append(source)
+
+
+def load(db: Session) -> Graph:
+    """
+    Builds the whole graph, reading each table once.
+    """
+    graph = Graph()
+    seeds = {seed.seed_id: seed for seed in db.execute(
+        select(Seed.seed_id, Seed.yield_id, Seed.species, Seed.variety))}
+    germinations = {germination.germination_id: germination for germination in db.execute(
+        select(Germination.germination_id, Germination.seed_id, Germination.planted_date))}
+    plants = db.execute(select(Plant.plant_id, Plant.germination_id, Plant.planted_date, Plant.death_date)).all()
+    yields = db.execute(select(Yield.yield_id, Yield.plant_id, Yield.cross_id, Yield.date)).all()
+    crosses = db.execute(select(PlantCross.cross_id, PlantCross.cross_date, PlantCross.method)).all()
+    links = db.execute(select(PlantPlantCross.plant_id, PlantPlantCross.cross_id)).all()
+
+    for plant in plants:
+        germination = germinations.get(plant.germination_id)
+        seed = seeds.get(germination.seed_id) if germination is not None else None
+        label = "\n".join(filter(None, [f"Plant {plant.plant_id}", seed and seed.species, seed and seed.variety]))
+        graph.add_node(f"plant:{plant.plant_id}", "plant", label, planted_date=plant.planted_date,
+                       death_date=plant.death_date)
+    for cross in crosses:
+        graph.add_node(f"cross:{cross.cross_id}", "cross", f"Cross {cross.cross_id}", date=cross.cross_date,
+                       method=cross.method)
+    for harvest in yields:
+        graph.add_node(f"yield:{harvest.yield_id}", "yield", f"Yield {harvest.yield_id}", date=harvest.date)
+    for seed in seeds.values():
+        graph.add_node(f"seed:{seed.seed_id}", "seed", f"Seed {seed.seed_id}", species=seed.species,
+                       variety=seed.variety)
+
+    for link in links:
+        graph.add_edge(f"plant:{link.plant_id}", f"cross:{link.cross_id}", "parent")
+    for harvest in yields:
+        graph.add_edge(f"plant:{harvest.plant_id}", f"yield:{harvest.yield_id}", "bore")
+        graph.add_edge(f"cross:{harvest.cross_id}", f"yield:{harvest.yield_id}", "pollinated")
+    for seed in seeds.values():
+        graph.add_edge(f"yield:{seed.yield_id}", f"seed:{seed.seed_id}", "saved")
+    for plant in plants:
+        germination = germinations.get(plant.germination_id)
+        if germination is not None:
+            graph.add_edge(f"seed:{germination.seed_id}", f"plant:{plant.plant_id}", "grown")
+    return graph
+
+
+def read() -> Graph:
+    db = new_session()
+    try:
+        return load(db)
+    finally:
+        db.close()
+
+
+def subgraph(graph: Graph, root: Optional[str], direction: str, depth: Optional[int], max_nodes: int) -> dict:
+    """
+    The nodes reachable from `root` within `depth` plant generations, following edges forward for descendants,
+    backward for ancestors or both ways, or the whole graph without a root. At most max_nodes nodes are kept,
+    nearest first.
+    """
+    if root is None:
+        kept = list(graph.nodes)
+    else:
+        # Breadth-first, counting a generation every time a plant is reached
+        generation = {root: 0}
+        queue = deque([root])
+        kept = []
+        while queue:
+            node = queue.popleft()
+            kept.append(node)
+            if depth is not None and node != root and graph.nodes[node]["kind"] == "plant" \
+                    and generation[node] >= depth:
+                continue
+            neighbours = []
+            if direction in ("descendants", "both"):
+                neighbours += graph.forward[node]
+            if direction in ("ancestors", "both"):
+                neighbours += graph.backward[node]
+            for neighbour in neighbours:
+                if neighbour not in generation:
+                    generation[neighbour] = generation[node] + (graph.nodes[neighbour]["kind"] == "plant")
+                    if depth is not None and generation[neighbour] > depth:
+                        continue
+                    queue.append(neighbour)
+    truncated = len(kept) > max_nodes
+    kept = set(kept[:max_nodes])
+    return {
+        "nodes": [node for node_id, node in graph.nodes.items() if node_id in kept],
+        "edges": [edge for edge in graph.edges if edge["source"] in kept and edge["target"] in kept],
+        "truncated": truncated,
+    }
+
+
+def quote(value) -> str:
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+
+
+def to_dot(graph: dict) -> str:
+    lines = ["digraph pedigree {", "  rankdir=TB;"]
+    for node in graph["nodes"]:
+        lines.append(f"  {quote(node['id'])} [label={quote(node['label'])}, shape={SHAPES[node['kind']]}];")
+    for edge in graph["edges"]:
+        lines.append(f"  {quote(edge['source'])} -> {quote(edge['target'])} [label={quote(edge['label'])}];")
+    if graph["truncated"]:
+        lines.append('  label="truncated at the node cap";')
+    lines.append("}")
+    return "\n".join(lines) + "\n"
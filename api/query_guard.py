@@ -0,0 +1,133 @@
+"""
+Keeps ad-hoc queries from run_select_query within what the small MySQL instance can afford: a pre-flight EXPLAIN
+rejects queries MySQL expects to be expensive, and the ones that run are cancelled server-side if they overrun.
+"""
+import math
+import os
+import re
+from typing import List, Optional
+
+from fastapi import HTTPException
+
+import schema
+from database import fetch_sql
+from sql_analysis import Token
+
+# Rows MySQL may expect to examine, summed over every table of the plan, before a query is refused.
+ROW_BUDGET = int(os.getenv("QUERY_ROW_BUDGET", 2_000_000))
+# A full table scan is refused on its own once the table is estimated to hold more rows than this.
+FULL_SCAN_ROWS = int(os.getenv("QUERY_FULL_SCAN_ROWS", 200_000))
+# Server-side limit on how long an accepted query may run.
+TIMEOUT_MS = int(os.getenv("QUERY_TIMEOUT_MS", 10_000))
+
+# MySQL error raised when MAX_EXECUTION_TIME interrupts a query
+TIMEOUT_ERROR = 3024
+
+# Words that make MySQL read past a LIMIT before it returns rows: sorting, grouping, aggregating and combining tables
+READS_AHEAD = {
+    "ORDER", "GROUP", "HAVING", "DISTINCT", "UNION", "JOIN", "STRAIGHT_JOIN", "OVER", "WINDOW", "COUNT", "SUM",
+    "AVG", "MIN", "MAX", "GROUP_CONCAT", "STD", "STDDEV", "STDDEV_POP", "STDDEV_SAMP", "VARIANCE", "VAR_POP",
+    "VAR_SAMP", "BIT_AND", "BIT_OR", "BIT_XOR", "JSON_ARRAYAGG", "JSON_OBJECTAGG",
+}
+
+LEADING_SELECT = re.compile(r"^(\s*select\b)(\s*/\*\+)?", re.IGNORECASE)
+
+
+def estimated_rows(plan: List[dict]) -> int:
+    """
+    Rows MySQL expects to examine for an EXPLAIN plan. Within one SELECT the tables are joined as nested loops,
+    so each table is read once per row kept from the tables before it; separate SELECTs add up.
+    """
+    total = 0
+    selects = {}
+    for step in plan:
+        rows = step.get("rows") or 0
+        filtered = step.get("filtered")
+        fanout = selects.get(step.get("id"), 1)
+        total += fanout * rows
+        selects[step.get("id")] = fanout * max(rows * (filtered if filtered is not None else 100) / 100, 1)
+    return int(total)
+
+
+def indexed_columns(table_name: str) -> List[str]:
+    table = schema.Base.metadata.tables.get(table_name)
+    if table is None:
+        return []
+    columns = [column.name for column in table.primary_key.columns]
+    for index in table.indexes:
+        columns += [column.name for column in index.columns if column.name not in columns]
+    return columns
+
+
+def streams(plan: List[dict], tokens: List[Token]) -> bool:
+    """
+    Whether MySQL hands rows out as it reads them, so that a LIMIT or the client stops the read: one table, with
+    no sorting, grouping, aggregating or joining in the plan or the query.
+    """
+    if len(plan) != 1 or any(work in (plan[0].get("Extra") or "") for work in ("Using filesort", "Using temporary")):
+        return False
+    return not any(token.kind == "word" and token.text.upper() in READS_AHEAD for token in tokens)
+
+
+def objection(plan: List[dict], tokens: Optional[List[Token]] = None, row_limit: Optional[int] = None) \
+        -> Optional[str]:
+    """
+    Why a plan is too expensive to run, in terms the GPT can act on, or None if it is within budget. EXPLAIN
+    estimates ignore LIMIT, so given the query's tokens, a plan that streams is judged by what it reads: about
+    row_limit matching rows for a page. An export, with no row_limit, passes: its rows go straight to the client
+    and the timeout bounds the read.
+    """
+    if tokens is not None and streams(plan, tokens):
+        if row_limit is None:
+            return None
+        step = plan[0]
+        filtered = step.get("filtered")
+        # Finding row_limit matches takes about row_limit / filtered rows of the table
+        reads = math.ceil(row_limit * 100 / max(filtered if filtered is not None else 100, 0.01))
+        plan = [{**step, "rows": min(step.get("rows") or 0, reads)}]
+    for step in plan:
+        if step.get("type") == "ALL" and (step.get("rows") or 0) > FULL_SCAN_ROWS:
+            table = step.get("table")
+            hint = ""
+            columns = indexed_columns(table)
+            if columns:
+                hint = f" Filter on an indexed column ({', '.join(columns)}) or aggregate over a narrower range."
+            return f"Query rejected: it would read all ~{step['rows']:,} rows of {table}.{hint}"
+    rows = estimated_rows(plan)
+    if rows > ROW_BUDGET:
+        return f"Query rejected: MySQL estimates it would examine ~{rows:,} rows, over the budget of " \
+               f"{ROW_BUDGET:,}. Add join conditions between every pair of tables, filter on indexed columns or " \
+               f"split it into smaller queries."
+    return None
+
+
+def with_timeout(query: str) -> str:
+    """
+    Adds a MAX_EXECUTION_TIME optimizer hint to the outermost SELECT, inside the query's own hint comment if it
+    has one, since MySQL only reads the comment right after SELECT.
+    """
+    hint = f"MAX_EXECUTION_TIME({TIMEOUT_MS})"
+    match = LEADING_SELECT.match(query)
+    if match is None:
+        return query
+    if match.group(2):
+        return f"{query[:match.end()]} {hint} {query[match.end():].lstrip()}"
+    return f"{match.group(1)} /*+ {hint} */{query[match.end():]}"
+
+
+def is_timeout(e: Exception) -> bool:
+    return type(e).__name__ == "OperationalError" and bool(e.args) and e.args[0] == TIMEOUT_ERROR
+
+
+async def guard(database, query: str, tokens: Optional[List[Token]] = None, row_limit: Optional[int] = None) -> str:
+    """
+    Raises a 400 if EXPLAIN says the query is over budget; see objection for tokens and row_limit. Returns the
+    query to run, with the timeout hint. Only MySQL has the EXPLAIN columns and the hint, so other databases run
+    the query unchanged.
+    """
+    if database.url.dialect != "mysql":
+        return query
+    reason = objection(await fetch_sql(database, f"EXPLAIN {query}"), tokens, row_limit)
+    if reason is not None:
+        raise HTTPException(status_code=400, detail=reason)
+    return with_timeout(query)
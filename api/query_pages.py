@@ -0,0 +1,188 @@
+"""
+Bounds what one run_select_query call returns. The query's own LIMIT is tightened (or one is added) so MySQL
+stops after the rows that fit, rows are read in chunks until a byte budget is spent, and a continuation token lets
+the caller pick up the same query where the response stopped.
+"""
+import base64
+import binascii
+import hashlib
+import json
+import os
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+
+import query_guard
+from sql_analysis import Token
+
+# Most rows one response may carry.
+MAX_ROWS = int(os.getenv("QUERY_MAX_ROWS", 500))
+# Approximate JSON size one response may carry; the GPT can't use much more than this in one action call.
+MAX_BYTES = int(os.getenv("QUERY_MAX_BYTES", 100_000))
+# Rows read from the cursor at a time.
+CHUNK_SIZE = 100
+
+# Clauses that can come after LIMIT; a query with one of them is limited from the outside instead.
+AFTER_LIMIT = {"FOR", "INTO", "LOCK", "PROCEDURE"}
+
+
+def query_hash(fingerprint: str) -> str:
+    return hashlib.sha256(fingerprint.encode()).hexdigest()[:16]
+
+
+def encode_token(fingerprint: str, offset: int) -> str:
+    raw = json.dumps({"q": query_hash(fingerprint), "o": offset}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_token(token: str, fingerprint: str) -> int:
+    """
+    The offset to resume from. Raises a 400 if the token is malformed or was issued for a different query.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        offset = payload["o"]
+        issued_for = payload["q"]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid continuation token.")
+    if not isinstance(offset, int) or offset < 0:
+        raise HTTPException(status_code=400, detail="Invalid continuation token.")
+    if issued_for != query_hash(fingerprint):
+        raise HTTPException(status_code=400, detail="This continuation token belongs to a different query; send "
+                                                    "the query it was returned for.")
+    return offset
+
+
+def _own_limit(tokens: List[Token]) -> Tuple[Optional[int], int, int, int]:
+    """
+    Finds the statement's own LIMIT: returns (row count or None, offset, index of LIMIT, index after the clause).
+    Without one, both indexes point just after the last token that isn't a comment, space or semicolon.
+    Raises ValueError for a LIMIT this can't rewrite.
+    """
+    end = len(tokens)
+    while end and (tokens[end - 1].kind in ("space", "comment") or tokens[end - 1].text == ";"):
+        end -= 1
+    depth = 0
+    limit_at = None
+    for index, token in enumerate(tokens[:end]):
+        if token.text == "(":
+            depth += 1
+        elif token.text == ")":
+            depth -= 1
+        elif depth == 0 and token.kind == "word" and token.text.upper() == "LIMIT":
+            limit_at = index
+        elif depth == 0 and token.kind == "word" and token.text.upper() in AFTER_LIMIT:
+            raise ValueError(f"{token.text} clause")
+    if limit_at is None:
+        return None, 0, end, end
+    clause = []
+    clause_end = limit_at + 1
+    for index in range(limit_at + 1, end):
+        token = tokens[index]
+        if token.kind in ("space", "comment"):
+            continue
+        if token.kind != "number" and token.text != "," and token.text.upper() != "OFFSET":
+            break
+        clause.append(token.text.upper())
+        clause_end = index + 1
+    if len(clause) == 1 and clause[0].isdigit():
+        return int(clause[0]), 0, limit_at, clause_end
+    if len(clause) == 3 and clause[0].isdigit() and clause[2].isdigit():
+        if clause[1] == ",":
+            return int(clause[2]), int(clause[0]), limit_at, clause_end
+        if clause[1] == "OFFSET":
+            return int(clause[0]), int(clause[2]), limit_at, clause_end
+    raise ValueError("unsupported LIMIT clause")
+
+
+def limit_query(query: str, tokens: List[Token], start: int, count: int) -> str:
+    """
+    Rewrites the query to return at most `count` rows, starting `start` rows into its own result, by tightening
+    its LIMIT or adding one.
+    """
+    try:
+        own_count, own_offset, limit_at, clause_end = _own_limit(tokens)
+    except ValueError:
+        # Limit the result from the outside. MySQL keeps the ORDER BY of a lone derived table.
+        return f"SELECT * FROM ({query.rstrip().rstrip(';')}) AS limited LIMIT {start}, {count}"
+    if own_count is not None:
+        count = max(min(count, own_count - start), 0)
+    head = "".join(token.text for token in tokens[:limit_at]).rstrip()
+    rest = "".join(token.text for token in tokens[clause_end:])
+    return f"{head} LIMIT {own_offset + start}, {count}{rest}"
+
+
+def row_size(row: dict) -> int:
+    return len(json.dumps(row, default=str))
+
+
+class PageBuilder:
+    """
+    Collects rows until max_rows rows or max_bytes of JSON have been taken. `add` returns False, without taking
+    the row, once the page is full; that row is the proof the result has more.
+    """
+
+    def __init__(self, columns: List[str], max_rows: int, max_bytes: int):
+        self.columns = columns
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.rows = []
+        self.size = 0
+
+    def add(self, values) -> bool:
+        row = dict(zip(self.columns, values))
+        self.size += row_size(row)
+        if len(self.rows) == self.max_rows or (self.rows and self.size > self.max_bytes):
+            return False
+        self.rows.append(row)
+        return True
+
+
+async def fetch_page(database, query: str, max_rows: int, max_bytes: int) -> Tuple[List[dict], bool]:
+    """
+    Reads at most max_rows rows, in chunks, stopping once max_bytes have been collected. Returns the rows and
+    whether the cursor had more.
+    """
+    async with database.connection() as connection:
+        if database.url.dialect == "mysql":
+            import aiomysql
+
+            # Unbuffered, so rows come off the wire as the page takes them rather than all at execute; closing it
+            # once the page is full stops the read
+            cursor = await connection.raw_connection.cursor(aiomysql.SSCursor)
+        else:
+            cursor = await connection.raw_connection.cursor()
+        try:
+            await cursor.execute(query)
+            page = PageBuilder([column[0] for column in cursor.description or ()], max_rows, max_bytes)
+            while True:
+                chunk = await cursor.fetchmany(CHUNK_SIZE)
+                if not chunk:
+                    return page.rows, False
+                if not all(page.add(values) for values in chunk):
+                    return page.rows, True
+        finally:
+            await cursor.close()
+
+
+def response(rows: List[dict], truncated: bool, start: int, fingerprint: str) -> dict:
+    return {
+        "rows": rows,
+        "truncated": truncated,
+        "total": None if truncated else start + len(rows),
+        "next_token": encode_token(fingerprint, start + len(rows)) if truncated else None,
+    }
+
+
+async def run_page(database, query: str, tokens: List[Token], fingerprint: str, token: Optional[str]) -> dict:
+    """
+    Runs one bounded page of a query and builds the response: the rows, whether the result was cut short, its
+    total size if that is known, and the token for the next page.
+    """
+    start = decode_token(token, fingerprint) if token else 0
+    # One row more than can be returned is requested, to tell whether the result goes on
+    limited = await query_guard.guard(database, limit_query(query, tokens, start, MAX_ROWS + 1), tokens,
+                                      start + MAX_ROWS + 1)
+    rows, truncated = await fetch_page(database, limited, MAX_ROWS, MAX_BYTES)
+    return response(rows, truncated, start, fingerprint)
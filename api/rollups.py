@@ -0,0 +1,212 @@
+"""
+Keeps germination_rollup in step with germination and seeds, so "which method works best for this variety" is one
+indexed read instead of a scan and group of every germination.
+
+Each germination row contributes to two rollups: its seed's, per method, and its variety's, per method. Writes apply
+the difference between the rows as they were and as written; a seed that changes species or variety moves its
+totals from one variety rollup to the other. Medians come from a histogram of days to germinate kept on each row.
+"""
+import hashlib
+import json
+from collections import defaultdict
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.orm import Session
+
+import crud
+import schema
+
+Germination, Seed, GerminationRollup = schema.Germination, schema.Seed, schema.GerminationRollup
+
+# (seed_id or None, species, variety, method): seed rollups have a seed_id, variety rollups don't
+Key = Tuple[Optional[int], Optional[str], Optional[str], Optional[str]]
+
+
+class Totals:
+    def __init__(self):
+        self.sowings = 0
+        self.seeds_attempted = 0
+        self.seeds_successful = 0
+        self.days = defaultdict(int)
+
+    def add(self, other: "Totals", sign: int = 1):
+        self.sowings += sign * other.sowings
+        self.seeds_attempted += sign * other.seeds_attempted
+        self.seeds_successful += sign * other.seeds_successful
+        for days, sowings in other.days.items():
+            self.days[days] += sign * sowings
+
+    def add_germination(self, row, sign: int = 1):
+        self.sowings += sign
+        self.seeds_attempted += sign * (row.get("seeds_attempted") or 0)
+        self.seeds_successful += sign * (row.get("seeds_successful") or 0)
+        planted, germinated = as_date(row.get("planted_date")), as_date(row.get("germination_date"))
+        if planted is not None and germinated is not None:
+            self.days[(germinated - planted).days] += sign
+
+    def median_days(self) -> Optional[float]:
+        counts = sorted((days, sowings) for days, sowings in self.days.items() if sowings > 0)
+        total = sum(sowings for _, sowings in counts)
+        if not total:
+            return None
+
+        def nth(position: int) -> int:
+            for days, sowings in counts:
+                if position < sowings:
+                    return days
+                position -= sowings
+
+        return (nth((total - 1) // 2) + nth(total // 2)) / 2
+
+    def columns(self) -> dict:
+        return {
+            "sowings": self.sowings,
+            "seeds_attempted": self.seeds_attempted,
+            "seeds_successful": self.seeds_successful,
+            "success_rate": self.seeds_successful / self.seeds_attempted if self.seeds_attempted else None,
+            "median_days": self.median_days(),
+            "days_histogram": json.dumps({str(days): sowings for days, sowings in sorted(self.days.items())
+                                          if sowings}),
+        }
+
+    @classmethod
+    def of(cls, row) -> "Totals":
+        totals = cls()
+        totals.sowings, totals.seeds_attempted, totals.seeds_successful = (
+            row.sowings, row.seeds_attempted, row.seeds_successful)
+        for days, sowings in json.loads(row.days_histogram).items():
+            totals.days[int(days)] = sowings
+        return totals
+
+
+def as_date(value) -> Optional[date]:
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def digest(key: Key) -> dict:
+    """
+    The unique key column of a rollup and its value. A seed rollup is found by seed and method alone; its species
+    and variety are kept for display.
+    """
+    seed_id, species, variety, method = key
+    if seed_id is not None:
+        column, parts = "seed_key", [seed_id, method]
+    else:
+        column, parts = "variety_key", [species, variety, method]
+    return {column: hashlib.sha256(json.dumps(parts).encode()).hexdigest()}
+
+
+def key_filter(key: Key):
+    return [getattr(GerminationRollup, column) == value for column, value in digest(key).items()]
+
+
+def insert_if_missing(dialect_name: str, key: Key):
+    """
+    An INSERT of an empty rollup for `key` that does nothing if the rollup exists: ON DUPLICATE KEY UPDATE that
+    changes nothing on MySQL, ON CONFLICT DO NOTHING on SQLite.
+    """
+    seed_id, species, variety, method = key
+    values = dict(seed_id=seed_id, species=species, variety=variety, method=method, **digest(key),
+                  **Totals().columns())
+    table = GerminationRollup.__table__
+    if dialect_name == "mysql":
+        stmt = mysql.insert(table).values(values)
+        return stmt.on_duplicate_key_update(rollup_id=table.c.rollup_id)
+    if dialect_name == "sqlite":
+        return sqlite.insert(table).values(values).on_conflict_do_nothing()
+    raise NotImplementedError(f"Rollups are not implemented for the {dialect_name} dialect")
+
+
+def apply(db: Session, deltas: Dict[Key, Totals]):
+    """
+    Adds each delta to its rollup, creating the row if needed and deleting it once no sowing is left.
+    """
+    dialect_name = db.get_bind().dialect.name
+    for key, delta in deltas.items():
+        if not delta.sowings and not any(delta.days.values()) and not delta.seeds_attempted \
+                and not delta.seeds_successful:
+            continue
+        # The row is created first so there is always one to lock: SELECT ... FOR UPDATE of a missing row locks
+        # nothing, and two first writes would both insert it. On the unique key the second insert is a no-op.
+        db.execute(insert_if_missing(dialect_name, key))
+        row = db.execute(select(GerminationRollup).where(*key_filter(key)).with_for_update()).scalar_one()
+        totals = Totals.of(row)
+        totals.add(delta)
+        if totals.sowings <= 0:
+            db.execute(delete(GerminationRollup).where(GerminationRollup.rollup_id == row.rollup_id))
+        else:
+            db.execute(update(GerminationRollup).where(GerminationRollup.rollup_id == row.rollup_id)
+                       .values(**totals.columns()))
+
+
+def keys(seed_id: Optional[int], species: Optional[str], variety: Optional[str], method: Optional[str]) -> List[Key]:
+    """
+    The rollups a germination counts towards: its seed's, if it has a seed, and its variety's.
+    """
+    variety_key = (None, species, variety, method)
+    return [variety_key] if seed_id is None else [(seed_id, species, variety, method), variety_key]
+
+
+def seed_names(db: Session, seed_ids) -> Dict[int, Tuple[Optional[str], Optional[str]]]:
+    if not seed_ids:
+        return {}
+    return {seed_id: (species, variety) for seed_id, species, variety in
+            db.execute(select(Seed.seed_id, Seed.species, Seed.variety).where(Seed.seed_id.in_(seed_ids)))}
+
+
+@crud.on_write(Germination.__tablename__, derived=(GerminationRollup.__tablename__,))
+def on_germination_write(db: Session, table_name: str, before: List[dict], after: List[dict]):
+    names = seed_names(db, {row["seed_id"] for row in before + after if row.get("seed_id") is not None})
+    deltas = defaultdict(Totals)
+    for rows, sign in ((before, -1), (after, 1)):
+        for row in rows:
+            species, variety = names.get(row.get("seed_id"), (None, None))
+            for key in keys(row.get("seed_id"), species, variety, row.get("method")):
+                deltas[key].add_germination(row, sign)
+    apply(db, deltas)
+
+
+@crud.on_write(Seed.__tablename__, derived=(GerminationRollup.__tablename__,))
+def on_seed_write(db: Session, table_name: str, before: List[dict], after: List[dict]):
+    old = {row["seed_id"]: (row.get("species"), row.get("variety")) for row in before}
+    new = {row["seed_id"]: (row.get("species"), row.get("variety")) for row in after}
+    moved = [seed_id for seed_id in old if old[seed_id] != new.get(seed_id)]
+    if not moved:
+        return
+    deltas = defaultdict(Totals)
+    for row in db.execute(select(GerminationRollup).where(GerminationRollup.seed_id.in_(moved))).scalars():
+        totals = Totals.of(row)
+        deltas[(None, *old[row.seed_id], row.method)].add(totals, -1)
+        if row.seed_id in new:
+            deltas[(None, *new[row.seed_id], row.method)].add(totals)
+    apply(db, deltas)
+    for seed_id in moved:
+        if seed_id in new:
+            species, variety = new[seed_id]
+            db.execute(update(GerminationRollup).where(GerminationRollup.seed_id == seed_id)
+                       .values(species=species, variety=variety))
+        else:
+            db.execute(delete(GerminationRollup).where(GerminationRollup.seed_id == seed_id))
+
+
+def rebuild(db: Session):
+    """
+    Recomputes every rollup from the germination table, for repair.
+    """
+    db.execute(delete(GerminationRollup))
+    deltas = defaultdict(Totals)
+    rows = db.execute(select(Germination.seed_id, Germination.method, Germination.planted_date,
+                             Germination.germination_date, Germination.seeds_attempted, Germination.seeds_successful,
+                             Seed.species, Seed.variety).outerjoin(Seed, Seed.seed_id == Germination.seed_id))
+    for row in rows.mappings():
+        for key in keys(row["seed_id"], row["species"], row["variety"], row["method"]):
+            deltas[key].add_germination(row)
+    rows = [{"seed_id": seed_id, "species": species, "variety": variety, "method": method,
+             **digest((seed_id, species, variety, method)), **totals.columns()}
+            for (seed_id, species, variety, method), totals in deltas.items()]
+    if rows:
+        db.execute(insert(GerminationRollup), rows)
+    db.commit()
@@ -0,0 +1,163 @@
+"""
+Named, parameterized queries for the analytics the GPT asks for every session. Each template is a bound text()
+statement, compiled once per SQL dialect; calls only bind their parameters, skip SQL validation and EXPLAIN, and
+their results are cached per parameter set until a table they read is written to.
+"""
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import Date, Float, Integer, String, bindparam, text
+
+import query_pages
+from cache import MISSING, query_cache, stamp
+from database import fetch_sql, get_engine
+
+# Bind types, and how a parameter of each type is described to the GPT
+TYPES = {int: (Integer, "integer"), float: (Float, "number"), str: (String, "string"), date: (Date, "date")}
+
+
+@dataclass(frozen=True)
+class Param:
+    name: str
+    type: type
+    description: str
+    required: bool = False
+    default: Any = None
+
+
+# Every template ends with LIMIT :limit
+LIMIT = Param("limit", int, "Most rows to return", default=100)
+
+
+@dataclass
+class SavedQuery:
+    name: str
+    description: str
+    sql: str
+    tables: Tuple[str, ...]
+    params: List[Param] = field(default_factory=list)
+
+    def __post_init__(self):
+        self.params = self.params + [LIMIT]
+        self.statement = text(self.sql).bindparams(
+            *[bindparam(param.name, type_=TYPES[param.type][0]) for param in self.params])
+        self._adapters = {param.name: TypeAdapter(Optional[param.type]) for param in self.params}
+        # Compiled SQL and the order its positional parameters are bound in, per dialect
+        self._compiled = {}
+
+    def compiled(self, dialect) -> Tuple[str, Tuple[str, ...]]:
+        compiled = self._compiled.get(dialect.name)
+        if compiled is None:
+            statement = self.statement.compile(dialect=dialect)
+            compiled = self._compiled[dialect.name] = (str(statement), tuple(statement.positiontup))
+        return compiled
+
+    def values(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Checks and converts the caller's arguments, filling in defaults. Raises a 400 naming what is wrong.
+        """
+        unknown = set(arguments) - {param.name for param in self.params}
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown parameters for {self.name}: "
+                                                        f"{', '.join(sorted(unknown))}.")
+        values = {}
+        for param in self.params:
+            if arguments.get(param.name) is None:
+                if param.required:
+                    raise HTTPException(status_code=400, detail=f"{self.name} needs the {param.name} parameter.")
+                values[param.name] = param.default
+                continue
+            try:
+                values[param.name] = self._adapters[param.name].validate_python(arguments[param.name])
+            except ValidationError:
+                raise HTTPException(status_code=400, detail=f"{param.name} must be of type {TYPES[param.type][1]}.")
+        values["limit"] = max(min(values["limit"], query_pages.MAX_ROWS), 0)
+        return values
+
+    def describe(self) -> dict:
+        return {
+            "name": self.name,
+            "description": self.description,
+            "parameters": [{"name": param.name, "type": TYPES[param.type][1], "description": param.description,
+                            "required": param.required, "default": param.default} for param in self.params],
+        }
+
+
+SAVED_QUERIES = {query.name: query for query in [
+    SavedQuery(
+        "germination_rate_by_variety",
+        "Seeds sown, seeds germinated and the germination rate (0-1) of each variety, best first.",
+        "SELECT s.species, s.variety, COUNT(*) AS sowings, SUM(g.seeds_attempted) AS seeds_attempted, "
+        "SUM(g.seeds_successful) AS seeds_successful, "
+        "1.0 * SUM(g.seeds_successful) / SUM(g.seeds_attempted) AS germination_rate "
+        "FROM germination g JOIN seeds s ON s.seed_id = g.seed_id "
+        "WHERE (:species IS NULL OR s.species = :species) "
+        "GROUP BY s.species, s.variety ORDER BY germination_rate DESC LIMIT :limit",
+        ("germination", "seeds"),
+        [Param("species", str, "Only this species")]),
+    SavedQuery(
+        "latest_conditions_per_system",
+        "The most recent water reading of each hydroponic system.",
+        "SELECT hs.system_id, hs.system_type, hc.date, hc.recorded_at, hc.water_ph, "
+        "hc.electrical_conductivity_us_cm, hc.water_temperature_f, hc.comments "
+        "FROM hydroponic_system hs JOIN hydroponic_conditions hc ON hc.system_id = hs.system_id "
+        "WHERE hc.condition_id = (SELECT c.condition_id FROM hydroponic_conditions c WHERE c.system_id = hs.system_id "
+        "ORDER BY c.date DESC, c.recorded_at DESC, c.condition_id DESC LIMIT 1) "
+        "ORDER BY hs.system_id LIMIT :limit",
+        ("hydroponic_conditions", "hydroponic_system")),
+    SavedQuery(
+        "plant_observations",
+        "A plant's observations in date order.",
+        "SELECT observation_id, date, height_cm, leaf_count, color, texture, comments FROM observations "
+        "WHERE plant_id = :plant_id ORDER BY date, observation_id LIMIT :limit",
+        ("observations",),
+        [Param("plant_id", int, "The plant", required=True)]),
+    SavedQuery(
+        "taste_scores_by_variety",
+        "Average taste test scores (1-10) of each variety, best overall first.",
+        "SELECT s.species, s.variety, COUNT(*) AS tastings, AVG(t.taste) AS taste, AVG(t.texture) AS texture, "
+        "AVG(t.appearance) AS appearance, AVG(t.overall) AS overall "
+        "FROM taste_test t JOIN plants p ON p.plant_id = t.plant_id "
+        "JOIN germination g ON g.germination_id = p.germination_id JOIN seeds s ON s.seed_id = g.seed_id "
+        "GROUP BY s.species, s.variety ORDER BY overall DESC LIMIT :limit",
+        ("germination", "plants", "seeds", "taste_test")),
+    SavedQuery(
+        "yields_between",
+        "Yields harvested between two dates, inclusive, oldest first.",
+        "SELECT yield_id, plant_id, cross_id, date, color, texture, comments FROM yield "
+        "WHERE date BETWEEN :start AND :end ORDER BY date, yield_id LIMIT :limit",
+        ("yield",),
+        [Param("start", date, "First day", required=True), Param("end", date, "Last day", required=True)]),
+]}
+
+
+def catalog() -> List[dict]:
+    return [query.describe() for query in SAVED_QUERIES.values()]
+
+
+async def run(database, name: str, arguments: Dict[str, Any]) -> dict:
+    """
+    Runs a saved query, or answers it from the cache. Raises a 404 for an unknown name and a 400 for bad arguments.
+    """
+    query = SAVED_QUERIES.get(name)
+    if query is None:
+        raise HTTPException(status_code=404, detail=f"No saved query named {name}. Saved queries: "
+                                                    f"{', '.join(SAVED_QUERIES)}.")
+    values = query.values(arguments)
+    key = ("saved", name) + tuple(sorted(values.items()))
+    result = query_cache.get(key, query.tables)
+    if result is MISSING:
+        versions = stamp(query.tables)
+        sql, order = query.compiled(get_engine().dialect)
+        # Dates are bound as ISO strings, which both MySQL and SQLite compare correctly
+        params = tuple(value.isoformat() if isinstance(value, date) else value
+                       for value in (values[param] for param in order))
+        rows = await fetch_sql(database, sql, params)
+        page = query_pages.PageBuilder(list(rows[0]) if rows else [], query_pages.MAX_ROWS, query_pages.MAX_BYTES)
+        truncated = not all(page.add(row.values()) for row in rows)
+        result = {"rows": page.rows, "truncated": truncated, "total": None if truncated else len(page.rows)}
+        query_cache.put(key, versions, result)
+    return result
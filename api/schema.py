@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, Date, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, Text, Date, DateTime, ForeignKey, Float, Index, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
@@ -27,6 +27,13 @@ class Germination(Base):
     method = Column(String(255))
     comments = Column(Text, nullable=True)
 
+    __table_args__ = (
+        Index('ix_germination_seed_id_planted_date', 'seed_id', 'planted_date'),
+    )
+
+    # Relationships
+    seed = relationship("Seed")
+
 
 class Plant(Base):
     __tablename__ = 'plants'
@@ -39,6 +46,8 @@ class Plant(Base):
 
     # Relationships
     plants = relationship("PlantPlantCross", back_populates="plant")
+    germination = relationship("Germination")
+    system = relationship("HydroponicSystem", back_populates="plants")
 
 
 class Yield(Base):
@@ -52,6 +61,11 @@ class Yield(Base):
     # photo = Column(BLOB, nullable=True)
     comments = Column(Text, nullable=True)
 
+    __table_args__ = (
+        Index('ix_yield_plant_id_date', 'plant_id', 'date'),
+        Index('ix_yield_cross_id_date', 'cross_id', 'date'),
+    )
+
 
 class PlantCross(Base):
     __tablename__ = 'plant_crosses'
@@ -86,6 +100,10 @@ class TasteTest(Base):
     overall = Column(Integer)
     comments = Column(Text, nullable=True)
 
+    __table_args__ = (
+        Index('ix_taste_test_plant_id_date', 'plant_id', 'date'),
+    )
+
 
 class Observation(Base):
     __tablename__ = 'observations'
@@ -99,6 +117,10 @@ class Observation(Base):
     # photo = Column(BLOB)
     comments = Column(Text, nullable=True)
 
+    __table_args__ = (
+        Index('ix_observations_plant_id_date', 'plant_id', 'date'),
+    )
+
 
 class HydroponicSystem(Base):
     __tablename__ = 'hydroponic_system'
@@ -108,7 +130,7 @@ class HydroponicSystem(Base):
 
     # Relationships
     conditions = relationship("HydroponicCondition")
-    plants = relationship("Plant")
+    plants = relationship("Plant", back_populates="system")
 
 
 class HydroponicCondition(Base):
@@ -116,15 +138,64 @@ class HydroponicCondition(Base):
     condition_id = Column(Integer, primary_key=True, autoincrement=True)
     system_id = Column(Integer, ForeignKey('hydroponic_system.system_id'))
     date = Column(Date)
+    # When a sensor took the reading, in UTC; manual entries only have the date
+    recorded_at = Column(DateTime, nullable=True)
     water_ph = Column(Float, nullable=True)
     electrical_conductivity_us_cm = Column(Float, nullable=True)
     water_temperature_f = Column(Float, nullable=True)
     comments = Column(Text, nullable=True)
 
-
-# create an engine that stores data in the local directory's
-# sqlalchemy_example.db file.
-engine = create_engine('sqlite:///sqlalchemy_example.db')
-
-# Create all tables by issuing CREATE TABLE commands to the DB.
-Base.metadata.create_all(engine)
+    __table_args__ = (
+        Index('ix_hydroponic_conditions_system_id_date', 'system_id', 'date'),
+        Index('ix_hydroponic_conditions_system_id_recorded_at', 'system_id', 'recorded_at'),
+    )
+
+
+class PlantLineage(Base):
+    """
+    Closure of the pedigree: one row for every ancestor of every plant, at its shortest distance. A plant's parents
+    are the plants of the cross its seed's yield came from, and the plant that bore that yield. Kept up to date by
+    lineage.py; never written directly.
+    """
+    __tablename__ = 'plant_lineage'
+    ancestor_id = Column(Integer, ForeignKey('plants.plant_id', ondelete='CASCADE'), primary_key=True)
+    descendant_id = Column(Integer, ForeignKey('plants.plant_id', ondelete='CASCADE'), primary_key=True)
+    depth = Column(Integer, nullable=False)
+    # Plant ids from the ancestor down to the descendant, separated by "/"
+    path = Column(String(1024), nullable=False)
+
+    __table_args__ = (
+        Index('ix_plant_lineage_ancestor_id_depth', 'ancestor_id', 'depth'),
+        Index('ix_plant_lineage_descendant_id_depth', 'descendant_id', 'depth'),
+    )
+
+
+class GerminationRollup(Base):
+    """
+    Germination totals per seed and method (seed_id set) and per species, variety and method (seed_id null). Kept up
+    to date by rollups.py; never written directly.
+    """
+    __tablename__ = 'germination_rollup'
+    rollup_id = Column(Integer, primary_key=True, autoincrement=True)
+    seed_id = Column(Integer, ForeignKey('seeds.seed_id', ondelete='CASCADE'), nullable=True)
+    species = Column(String(255), nullable=True)
+    variety = Column(String(255), nullable=True)
+    method = Column(String(255), nullable=True)
+    sowings = Column(Integer, nullable=False)
+    seeds_attempted = Column(Integer, nullable=False)
+    seeds_successful = Column(Integer, nullable=False)
+    success_rate = Column(Float, nullable=True)
+    median_days = Column(Float, nullable=True)
+    # Sowings by days from planting to germination, as JSON {"days": sowings}, for the median
+    days_histogram = Column(Text, nullable=False)
+    # Digest of the rollup's key, (seed_id, method) or (species, variety, method); only the one for the row's kind is
+    # set. Unlike the nullable key columns themselves these can be unique, which keeps a rollup to one row.
+    seed_key = Column(String(64), nullable=True)
+    variety_key = Column(String(64), nullable=True)
+
+    __table_args__ = (
+        Index('ix_germination_rollup_seed_id_method', 'seed_id', 'method'),
+        Index('ix_germination_rollup_species_variety_method', 'species', 'variety', 'method'),
+        UniqueConstraint('seed_key', name='uq_germination_rollup_seed_key'),
+        UniqueConstraint('variety_key', name='uq_germination_rollup_variety_key'),
+    )
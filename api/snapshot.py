@@ -0,0 +1,191 @@
+"""
+A local, read-only SQLite copy of the schema tables for run_select_query, so ad-hoc analytics don't compete with
+writes on the production database. Enabled with ANALYTICS_SNAPSHOT=1.
+
+The copy is refreshed before a query once it is older than SNAPSHOT_MAX_AGE. A refresh appends rows whose primary
+key is past the last one copied, and re-copies in full any table this process has written to since. Updates and
+deletes made by other containers can only be seen by a full rebuild, which happens every SNAPSHOT_REBUILD_AGE.
+Building copies every table, so it is never done inside a request: the keep-warm step and manage.py do it, and
+until a container has a snapshot its queries run on the live database.
+Queries open the file read-only, behind an authorizer that only permits reads and a progress handler that stops
+them after QUERY_TIMEOUT_MS.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional
+
+from sqlalchemy import create_engine, select
+
+import cache
+import query_guard
+import query_pages
+import schema
+from database import get_engine
+from sql_analysis import Token
+
+logger = logging.getLogger()
+
+ENABLED = os.getenv("ANALYTICS_SNAPSHOT", "").lower() in ("1", "true", "yes")
+PATH = os.getenv("SNAPSHOT_PATH", "/tmp/analytics.db")
+# Seconds a snapshot may serve queries before it is refreshed.
+MAX_AGE = float(os.getenv("SNAPSHOT_MAX_AGE", 300))
+# Seconds between full rebuilds.
+REBUILD_AGE = float(os.getenv("SNAPSHOT_REBUILD_AGE", 3600))
+# Rows copied per INSERT batch.
+COPY_CHUNK_SIZE = 1000
+# SQLite virtual machine instructions between two checks of the query deadline.
+PROGRESS_INTERVAL = 10_000
+
+# What a query may do: read tables, call functions and run (recursive) SELECTs
+ALLOWED_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE}
+
+
+class SnapshotQueryError(Exception):
+    """
+    A query failed on the snapshot in a way the live database would not, such as a MySQL-only function.
+    """
+
+
+class Snapshot:
+    def __init__(self, path: str):
+        self.path = path
+        self.built_at = None
+        self.refreshed_at = None
+        # Last primary key copied, and the cache version seen, per table
+        self.last_pk = {}
+        self.versions = {}
+        self._lock = threading.Lock()
+
+    def age(self) -> Optional[float]:
+        return None if self.refreshed_at is None else time.time() - self.refreshed_at
+
+    def rebuilt_age(self) -> Optional[float]:
+        # Updates and deletes made by other containers are only as fresh as the last rebuild
+        return None if self.built_at is None else time.time() - self.built_at
+
+    def exists(self) -> bool:
+        return self.built_at is not None and os.path.exists(self.path)
+
+    def rebuild_due(self) -> bool:
+        return not self.exists() or time.time() - self.built_at > REBUILD_AGE
+
+    def _copy(self, source, target, table, last_pk: dict):
+        """
+        Appends the rows of `table` past last_pk[table.name], and moves it to the last one copied.
+        """
+        pk = table.primary_key.columns.values()[0]
+        stmt = select(table).order_by(pk)
+        if table.name in last_pk:
+            stmt = stmt.where(pk > last_pk[table.name])
+        result = source.execution_options(stream_results=True, max_row_buffer=COPY_CHUNK_SIZE).execute(stmt)
+        for rows in result.mappings().partitions(COPY_CHUNK_SIZE):
+            target.execute(table.insert(), [dict(row) for row in rows])
+            last_pk[table.name] = rows[-1][pk.name]
+
+    def refresh(self, full: bool = False):
+        """
+        Brings the snapshot up to date. A full refresh, which is also how the first snapshot is made, builds a new
+        file and swaps it in, so queries already running keep reading the old one.
+        """
+        with self._lock:
+            full = full or not self.exists()
+            path = f"{self.path}.building" if full else self.path
+            if full and os.path.exists(path):
+                os.remove(path)
+            # What has been copied is only recorded once the copy commits; a failed refresh leaves it as it was
+            last_pk = {} if full else dict(self.last_pk)
+            versions = dict(self.versions)
+            started = time.time()
+            target_engine = create_engine(f"sqlite:///{path}")
+            try:
+                if full:
+                    schema.Base.metadata.create_all(target_engine)
+                with get_engine().connect() as source, target_engine.begin() as target:
+                    for table in schema.Base.metadata.tables.values():
+                        version = cache.stamp([table.name])
+                        if not full and version != versions.get(table.name):
+                            # Written to through this process: updates and deletes can't be appended
+                            target.execute(table.delete())
+                            last_pk.pop(table.name, None)
+                        self._copy(source, target, table, last_pk)
+                        versions[table.name] = version
+            finally:
+                target_engine.dispose()
+            self.last_pk, self.versions = last_pk, versions
+            if full:
+                os.replace(path, self.path)
+                self.built_at = started
+            self.refreshed_at = started
+            logger.info("snapshot %s in %.0f ms", "rebuilt" if full else "refreshed", (time.time() - started) * 1000)
+
+    def ensure_fresh(self) -> bool:
+        """
+        Appends what is new once the snapshot is older than MAX_AGE. Returns False if there is no snapshot yet.
+        """
+        if not self.exists():
+            return False
+        if self.age() > MAX_AGE:
+            self.refresh()
+        return True
+
+    def maintain(self):
+        """
+        Rebuilds the snapshot once a rebuild is due, and otherwise keeps it fresh.
+        """
+        if self.rebuild_due():
+            self.refresh(full=True)
+        else:
+            self.ensure_fresh()
+
+    def connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        connection.set_authorizer(
+            lambda action, *args: sqlite3.SQLITE_OK if action in ALLOWED_ACTIONS else sqlite3.SQLITE_DENY)
+        return connection
+
+    def run_page(self, query: str, tokens: List[Token], fingerprint: str, token: Optional[str]) -> Optional[dict]:
+        """
+        Runs one bounded page of a query on the snapshot, the same way query_pages.run_page does on the live
+        database, and adds how old the data is. Returns None while there is no snapshot to run it on.
+        """
+        if not self.ensure_fresh():
+            return None
+        start = query_pages.decode_token(token, fingerprint) if token else 0
+        limited = query_pages.limit_query(query, tokens, start, query_pages.MAX_ROWS + 1)
+        deadline = time.monotonic() + query_guard.TIMEOUT_MS / 1000
+        connection = self.connect()
+        connection.set_progress_handler(lambda: time.monotonic() > deadline, PROGRESS_INTERVAL)
+        try:
+            cursor = connection.execute(limited)
+            page = query_pages.PageBuilder([column[0] for column in cursor.description or ()],
+                                           query_pages.MAX_ROWS, query_pages.MAX_BYTES)
+            truncated = False
+            while not truncated:
+                chunk = cursor.fetchmany(query_pages.CHUNK_SIZE)
+                if not chunk:
+                    break
+                truncated = not all(page.add(values) for values in chunk)
+        except sqlite3.OperationalError as e:
+            if time.monotonic() > deadline:
+                raise TimeoutError(str(e))
+            raise SnapshotQueryError(str(e))
+        except sqlite3.DatabaseError as e:
+            raise SnapshotQueryError(str(e))
+        finally:
+            connection.close()
+        return {**query_pages.response(page.rows, truncated, start, fingerprint), "snapshot_age_seconds": self.age(),
+                "snapshot_rebuilt_age_seconds": self.rebuilt_age()}
+
+
+snapshot = Snapshot(PATH)
+
+
+def warm():
+    """
+    Keep-warm step: builds, rebuilds and refreshes the snapshot off the request path.
+    """
+    if ENABLED:
+        snapshot.maintain()
@@ -0,0 +1,140 @@
+"""
+A small MySQL tokenizer for the raw queries sent to run_select_query: it turns a query into a fingerprint for the
+result cache and works out which of our tables the query reads.
+"""
+import re
+from typing import List, NamedTuple, Optional, Tuple
+
+import schema
+
+TOKEN = re.compile(r"""
+    (?P<hint>/\*[!+].*?\*/)                          # MySQL executable comments and optimizer hints are SQL
+  | (?P<comment>/\*.*?\*/|--(?:[ \t][^\n]*)?(?=\n|$)|\#[^\n]*)
+  | (?P<string>'(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.|"")*")
+  | (?P<quoted>`(?:[^`]|``)*`)
+  | (?P<space>\s+)
+  | (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<word>[A-Za-z_$][\w$]*)
+  | (?P<operator><=>|<=|>=|<>|!=|\|\||&&|:=|<<|>>)
+  | (?P<other>.)
+""", re.VERBOSE | re.DOTALL)
+
+# Reserved words can never be unquoted identifiers, so their case never changes what a query means
+RESERVED = {
+    "ALL", "AND", "AS", "ASC", "BETWEEN", "BY", "CASE", "CROSS", "DESC", "DISTINCT", "DIV", "ELSE", "EXISTS",
+    "FALSE", "FOR", "FROM", "GROUP", "HAVING", "IN", "INNER", "INTERVAL", "IS", "JOIN", "LEFT", "LIKE", "LIMIT",
+    "MOD", "NATURAL", "NOT", "NULL", "OFFSET", "ON", "OR", "ORDER", "OUTER", "OVER", "PARTITION", "RECURSIVE",
+    "REGEXP", "RIGHT", "RLIKE", "SELECT", "STRAIGHT_JOIN", "THEN", "TRUE", "UNION", "USING", "WHEN", "WHERE",
+    "WINDOW", "WITH", "XOR",
+}
+
+# Functions whose result changes between two runs of the same query; such queries are never cached
+VOLATILE = {
+    "BENCHMARK", "CONNECTION_ID", "CURDATE", "CURRENT_DATE", "CURRENT_TIME", "CURRENT_TIMESTAMP", "CURRENT_USER",
+    "CURTIME", "FOUND_ROWS", "GET_LOCK", "LAST_INSERT_ID", "LOCALTIME", "LOCALTIMESTAMP", "NOW", "RAND",
+    "ROW_COUNT", "SLEEP", "SYSDATE", "UNIX_TIMESTAMP", "UTC_DATE", "UTC_TIME", "UTC_TIMESTAMP", "UUID",
+    "UUID_SHORT",
+}
+
+# Schemas we don't write through the API, so nothing would invalidate a cached read of them
+FOREIGN_SCHEMAS = {"INFORMATION_SCHEMA", "MYSQL", "PERFORMANCE_SCHEMA", "SYS"}
+
+
+class Token(NamedTuple):
+    kind: str
+    text: str
+
+
+class Analysis(NamedTuple):
+    fingerprint: str
+    # Our tables the query reads, or None if its result can't be cached
+    tables: Optional[Tuple[str, ...]]
+
+
+def tokenize(query: str) -> List[Token]:
+    return [Token(match.lastgroup, match.group()) for match in TOKEN.finditer(query)]
+
+
+def _select_list(tokens: List[Token]) -> Optional[Tuple[int, int]]:
+    """
+    The token range of the outermost SELECT's column list, from after SELECT up to its FROM (or the end).
+    """
+    start = None
+    depth = 0
+    for index, token in enumerate(tokens):
+        if token.text == "(":
+            depth += 1
+        elif token.text == ")":
+            depth -= 1
+        elif token.kind == "word" and depth == 0:
+            word = token.text.upper()
+            if start is None and word == "SELECT":
+                start = index + 1
+            elif start is not None and word in ("FROM", "INTO", "UNION", "WHERE", "GROUP", "ORDER", "LIMIT"):
+                return start, index
+    return (start, len(tokens)) if start is not None else None
+
+
+def _normalize(tokens: List[Token]) -> List[str]:
+    return [token.text.upper() if token.kind == "word" and token.text.upper() in RESERVED else token.text
+            for token in tokens if token.kind not in ("space", "comment")]
+
+
+def fingerprint(query: str) -> str:
+    """
+    Normalizes whitespace, comments and keyword case. MySQL names an unaliased column after its text, so those
+    columns of the outermost select list are kept as written, apart from the space around them.
+    """
+    return _fingerprint(tokenize(query))
+
+
+def _column(tokens: List[Token]) -> str:
+    words = [token for token in tokens if token.kind not in ("space", "comment")]
+    if len(words) > 2 and words[-2].text.upper() == "AS":
+        # An aliased column is named after its alias, so the expression can be normalized like the rest
+        return " ".join(_normalize(words))
+    return "".join(token.text for token in tokens).strip()
+
+
+def _fingerprint(tokens: List[Token]) -> str:
+    bounds = _select_list(tokens)
+    if bounds is None:
+        return " ".join(_normalize(tokens))
+    start, end = bounds
+    columns, column, depth = [], [], 0
+    for token in tokens[start:end]:
+        depth += token.text == "("
+        depth -= token.text == ")"
+        if token.text == "," and depth == 0:
+            columns.append(column)
+            column = []
+        else:
+            column.append(token)
+    columns.append(column)
+    select_list = ", ".join(_column(column) for column in columns)
+    return " ".join(_normalize(tokens[:start]) + [select_list] + _normalize(tokens[end:]))
+
+
+def analyze(query: str, tokens: Optional[List[Token]] = None) -> Analysis:
+    """
+    Fingerprints a query and finds the tables it reads. Table names are matched case-insensitively, so a column
+    that happens to share a table's name only makes the entry a little easier to invalidate.
+    """
+    tables = {name.upper(): name for name in schema.Base.metadata.tables}
+    read = set()
+    cacheable = True
+    if tokens is None:
+        tokens = tokenize(query)
+    for token in tokens:
+        if token.kind not in ("word", "quoted"):
+            continue
+        word = token.text.strip("`").upper()
+        if word in tables:
+            read.add(tables[word])
+        elif word in FOREIGN_SCHEMAS:
+            cacheable = False
+        elif word in VOLATILE and token.kind == "word":
+            cacheable = False
+    if not read:
+        cacheable = False
+    return Analysis(_fingerprint(tokens), tuple(sorted(read)) if cacheable else None)
@@ -0,0 +1,63 @@
+import json
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from fastapi import Request
+from sqlalchemy import Select
+from sqlalchemy.engine import Engine
+from starlette.responses import StreamingResponse
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Rows fetched from the server-side cursor per round trip, and rows encoded per chunk written to the client.
+STREAM_CHUNK_SIZE = 500
+
+
+def wants_ndjson(request: Request) -> bool:
+    """
+    Streaming is opt-in: only clients that explicitly accept NDJSON get it.
+    """
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def _encode_value(value):
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, bytes):
+        return value.decode(errors="replace")
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _ndjson_chunks(engine: Engine, execute):
+    # The request's Session is closed before the body is sent, so the stream owns its own connection.
+    with engine.connect() as connection:
+        connection = connection.execution_options(stream_results=True, max_row_buffer=STREAM_CHUNK_SIZE)
+        result = execute(connection)
+        for rows in result.mappings().partitions(STREAM_CHUNK_SIZE):
+            yield "".join(json.dumps(dict(row), default=_encode_value) + "\n" for row in rows).encode()
+
+
+def stream_select(engine: Engine, stmt: Select) -> StreamingResponse:
+    """
+    Streams a SELECT as one JSON object per line, read from an unbuffered server-side cursor in chunks, so memory
+    stays bounded by the chunk size rather than the result size.
+
+    Under uvicorn the chunks go out as they are produced. Mangum has to collect the whole body for the Lambda
+    response, so there the output is buffered but the database side is still read in bounded chunks.
+    """
+    return StreamingResponse(_ndjson_chunks(engine, lambda connection: connection.execute(stmt)),
+                             media_type=NDJSON_MEDIA_TYPE)
+
+
+def stream_sql(engine: Engine, query: str) -> StreamingResponse:
+    """
+    Same as stream_select, for a raw SQL string that has already been validated.
+    """
+    return StreamingResponse(
+        _ndjson_chunks(engine, lambda connection: connection.execution_options(no_parameters=True)
+                       .exec_driver_sql(query)),
+        media_type=NDJSON_MEDIA_TYPE)
@@ -0,0 +1,165 @@
+"""
+Bulk ingestion of sensor readings into hydroponic_conditions. A batch is a JSON object of parallel columns, one
+entry per reading, so hundreds of readings from many systems arrive in one request:
+
+    {"system_id": [1, 1, 2], "recorded_at": [1712390400, 1712390460, 1712390400],
+     "water_ph": [6.1, 6.1, null], "electrical_conductivity_us_cm": [1450, 1452, 980], "water_temperature_f": [...]}
+
+system_id may also be a single number for a batch from one system, and recorded_at is in Unix seconds. The columns
+are validated as NumPy arrays, not a Pydantic object per reading, and the batch is written with one executemany
+INSERT. A batch is all or nothing: any bad reading rejects it with the positions at fault.
+"""
+import json
+import time
+from typing import List
+
+from fastapi import HTTPException
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+import cache
+import crud
+import schema
+from database import new_session
+
+HydroponicCondition, HydroponicSystem = schema.HydroponicCondition, schema.HydroponicSystem
+
+MAX_READINGS = 10000
+
+# Plausible range of each reading; anything outside is a sensor fault, not water
+BOUNDS = {
+    "water_ph": (0.0, 14.0),
+    "electrical_conductivity_us_cm": (0.0, 20000.0),
+    "water_temperature_f": (32.0, 140.0),
+}
+
+# Readings must be after this (2000-01-01) and at most this many seconds in the future, for clock skew
+EARLIEST = 946684800
+MAX_AHEAD = 3600
+
+# Positions listed in an error message
+MAX_REPORTED = 10
+
+
+def reject(message: str):
+    raise HTTPException(status_code=400, detail=message)
+
+
+def positions(np, bad) -> str:
+    found = np.flatnonzero(bad)
+    listed = ", ".join(str(position) for position in found[:MAX_REPORTED])
+    return listed + (f" and {len(found) - MAX_REPORTED} more" if len(found) > MAX_REPORTED else "")
+
+
+def column(np, batch: dict, name: str, size: int):
+    """
+    A column as a float array, NaN for nulls. A missing column is all nulls.
+    """
+    values = batch.get(name)
+    if values is None:
+        return np.full(size, np.nan)
+    if not isinstance(values, list) or len(values) != size:
+        reject(f"{name} must be a list of {size} readings, like recorded_at.")
+    # NumPy would read true, false and numeric strings as numbers
+    if not all(value is None or isinstance(value, (int, float)) and not isinstance(value, bool) for value in values):
+        reject(f"{name} must hold numbers or nulls.")
+    return np.array(values, dtype=float)
+
+
+def validate(batch) -> dict:
+    """
+    Checks a batch and returns its columns as arrays: system_id as integers, recorded_at as datetime64, readings
+    as floats with NaN for nulls.
+    """
+    import numpy as np
+
+    if not isinstance(batch, dict):
+        reject("Send an object of columns: system_id, recorded_at and the readings.")
+    unknown = set(batch) - {"system_id", "recorded_at", *BOUNDS}
+    if unknown:
+        reject(f"Unknown columns: {', '.join(sorted(unknown))}.")
+    recorded_at = batch.get("recorded_at")
+    if not isinstance(recorded_at, list) or not recorded_at:
+        reject("recorded_at must be a non-empty list of Unix timestamps.")
+    size = len(recorded_at)
+    if size > MAX_READINGS:
+        reject(f"At most {MAX_READINGS} readings per batch, got {size}.")
+
+    seconds = column(np, batch, "recorded_at", size)
+    bad = ~((seconds >= EARLIEST) & (seconds <= time.time() + MAX_AHEAD))
+    if bad.any():
+        reject(f"recorded_at is missing or not a plausible Unix time at readings {positions(np, bad)}.")
+
+    system_id = batch.get("system_id")
+    systems = np.full(size, system_id, dtype=float) if isinstance(system_id, (int, float)) \
+        and not isinstance(system_id, bool) else column(np, batch, "system_id", size)
+    bad = ~(np.isfinite(systems) & (systems == np.round(systems)) & (systems > 0))
+    if bad.any():
+        reject(f"system_id is missing or not an id at readings {positions(np, bad)}.")
+
+    readings = {name: column(np, batch, name, size) for name in BOUNDS}
+    for name, (low, high) in BOUNDS.items():
+        values = readings[name]
+        # NaN compares false both ways, so nulls pass
+        bad = (values < low) | (values > high)
+        if bad.any():
+            reject(f"{name} is outside {low:g}-{high:g} at readings {positions(np, bad)}.")
+    bad = np.all([np.isnan(values) for values in readings.values()], axis=0)
+    if bad.any():
+        reject(f"Readings {positions(np, bad)} have no values.")
+
+    return {
+        "system_id": systems.astype(np.int64),
+        "recorded_at": (seconds * 1e6).astype(np.int64).astype("datetime64[us]"),
+        **readings,
+    }
+
+
+def rows(columns: dict) -> List[dict]:
+    """
+    The batch as rows to insert, with each reading's UTC date in `date` for the date-based filters.
+    """
+    import numpy as np
+
+    values = {
+        "system_id": columns["system_id"].tolist(),
+        "date": columns["recorded_at"].astype("datetime64[D]").tolist(),
+        "recorded_at": columns["recorded_at"].tolist(),
+    }
+    for name in BOUNDS:
+        # An object array keeps None for nulls through tolist()
+        readings = columns[name].astype(object)
+        readings[np.isnan(columns[name])] = None
+        values[name] = readings.tolist()
+    names = list(values)
+    return [dict(zip(names, row)) for row in zip(*values.values())]
+
+
+def ingest(db: Session, batch) -> dict:
+    import numpy as np
+
+    columns = validate(batch)
+    systems = np.unique(columns["system_id"]).tolist()
+    known = set(db.execute(select(HydroponicSystem.system_id)
+                           .where(HydroponicSystem.system_id.in_(systems))).scalars())
+    if len(known) < len(systems):
+        missing = [system for system in systems if system not in known]
+        raise HTTPException(status_code=404, detail=f"Unknown hydroponic systems: {', '.join(map(str, missing))}.")
+    written = rows(columns)
+    db.execute(insert(HydroponicCondition.__table__), written)
+    crud.run_hooks(db, HydroponicCondition, [], written)
+    db.commit()
+    cache.bump(*crud.written_tables(HydroponicCondition, "upsert"))
+    return {"inserted": len(written), "systems": systems}
+
+
+def receive(body: bytes) -> dict:
+    try:
+        batch = json.loads(body)
+    except ValueError:
+        reject("The body must be JSON.")
+    db = new_session()
+    try:
+        return ingest(db, batch)
+    finally:
+        db.close()
@@ -0,0 +1,128 @@
+"""
+Checks that a query sent to run_select_query is a SELECT.
+
+The original sqlparse-based check is kept as the reference. Most queries are decided by a single pass over the
+tokens from sql_analysis instead; anything that pass is not sure about still goes to sqlparse. Verdicts are
+memoized, so a repeated query is never validated twice.
+"""
+import time
+from typing import List, Optional
+
+from fastapi import HTTPException
+
+from cache import MISSING, VersionedCache
+from sql_analysis import RESERVED, Token, tokenize
+
+INVALID = "Invalid SQL query."
+NOT_SELECT = "Only SELECT statements are allowed."
+SUBQUERY = "Subqueries must be SELECT-only."
+
+# Returned by fast_verdict when only sqlparse can tell
+UNDECIDED = object()
+# Keywords that close sqlparse's WHERE group
+WHERE_END = {"EXCEPT", "GROUP", "HAVING", "INTO", "LIMIT", "ORDER", "RETURNING", "UNION"}
+
+# Verdicts never go stale, so entries only leave by eviction. Keyed by the exact query text: the fingerprint drops
+# the leading whitespace and spacing that sqlparse's verdict depends on.
+verdict_cache = VersionedCache(ttl=float("inf"))
+# CPU time spent validating, and how the verdicts were reached
+validator_stats = {"cpu_seconds": 0.0, "fast": 0, "sqlparse": 0}
+
+
+def has_subquery(parsed_query):
+    import sqlparse
+    for token in parsed_query.tokens:
+        if isinstance(token, sqlparse.sql.Parenthesis):
+            subquery = token.get_real_name()
+            if subquery.strip().lower().startswith("select"):
+                return True
+    return False
+
+
+def is_select_only_subquery(subquery):
+    import sqlparse
+    for token in subquery.tokens:
+        if isinstance(token, sqlparse.sql.Token) and token.value.lower() not in (
+                "select", "from", "where", "join", "left", "right", "inner", "outer"):
+            return False
+    return True
+
+
+def sqlparse_verdict(query: str) -> Optional[str]:
+    """
+    The reference check: the error message for a rejected query, or None if it may run.
+    """
+    # sqlparse is only needed here, so it stays out of the cold start
+    import sqlparse
+
+    # Parse the SQL query to check if it's a SELECT statement
+    parsed_query = sqlparse.parse(query)
+
+    # Check that the first token is a SELECT keyword
+    if not parsed_query:
+        return INVALID
+
+    first_token = parsed_query[0].tokens[0].value.lower()
+    if first_token != "select":
+        return NOT_SELECT
+
+    # Check for subqueries in the parsed query
+    if has_subquery(parsed_query[0]):
+        for subquery in parsed_query[0].get_sublists():
+            if not is_select_only_subquery(subquery):
+                return SUBQUERY
+    return None
+
+
+def fast_verdict(tokens: List[Token]):
+    """
+    Decides the common cases the same way sqlparse_verdict does: empty queries, queries that don't start with the
+    SELECT keyword, and single SELECTs whose parentheses are function calls or sit in the WHERE clause, which
+    sqlparse groups before looking for subqueries. Anything else (several statements, bracketed columns, subqueries
+    outside WHERE, a comment right after SELECT, which sqlparse may not split from the keyword) is UNDECIDED.
+    """
+    if all(token.kind == "space" for token in tokens):
+        return INVALID
+    first = tokens[0]
+    if first.kind != "word" or first.text.lower() != "select":
+        return NOT_SELECT
+    if len(tokens) > 1 and tokens[1].kind != "space" and tokens[1].text != "*":
+        return UNDECIDED
+    in_where = False
+    depth = 0
+    for previous, token in zip(tokens, tokens[1:]):
+        if token.text == ";":
+            return UNDECIDED
+        if token.text == "(":
+            # Outside WHERE only a function call, with no space before its bracket, is grouped away
+            if not in_where and (previous.kind != "word" or previous.text.upper() in RESERVED):
+                return UNDECIDED
+            depth += 1
+        elif token.text == ")":
+            depth -= 1
+        elif token.kind == "word" and depth == 0:
+            word = token.text.upper()
+            if word == "WHERE":
+                in_where = True
+            elif word in WHERE_END:
+                in_where = False
+    return None
+
+
+def validate_select(query: str, tokens: Optional[List[Token]] = None):
+    """
+    Raises a 400 unless the query is a SELECT.
+    """
+    verdict = verdict_cache.get(query, ())
+    if verdict is MISSING:
+        start = time.process_time()
+        verdict = fast_verdict(tokens if tokens is not None else tokenize(query))
+        if verdict is UNDECIDED:
+            verdict = sqlparse_verdict(query)
+            validator_stats["sqlparse"] += 1
+        else:
+            validator_stats["fast"] += 1
+        validator_stats["cpu_seconds"] += time.process_time() - start
+        verdict_cache.put(query, (), verdict)
+    if verdict is not None:
+        raise HTTPException(status_code=400, detail=verdict)
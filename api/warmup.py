@@ -0,0 +1,31 @@
+import logging
+import time
+
+logger = logging.getLogger()
+
+
+def is_scheduled_event(event) -> bool:
+    """
+    The KeepWarmSchedule rule invokes the function with an EventBridge "Scheduled Event", which is not an HTTP
+    event Mangum could handle.
+    """
+    return isinstance(event, dict) and event.get("source") == "aws.events" \
+        and event.get("detail-type") == "Scheduled Event"
+
+
+def warm(steps) -> dict:
+    """
+    Runs each (name, callable) warm-up step and reports how long it took. A failing step is logged and reported
+    but doesn't stop the others, so one bad ping never fails the scheduled invocation.
+    """
+    started = time.perf_counter()
+    report = {}
+    for name, step in steps:
+        step_started = time.perf_counter()
+        try:
+            step()
+            report[name] = round((time.perf_counter() - step_started) * 1000, 2)
+        except Exception as e:
+            logger.warning("warm-up step %s failed: %s", name, e)
+            report[name] = f"failed: {e}"
+    return {"warmed": report, "duration_ms": round((time.perf_counter() - started) * 1000, 2)}
@@ -0,0 +1,93 @@
+"""
+Compares read throughput of the async endpoints with the sync, threadpool-bound version they replaced, at 1, 16 and
+64 concurrent clients. Both apps run in-process behind the same ASGI transport and read the same page of seeds;
+the sync one uses a Session from database.py exactly as the old endpoints did.
+
+Runs against DATABASE_URL if set (a MySQL server gives the representative numbers, since the point is waiting on
+the network), otherwise a throwaway SQLite file. Both pools get DB_POOL_SIZE / DB_ASYNC_POOL_SIZE connections, 10
+by default here, like the container deployment.
+
+    python benchmarks/bench_concurrency.py [requests per level]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+os.environ.setdefault("API_KEY", "bench")
+os.environ.setdefault("DB_POOL_SIZE", "10")
+os.environ.setdefault("DB_ASYNC_POOL_SIZE", "10")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "api"))
+
+import httpx  # noqa: E402
+from fastapi import Depends, FastAPI  # noqa: E402
+from sqlalchemy import select  # noqa: E402
+
+import database  # noqa: E402
+import main  # noqa: E402
+import schema  # noqa: E402
+from pagination import PageParams, build_page, keyset_page  # noqa: E402
+
+CLIENTS = (1, 16, 64)
+PAGE_SIZE = 50
+
+legacy = FastAPI()
+
+
+@legacy.get("/seeds/{seed_id}")
+def legacy_read_seed(seed_id: int, page: PageParams = Depends(), db=Depends(main.get_db)):
+    rows = db.execute(keyset_page(select(schema.Seed), schema.Seed.seed_id, page.size + 1, page.after)).scalars().all()
+    return build_page(rows, "seed_id", page.size)
+
+
+def seed_rows(count: int):
+    engine = database.get_engine()
+    schema.Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        existing = connection.execute(select(schema.Seed.seed_id).limit(1)).first()
+        if existing is None:
+            connection.execute(schema.Seed.__table__.insert(),
+                               [{"species": "C. annuum", "variety": f"bench-{i}"} for i in range(count)])
+
+
+async def run_level(app, clients: int, requests: int):
+    transport = httpx.ASGITransport(app=app)
+    timings = []
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench",
+                                 headers={"api-key": os.environ["API_KEY"]}) as client:
+        remaining = requests
+
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                start = time.perf_counter()
+                response = await client.get("/seeds/0", params={"limit": PAGE_SIZE})
+                response.raise_for_status()
+                timings.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(clients)))
+        elapsed = time.perf_counter() - start
+
+    return requests / elapsed, statistics.quantiles(timings, n=100)[94]
+
+
+async def run(requests: int):
+    seed_rows(PAGE_SIZE * 4)
+    await database.connected_database()
+    print(f"{requests} requests per level against {os.environ['DATABASE_URL'].split('@')[-1]}")
+    print(f"{'clients':>7}  {'sync req/s':>10}  {'sync p95':>9}  {'async req/s':>11}  {'async p95':>9}")
+    for clients in CLIENTS:
+        sync_rps, sync_p95 = await run_level(legacy, clients, requests)
+        async_rps, async_p95 = await run_level(main.app, clients, requests)
+        print(f"{clients:>7}  {sync_rps:>10.0f}  {sync_p95:>6.2f} ms  {async_rps:>11.0f}  {async_p95:>6.2f} ms")
+    await database.disconnect_database()
+
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 500))
@@ -0,0 +1,97 @@
+"""
+Times the growth analytics on synthetic observations: the vectorized fits in growth.analyze against the per-plant
+loop they avoid (np.polyfit on each plant's slice), then the whole growth=true computation of readObservation, fetch
+included, against a throwaway SQLite file holding the same observations.
+
+    python benchmarks/bench_growth.py [plants] [observations per plant]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+os.environ.setdefault("API_KEY", "bench")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "api"))
+
+import numpy as np  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+import database  # noqa: E402
+import growth  # noqa: E402
+import schema  # noqa: E402
+
+ROUNDS = 5
+
+
+def synthetic(plants: int, per_plant: int, rng):
+    """
+    Sorted columns of S-curve heights with noise, every few days, and some heights missing.
+    """
+    plant_ids = np.repeat(np.arange(1, plants + 1), per_plant)
+    days = np.tile(np.arange(per_plant) * 3.0, plants) + 738000
+    ceiling = np.repeat(rng.uniform(40, 120, plants), per_plant)
+    rate = np.repeat(rng.uniform(0.05, 0.2, plants), per_plant)
+    midpoint = np.repeat(rng.uniform(30, 90, plants), per_plant) + 738000
+    heights = ceiling / (1 + np.exp(-rate * (days - midpoint))) + rng.normal(0, 1, len(days))
+    heights[rng.random(len(days)) < 0.05] = np.nan
+    leaves = np.floor(heights / 4)
+    return plant_ids, days, heights, leaves
+
+
+def per_plant_loop(plant_ids, days, heights, leaves):
+    # The straightforward version: slice every plant out and fit it on its own
+    results = {}
+    for plant_id in np.unique(plant_ids):
+        rows = plant_ids == plant_id
+        x, y = days[rows] - days[rows][0], heights[rows]
+        known = ~np.isnan(y)
+        if known.sum() >= growth.MIN_POINTS:
+            slope = np.polyfit(x[known], y[known], 1)[0]
+            ceiling = growth.CEILING * y[known].max()
+            usable = known & (y > 0)
+            rate = np.polyfit(x[usable], np.log(y[usable] / (ceiling - y[usable])), 1)[0]
+            results[plant_id] = (slope, rate)
+    return results
+
+
+def timed(label: str, fn, observations: int):
+    timings = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    best, median = min(timings), statistics.median(timings)
+    print(f"{label:<28} median {median * 1000:9.1f} ms   best {best * 1000:9.1f} ms   "
+          f"{observations / best / 1e6:6.2f} M observations/s")
+
+
+def main(plants: int, per_plant: int):
+    rng = np.random.default_rng(7)
+    columns = synthetic(plants, per_plant, rng)
+    observations = len(columns[0])
+    print(f"{plants} plants, {observations} observations")
+
+    timed("vectorized", lambda: growth.analyze(*columns), observations)
+    timed("per-plant loop", lambda: per_plant_loop(*columns), observations)
+
+    engine = database.get_engine()
+    schema.Base.metadata.create_all(engine)
+    plant_ids, days, heights, leaves = columns
+    with engine.begin() as connection:
+        connection.execute(insert(schema.Plant), [{"plant_id": int(plant_id), "planted_date": date(2021, 9, 1)}
+                                                  for plant_id in range(1, plants + 1)])
+        connection.execute(insert(schema.Observation), [
+            {"plant_id": int(plant_id), "date": date.fromordinal(int(day)),
+             "height_cm": None if np.isnan(height) else float(height),
+             "leaf_count": None if np.isnan(leaf) else int(leaf)}
+            for plant_id, day, height, leaf in zip(plant_ids, days, heights, leaves)])
+    print(f"\nend to end against {engine.dialect.name}")
+    for cohort in (None, "variety"):
+        timed(f"growth.read cohort={cohort}", lambda: growth.read(None, cohort, 30.0, 100), observations)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000, int(sys.argv[2]) if len(sys.argv) > 2 else 60)
@@ -0,0 +1,70 @@
+"""
+Compares sensor ingestion through upsertHydroponicCondition, one request per reading, with the columnar telemetry
+endpoint at a few batch sizes. Both go through the real app behind an in-process ASGI transport, so JSON, validation
+and the write are all counted; readings come from 20 systems, one a minute.
+
+Runs against DATABASE_URL if set, otherwise a throwaway SQLite file.
+
+    python benchmarks/bench_telemetry.py [readings per batch size]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+os.environ.setdefault("API_KEY", "bench")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "api"))
+
+import httpx  # noqa: E402
+
+import database  # noqa: E402
+import main  # noqa: E402
+import schema  # noqa: E402
+
+SYSTEMS = 20
+BATCH_SIZES = (100, 1000, 5000)
+# The one-request-per-reading path is slow enough that a sample is plenty
+SINGLE_READINGS = 500
+
+
+def readings(count: int, systems, start: int):
+    for i in range(count):
+        yield systems[i % len(systems)], start + 60 * (i // len(systems)), 5.8 + (i % 7) / 10, 1400.0 + i % 50, 68.0
+
+
+async def run(count: int):
+    schema.Base.metadata.create_all(database.get_engine())
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench",
+                                 headers={"api-key": os.environ["API_KEY"]}) as client:
+        systems = [(await client.post("/hydroponic_systems/", json={"system_type": "NFT"})).json()["system_id"]
+                   for _ in range(SYSTEMS)]
+        start = int(time.time()) - 30 * 86400
+
+        began = time.perf_counter()
+        for system_id, recorded_at, ph, ec, temperature in readings(SINGLE_READINGS, systems, start):
+            response = await client.post("/hydroponic_conditions/", json={
+                "system_id": system_id, "date": time.strftime("%Y-%m-%d", time.gmtime(recorded_at)),
+                "water_ph": ph, "electrical_conductivity_us_cm": ec, "water_temperature_f": temperature})
+            response.raise_for_status()
+        elapsed = time.perf_counter() - began
+        print(f"{'one request per reading':<28} {SINGLE_READINGS:>7} readings   {SINGLE_READINGS / elapsed:9.0f}/s")
+
+        for batch_size in BATCH_SIZES:
+            rows = list(readings(count, systems, start))
+            batches = [rows[i:i + batch_size] for i in range(0, len(rows), batch_size)]
+            bodies = [{name: list(values) for name, values in zip(
+                ("system_id", "recorded_at", "water_ph", "electrical_conductivity_us_cm", "water_temperature_f"),
+                zip(*batch))} for batch in batches]
+            began = time.perf_counter()
+            for body in bodies:
+                response = await client.post("/telemetry/hydroponic_conditions/", json=body)
+                response.raise_for_status()
+            elapsed = time.perf_counter() - began
+            print(f"{f'telemetry, {batch_size} per batch':<28} {count:>7} readings   {count / elapsed:9.0f}/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000))
@@ -0,0 +1,105 @@
+"""
+Compares the old select-then-write-then-refresh upsert with crud.upsert, and one-at-a-time logging of a
+measurement round with a single array upsert.
+
+Reports database round trips per call (statements plus commits) and p50/p95 latency for inserts and updates.
+Runs against DATABASE_URL if set (e.g. a local MySQL container), otherwise a throwaway SQLite file.
+
+    python benchmarks/bench_upsert.py [iterations]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "api"))
+
+from sqlalchemy import create_engine, event  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+import models  # noqa: E402
+import schema  # noqa: E402
+from crud import upsert  # noqa: E402
+
+
+def legacy_upsert(db, observation: models.Observation):
+    db_observation = db.query(schema.Observation).filter(
+        schema.Observation.observation_id == observation.observation_id).first()
+    if db_observation is None:
+        db_observation = schema.Observation(**observation.dict())
+        db.add(db_observation)
+        db.commit()
+        db.refresh(db_observation)
+        return db_observation
+    else:
+        for key, value in observation.dict().items():
+            setattr(db_observation, key, value)
+        db.commit()
+        return db_observation
+
+
+class RoundTripCounter:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._bump)
+        event.listen(engine, "commit", self._bump)
+
+    def _bump(self, *args, **kwargs):
+        self.count += 1
+
+
+def run(label, fn, session_factory, counter, payloads):
+    timings = []
+    counter.count = 0
+    for payload in payloads:
+        db = session_factory()
+        try:
+            start = time.perf_counter()
+            fn(db, payload)
+            timings.append((time.perf_counter() - start) * 1000)
+        finally:
+            db.close()
+    quantiles = statistics.quantiles(timings, n=100)
+    print(f"{label:<24} round trips/call {counter.count / len(payloads):5.2f}   "
+          f"p50 {quantiles[49]:7.3f} ms   p95 {quantiles[94]:7.3f} ms")
+
+
+def main(iterations: int):
+    url = os.getenv("DATABASE_URL")
+    if url is None:
+        url = f"sqlite:///{tempfile.mkdtemp()}/bench_upsert.db"
+    engine = create_engine(url)
+    schema.Base.metadata.create_all(engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    counter = RoundTripCounter(engine)
+
+    with session_factory() as db:
+        plant_id = upsert(db, schema.Plant, models.Plant())["plant_id"]
+
+    def new_observations():
+        return [models.Observation(plant_id=plant_id, date=date.today(), height_cm=float(i), leaf_count=i)
+                for i in range(iterations)]
+
+    print(f"{iterations} calls each against {engine.dialect.name}")
+    for label, fn in (("legacy", legacy_upsert), ("single statement", lambda db, o: upsert(db, schema.Observation, o))):
+        inserted = []
+        run(f"{label} insert", lambda db, o: inserted.append(fn(db, o)), session_factory, counter,
+            new_observations())
+        ids = [row["observation_id"] if isinstance(row, dict) else row.observation_id for row in inserted]
+        updates = [models.Observation(observation_id=observation_id, plant_id=plant_id, date=date.today(),
+                                      height_cm=1.0, comments="updated") for observation_id in ids]
+        run(f"{label} update", fn, session_factory, counter, updates)
+
+    batch_size = 40
+    rounds = max(iterations // batch_size, 2)
+    print(f"\n{rounds} measurement rounds of {batch_size} observations")
+    run("one request per item", lambda db, batch: [upsert(db, schema.Observation, o) for o in batch],
+        session_factory, counter, [new_observations()[:batch_size] for _ in range(rounds)])
+    run("one array upsert", lambda db, batch: upsert(db, schema.Observation, batch),
+        session_factory, counter, [new_observations()[:batch_size] for _ in range(rounds)])
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,52 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+API_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir, "api"))
+sys.path.insert(0, API_DIR)
+
+# The API reads its configuration lazily, so pointing it at a throwaway SQLite file before the first request is
+# enough to run it without MySQL
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/plants.db"
+os.environ["API_KEY"] = "test-api-key"
+
+
+@pytest.fixture(scope="session")
+def app():
+    import database
+    import main
+    import schema
+    schema.Base.metadata.create_all(database.get_engine())
+    return main.app
+
+
+@pytest.fixture()
+def client(app):
+    from fastapi.testclient import TestClient
+    with TestClient(app, headers={"api-key": os.environ["API_KEY"]}) as client:
+        yield client
+
+
+@pytest.fixture()
+def new_plant(client):
+    def new_plant(parent=None, cross_id=None):
+        """
+        A plant grown from seed of `parent`'s yield: from the cross `cross_id` if given, otherwise selfed. Without
+        a parent, a plant of unknown origin.
+        """
+        if parent is None:
+            return client.post("/plants/", json={}).json()["plant_id"]
+        results = client.post("/batch/", json={"operations": [
+            {"resource": "yields", "verb": "upsert",
+             "payload": {"plant_id": parent, "cross_id": cross_id, "date": "2024-08-01", "color": "red",
+                         "texture": "smooth"}},
+            {"resource": "seeds", "verb": "upsert", "payload": {"yield_id": "$0", "species": "C. annuum"}},
+            {"resource": "germinations", "verb": "upsert",
+             "payload": {"seed_id": "$1", "planted_date": "2025-01-15", "seeds_attempted": 4, "method": "soil"}},
+            {"resource": "plants", "verb": "upsert", "payload": {"germination_id": "$2"}},
+        ]}).json()["results"]
+        return results[3]["plant_id"]
+
+    return new_plant
@@ -0,0 +1,33 @@
+import inspect
+
+
+def test_reads_run_on_the_async_pool(client):
+    import database
+    import main
+
+    seed = client.post("/seeds/", json={"species": "C. annuum", "variety": "Async:Red"}).json()
+
+    assert client.get(f"/seeds/{seed['seed_id']}").json() == seed
+    assert seed in client.get("/seeds/0", params={"limit": 500}).json()["items"]
+    assert client.get("/seeds/999999").status_code == 404
+    assert database.get_database().is_connected
+    reads = [route.endpoint for route in main.app.routes
+             if route.name.startswith("read_") or route.name == "run_select_query"]
+    assert len(reads) == 11
+    assert all(inspect.iscoroutinefunction(endpoint) for endpoint in reads)
+
+
+def test_raw_queries_keep_colons_and_percent_signs(client):
+    client.post("/seeds/", json={"species": "C. baccatum", "variety": "Raw:Yellow"})
+
+    response = client.post("/run_select_query/", params={
+        "query": "SELECT variety, '10:30' AS planted_at FROM seeds WHERE variety LIKE 'Raw:%'"})
+
+    assert response.status_code == 200
+    assert response.json()["rows"] == [{"variety": "Raw:Yellow", "planted_at": "10:30"}]
+
+
+def test_raw_query_errors_are_still_400s(client):
+    response = client.post("/run_select_query/", params={"query": "SELECT nope FROM seeds"})
+
+    assert response.status_code == 400
@@ -0,0 +1,90 @@
+def test_entries_are_dropped_when_their_tables_change():
+    from cache import MISSING, VersionedCache, bump, stamp
+
+    cache = VersionedCache(max_entries=4)
+    cache.put("plants", stamp(["test_plants"]), ["tomato"])
+
+    assert cache.get("plants", ("test_plants",)) == ["tomato"]
+    bump("test_plants")
+    assert cache.get("plants", ("test_plants",)) is MISSING
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_concurrent_bumps_are_all_counted():
+    from concurrent.futures import ThreadPoolExecutor
+
+    from cache import bump, stamp
+
+    (before,) = stamp(["test_concurrent"])
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        for _ in range(8):
+            pool.submit(lambda: [bump("test_concurrent") for _ in range(1000)])
+
+    assert stamp(["test_concurrent"]) == (before + 8000,)
+
+
+def test_least_recently_used_entry_is_evicted():
+    from cache import MISSING, VersionedCache, stamp
+
+    cache = VersionedCache(max_entries=2)
+    cache.put("a", stamp([]), 1)
+    cache.put("b", stamp([]), 2)
+    cache.get("a", ())
+    cache.put("c", stamp([]), 3)
+
+    assert cache.get("b", ()) is MISSING
+    assert cache.get("a", ()) == 1
+    assert cache.get("c", ()) == 3
+
+
+def test_entries_expire_after_the_ttl():
+    from cache import MISSING, VersionedCache, stamp
+
+    cache = VersionedCache(ttl=0)
+    cache.put("a", stamp([]), 1)
+
+    assert cache.get("a", ()) is MISSING
+
+
+def test_reads_are_cached_until_a_write(client):
+    from cache import read_cache
+
+    seed = client.post("/seeds/", json={"species": "C. annuum", "variety": "Cached"}).json()
+    first = client.get(f"/seeds/{seed['seed_id']}").json()
+    hits = read_cache.hits
+
+    assert client.get(f"/seeds/{seed['seed_id']}").json() == first
+    assert read_cache.hits == hits + 1
+
+    client.post("/seeds/", json={**seed, "variety": "Updated"})
+    assert client.get(f"/seeds/{seed['seed_id']}").json()["variety"] == "Updated"
+
+    client.delete(f"/seeds/{seed['seed_id']}")
+    assert client.get(f"/seeds/{seed['seed_id']}").status_code == 404
+
+
+def test_batches_invalidate_every_table_they_touch(client):
+    plants = client.get("/plants/0", params={"limit": 500}).json()["items"]
+
+    client.post("/batch/", json={"operations": [
+        {"resource": "plants", "verb": "upsert", "payload": {"comments": "Batch plant"}},
+    ]})
+
+    assert len(client.get("/plants/0", params={"limit": 500}).json()["items"]) == len(plants) + 1
+
+
+def test_repeated_queries_are_cached_until_a_write(client):
+    from cache import query_cache
+
+    client.post("/hydroponic_systems/", json={"system_type": "NFT rail"})
+    count = client.post("/run_select_query/", params={"query": "SELECT count(*) AS n FROM hydroponic_system"})
+    hits = query_cache.hits
+
+    again = client.post("/run_select_query/", params={"query": "select count(*) as n\n  from hydroponic_system"})
+    assert again.json() == count.json()
+    assert query_cache.hits == hits + 1
+
+    client.post("/hydroponic_systems/", json={"system_type": "Ebb and flow"})
+    after = client.post("/run_select_query/", params={"query": "SELECT count(*) AS n FROM hydroponic_system"})
+    assert after.json()["rows"][0]["n"] == count.json()["rows"][0]["n"] + 1
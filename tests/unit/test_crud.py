@@ -0,0 +1,128 @@
+from types import SimpleNamespace
+
+import crud
+import schema
+
+
+def seeds_named(client, variety):
+    return client.post("/run_select_query/", params={
+        "query": f"SELECT seed_id FROM seeds WHERE variety = '{variety}'"}).json()["rows"]
+
+
+def test_arrays_are_inserted_with_their_ids_in_order(client):
+    seeds = [{"species": "C. annuum", "variety": f"Bulk {i}"} for i in range(4)]
+
+    response = client.post("/seeds/", json=seeds)
+
+    assert response.status_code == 201
+    written = response.json()
+    ids = [seed["seed_id"] for seed in written]
+    assert len(set(ids)) == 4 and ids == sorted(ids)
+    assert [seed["variety"] for seed in written] == [seed["variety"] for seed in seeds]
+    for seed in written:
+        assert client.get(f"/seeds/{seed['seed_id']}").json() == seed
+
+
+def test_arrays_mix_updates_and_inserts(client):
+    existing = client.post("/seeds/", json={"species": "C. annuum", "variety": "Bulk old"}).json()
+
+    written = client.post("/seeds/", json=[{"species": "C. annuum", "variety": "Bulk new"},
+                                           {**existing, "variety": "Bulk renamed"}]).json()
+
+    assert written[1] == {**existing, "variety": "Bulk renamed"}
+    assert written[0]["seed_id"] not in (None, existing["seed_id"])
+    assert client.get(f"/seeds/{existing['seed_id']}").json()["variety"] == "Bulk renamed"
+
+
+def test_mysql_ids_step_by_the_auto_increment_increment():
+    class FakeSession:
+        def get_bind(self):
+            return SimpleNamespace(dialect=SimpleNamespace(insert_executemany_returning_sort_by_parameter_order=False))
+
+        def execute(self, statement):
+            if "@@auto_increment_increment" in str(statement):
+                return SimpleNamespace(scalar_one=lambda: 3)
+            return SimpleNamespace(lastrowid=10)
+
+    rows = [{"species": "C. annuum"} for _ in range(3)]
+
+    assert crud.insert_many(FakeSession(), schema.Seed.__table__, rows) == [10, 13, 16]
+
+
+def test_a_single_item_still_comes_back_as_an_object(client):
+    seed = client.post("/seeds/", json={"species": "C. annuum", "variety": "Bulk single"}).json()
+
+    assert isinstance(seed["seed_id"], int)
+
+
+def test_an_invalid_item_writes_nothing(client):
+    response = client.post("/seeds/", json=[{"species": "C. annuum", "variety": "Bulk invalid"},
+                                            {"species": "C. annuum", "number_of_seeds": "many"}])
+
+    assert response.status_code == 422
+    assert seeds_named(client, "Bulk invalid") == []
+
+
+def batch(client, *operations):
+    return client.post("/batch/", json={"operations": [
+        {"resource": resource, "verb": verb, "payload": payload} for resource, verb, payload in operations]})
+
+
+def test_batches_pass_ids_forward(client):
+    response = batch(client,
+                     ("seeds", "upsert", {"species": "C. annuum", "variety": "Batch chain"}),
+                     ("germinations", "upsert", {"seed_id": "$0", "planted_date": "2024-02-01",
+                                                 "seeds_attempted": 3, "method": "soil"}),
+                     ("plants", "upsert", {"germination_id": "$1"}),
+                     ("observations", "upsert", {"plant_id": "$2", "date": "2024-03-01", "height_cm": 4}))
+
+    assert response.status_code == 200
+    seed, germination, plant, observation = response.json()["results"]
+    assert germination["seed_id"] == seed["seed_id"]
+    assert plant["germination_id"] == germination["germination_id"]
+    assert client.get(f"/observations/{observation['observation_id']}").json()["plant_id"] == plant["plant_id"]
+
+
+def test_a_failed_operation_rolls_back_the_whole_batch(client):
+    response = batch(client,
+                     ("seeds", "upsert", {"species": "C. annuum", "variety": "Batch rolled back"}),
+                     ("seeds", "delete", {"id": 999999}))
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == {"failed_operation": 1, "error": "Seed 999999 not found"}
+    assert seeds_named(client, "Batch rolled back") == []
+
+
+def test_references_must_point_backwards(client):
+    response = batch(client,
+                     ("seeds", "upsert", {"species": "C. annuum", "variety": "Batch forward"}),
+                     ("germinations", "upsert", {"seed_id": "$1", "planted_date": "2024-02-01",
+                                                 "seeds_attempted": 3, "method": "soil"}))
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == {"failed_operation": 1,
+                                         "error": "$1 refers to an operation that has not run yet"}
+    assert seeds_named(client, "Batch forward") == []
+
+
+def test_invalid_payloads_name_their_operation(client):
+    invalid = batch(client,
+                    ("seeds", "upsert", {"species": "C. annuum", "variety": "Batch invalid"}),
+                    ("germinations", "upsert", {"seed_id": "$0", "planted_date": "someday",
+                                                "seeds_attempted": 3, "method": "soil"}))
+    bad_delete = batch(client, ("seeds", "delete", {"seed_id": 1}))
+
+    assert invalid.status_code == 400
+    assert invalid.json()["detail"]["failed_operation"] == 1
+    assert "planted_date" in invalid.json()["detail"]["error"]
+    assert seeds_named(client, "Batch invalid") == []
+    assert bad_delete.json()["detail"] == {"failed_operation": 0, "error": 'delete payloads must be {"id": <id>}'}
+
+
+def test_entries_without_a_delete_action_are_deleted_through_batches(client):
+    link = client.post("/plant_plant_crosses/", json={"plant_id": 1, "cross_id": 1}).json()
+
+    response = batch(client, ("plant_plant_crosses", "delete", {"id": link["id"]}))
+
+    assert response.json()["results"] == [link]
+    assert client.get(f"/plant_plant_crosses/{link['id']}").status_code == 404
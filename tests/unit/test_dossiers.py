@@ -0,0 +1,111 @@
+from sqlalchemy import event
+
+import database
+
+
+def record_statements(fn):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engine = database.get_engine()
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        return fn(), statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def grow_plant(client, observations):
+    seed = client.post("/seeds/", json={"species": "C. annuum", "variety": "Dossier"}).json()
+    germination = client.post("/germinations/", json={
+        "seed_id": seed["seed_id"], "planted_date": "2024-02-01", "seeds_attempted": 6, "method": "soil"}).json()
+    system = client.post("/hydroponic_systems/", json={"system_type": "Kratky"}).json()
+    plant = client.post("/plants/", json={"germination_id": germination["germination_id"],
+                                          "system_id": system["system_id"]}).json()
+    client.post("/observations/", json=[{"plant_id": plant["plant_id"], "date": f"2024-03-{day:02d}",
+                                         "height_cm": day} for day in range(1, observations + 1)])
+    cross = client.post("/plant_crosses/", json={"cross_date": "2024-05-01", "method": "hand"}).json()
+    client.post("/plant_plant_crosses/", json={"plant_id": plant["plant_id"], "cross_id": cross["cross_id"]})
+    client.post("/taste_tests/", json={"plant_id": plant["plant_id"], "date": "2024-06-01", "taste": 8,
+                                       "texture": 7, "appearance": 9, "overall": 8})
+    return plant
+
+
+def test_a_dossier_carries_the_related_graph(client):
+    plant = grow_plant(client, observations=3)
+
+    dossier = client.get(f"/plants/{plant['plant_id']}", params={"dossier": True}).json()
+
+    assert dossier["plant_id"] == plant["plant_id"]
+    assert dossier["seed"]["variety"] == "Dossier"
+    assert dossier["germination"]["method"] == "soil"
+    assert dossier["system"]["system_type"] == "Kratky"
+    assert [row["date"] for row in dossier["observations"]] == ["2024-03-03", "2024-03-02", "2024-03-01"]
+    assert dossier["taste_tests"][0]["overall"] == 8
+    assert dossier["crosses"][0]["method"] == "hand"
+    assert dossier["yields"] == [] and dossier["truncated"] == []
+
+
+def test_the_number_of_statements_does_not_grow_with_history(client):
+    import dossiers
+
+    short = grow_plant(client, observations=1)
+    long = grow_plant(client, observations=30)
+
+    _, few = record_statements(lambda: dossiers.read(short["plant_id"]))
+    dossier, many = record_statements(lambda: dossiers.read(long["plant_id"]))
+
+    assert len(dossier["observations"]) == 30
+    assert len(few) == len(many)
+
+
+def test_sections_can_be_capped(client):
+    plant = grow_plant(client, observations=5)
+
+    dossier = client.get(f"/plants/{plant['plant_id']}", params={"dossier": True, "section_limit": 2}).json()
+
+    assert [row["date"] for row in dossier["observations"]] == ["2024-03-05", "2024-03-04"]
+    assert dossier["truncated"] == ["observations"]
+
+
+def test_section_limits_are_applied_in_sql(client):
+    import dossiers
+
+    plant = grow_plant(client, observations=5)
+
+    dossier, statements = record_statements(lambda: dossiers.read(plant["plant_id"], section_limit=2))
+
+    assert len(dossier["observations"]) == 2
+    observations = [statement for statement in statements if "FROM observations" in statement]
+    assert len(observations) == 1 and "LIMIT" in observations[0]
+
+
+def test_dossiers_see_writes_to_related_tables(client):
+    plant = grow_plant(client, observations=1)
+    url = f"/plants/{plant['plant_id']}"
+    assert len(client.get(url, params={"dossier": True}).json()["observations"]) == 1
+
+    client.post("/observations/", json={"plant_id": plant["plant_id"], "date": "2024-04-01"})
+
+    assert len(client.get(url, params={"dossier": True}).json()["observations"]) == 2
+    assert "observations" not in client.get(url).json()
+
+
+def test_missing_plant_has_no_dossier(client):
+    assert client.get("/plants/999999", params={"dossier": True}).status_code == 404
+
+
+def test_deleting_a_plant_leaves_its_history_alone(client):
+    plant = grow_plant(client, observations=2)
+    # SQLite hands the highest deleted id to the next insert, which would give a later test's plant this history
+    client.post("/plants/", json={})
+
+    _, statements = record_statements(lambda: client.delete(f"/plants/{plant['plant_id']}"))
+
+    updates = [statement for statement in statements if statement.startswith("UPDATE")]
+    assert not [update for update in updates if any(table in update for table in ("observations", "taste_test",
+                                                                                  "yield"))]
+    observations = client.get("/observations/0", params={"plant_id": plant["plant_id"]}).json()["items"]
+    assert len(observations) == 2
@@ -0,0 +1,41 @@
+import itertools
+
+import pytest
+
+# Owner ids no other test uses; SQLite doesn't enforce the foreign keys, so the owners needn't exist
+owner_ids = itertools.count(770001)
+
+# Each list endpoint's equality filter, its date column, and what else a row needs
+FILTERS = [
+    ("germinations", "seed_id", "planted_date", {"seeds_attempted": 1, "method": "soil"}),
+    ("yields", "plant_id", "date", {"color": "red", "texture": "smooth"}),
+    ("yields", "cross_id", "date", {"plant_id": 1, "color": "red", "texture": "smooth"}),
+    ("taste_tests", "plant_id", "date", {"taste": 5, "texture": 5, "appearance": 5, "overall": 5}),
+    ("observations", "plant_id", "date", {}),
+    ("hydroponic_conditions", "system_id", "date", {}),
+]
+
+
+@pytest.mark.parametrize("resource, owner, date_column, fields", FILTERS)
+def test_list_filters(client, resource, owner, date_column, fields):
+    owner_id, other_id = next(owner_ids), next(owner_ids)
+    rows = [{**fields, owner: owner_id, date_column: f"2024-0{month}-01"} for month in (1, 2, 3)]
+    client.post(f"/{resource}/", json=rows + [{**fields, owner: other_id, date_column: "2024-02-01"}])
+
+    def dates(**params):
+        items = client.get(f"/{resource}/0", params={owner: owner_id, **params}).json()["items"]
+        assert all(item[owner] == owner_id for item in items)
+        return [item[date_column] for item in items]
+
+    assert dates() == ["2024-01-01", "2024-02-01", "2024-03-01"]
+    assert dates(date_from="2024-02-01") == ["2024-02-01", "2024-03-01"]
+    assert dates(date_to="2024-02-01") == ["2024-01-01", "2024-02-01"]
+    assert dates(date_from="2024-02-01", date_to="2024-02-01") == ["2024-02-01"]
+
+
+@pytest.mark.parametrize("resource", sorted({resource for resource, _, _, _ in FILTERS}))
+def test_an_empty_date_range_is_a_400(client, resource):
+    response = client.get(f"/{resource}/0", params={"date_from": "2024-03-01", "date_to": "2024-02-01"})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "date_from must not be after date_to."
@@ -0,0 +1,92 @@
+import math
+
+import numpy as np
+
+import growth
+
+
+def observe(client, plant_id, day, height, leaves=None):
+    client.post("/observations/", json={"plant_id": plant_id, "date": f"2024-05-{day:02d}", "height_cm": height,
+                                        "leaf_count": leaves})
+
+
+def growth_of(client, **params):
+    return client.get("/observations/0", params={"growth": True, **params})
+
+
+def test_analyze_fits_every_plant_at_once():
+    days = np.arange(20.0)
+    s_curve = 50 / (1 + np.exp(-0.4 * (days - 10)))
+    plant_ids = np.r_[np.full(20, 1), np.full(4, 2), [3]]
+    stats = growth.analyze(
+        plant_ids, np.r_[days, [0, 2, 4, 6], [0]], np.r_[s_curve, [5, 7, np.nan, 11], [3]],
+        np.r_[np.full(20, np.nan), [2, 4, 6, 8], [1]], origins={2: -3}, milestone_cm=10)
+
+    assert list(stats["plant_id"]) == [1, 2, 3]
+    assert list(stats["observations"]) == [20, 4, 1]
+    # Plant 2 grows 1 cm and 1 leaf a day, skipping a missing height
+    assert math.isclose(stats["growth_cm_per_day"][1], 1.0)
+    assert math.isclose(stats["linear_r2"][1], 1.0)
+    assert math.isclose(stats["leaves_per_day"][1], 1.0)
+    assert stats["latest_height_cm"][1] == 11
+    # The S-curve is found where it is
+    assert stats["logistic_r2"][0] > 0.95
+    assert abs(stats["logistic_midpoint_day"][0] - 10) < 1.5
+    assert stats["logistic_max_height_cm"][0] == 1.1 * s_curve.max()
+    # Milestones count from planting when it is known
+    assert stats["days_to_milestone"][0] == 7
+    assert stats["days_to_milestone"][1] == 9
+    assert math.isnan(stats["days_to_milestone"][2])
+    # One observation is not enough for any fit
+    assert math.isnan(stats["growth_cm_per_day"][2]) and math.isnan(stats["logistic_rate"][2])
+
+    rows = growth.cohorts(stats, ["a", "b", "a"])
+    assert [(row["cohort"], row["plants"]) for row in rows] == [("a", 2), ("b", 1)]
+    assert rows[0]["mean_days_to_milestone"] == 7
+
+
+def test_growth_endpoint_compares_cohorts(client):
+    seed = client.post("/seeds/", json={"species": "C. annuum", "variety": "Growth Jalapeno"}).json()["seed_id"]
+    germination = client.post("/germinations/", json={"seed_id": seed, "planted_date": "2024-04-01",
+                                                           "seeds_attempted": 4, "method": "soil"}).json()
+    plants = [client.post("/plants/", json={"germination_id": germination["germination_id"],
+                                            "planted_date": "2024-05-01"}).json()["plant_id"] for _ in range(2)]
+    for day in (1, 5, 9):
+        observe(client, plants[0], day, 2.0 * day, leaves=day)
+        observe(client, plants[1], day, 4.0 * day)
+
+    response = growth_of(client, plant_ids=plants, cohort="variety", milestone_cm=20)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [row["plant_id"] for row in body["plants"]] == plants
+    assert body["plants"][0]["growth_cm_per_day"] == 2.0
+    assert body["plants"][0]["first_observed"] == "2024-05-01"
+    assert [row["days_to_milestone"] for row in body["plants"]] == [None, 4]
+    assert body["cohorts"] == [{
+        "cohort": "C. annuum Growth Jalapeno", "plants": 2, "mean_growth_cm_per_day": 3.0,
+        "mean_leaves_per_day": 1.0, "mean_logistic_max_height_cm": body["cohorts"][0]["mean_logistic_max_height_cm"],
+        "mean_logistic_rate": body["cohorts"][0]["mean_logistic_rate"], "mean_days_to_milestone": 4.0}]
+
+    observe(client, plants[0], 13, 30.0)
+    assert growth_of(client, plant_ids=plants, milestone_cm=20).json()["plants"][0]["days_to_milestone"] == 12
+    assert growth_of(client, plant_ids=[999999]).json() == {"plants": [], "truncated": False, "next_cursor": None,
+                                                            "cohorts": []}
+
+
+def test_growth_pages_through_every_plant(client):
+    plants = [client.post("/plants/", json={}).json()["plant_id"] for _ in range(5)]
+    for plant in plants:
+        observe(client, plant, 1, 2.0)
+
+    seen, after = [], None
+    while True:
+        body = growth_of(client, plant_ids=plants, cohort="system", limit=2, after=after).json()
+        assert len(body["plants"]) <= 2
+        assert bool(body["cohorts"]) == (after is None)
+        seen += [row["plant_id"] for row in body["plants"]]
+        if not body["truncated"]:
+            break
+        after = body["next_cursor"]
+
+    assert seen == plants and body["next_cursor"] is None
@@ -0,0 +1,65 @@
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+
+API_DIR = os.path.join(os.path.dirname(__file__), os.pardir, os.pardir, "api")
+
+# Budgets for `import main`, in microseconds. They are generous on purpose: the aim is to catch a regression such as
+# an eager heavy import or I/O at import time, not to benchmark the machine running the tests.
+FIRST_PARTY_BUDGET_US = int(os.getenv("IMPORT_FIRST_PARTY_BUDGET_US", 600_000))
+TOTAL_BUDGET_US = int(os.getenv("IMPORT_TOTAL_BUDGET_US", 4_000_000))
+
+FIRST_PARTY_MODULES = {os.path.splitext(name)[0] for name in os.listdir(API_DIR) if name.endswith(".py")}
+
+# Only needed by rarely used paths, so they must not be loaded by the import itself
+LAZY_MODULES = ("sqlparse", "databases", "dotenv", "pymysql", "aiomysql", "numpy")
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$")
+
+
+def import_main(tmp_path):
+    # An unroutable database host: any connection attempt during import would hang or fail
+    env = dict(os.environ, DB_HOST="192.0.2.1", DB_USER="user", DB_PASSWORD="password", DB_NAME="plants",
+               PYTHONPATH=os.path.abspath(API_DIR))
+    env.pop("DATABASE_URL", None)
+    code = "import sys, main; print(','.join(m for m in %r if m in sys.modules))" % (LAZY_MODULES,)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=tmp_path, env=env,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    profile = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            profile[match.group(4)] = (int(match.group(1)), int(match.group(2)), len(match.group(3)))
+    return profile, result.stdout.strip(), tmp_path
+
+
+@pytest.fixture(scope="module")
+def main_import(tmp_path_factory):
+    return import_main(tmp_path_factory.mktemp("import"))
+
+
+def test_rarely_used_modules_are_not_imported(main_import):
+    _, loaded, _ = main_import
+    assert loaded == ""
+
+
+def test_import_does_no_disk_io(main_import):
+    _, _, cwd = main_import
+    assert list(cwd.iterdir()) == []
+
+
+def test_first_party_import_time_budget(main_import):
+    profile, _, _ = main_import
+    first_party = sum(self_us for name, (self_us, _, _) in profile.items() if name in FIRST_PARTY_MODULES)
+    assert first_party < FIRST_PARTY_BUDGET_US, \
+        f"first-party modules took {first_party} us to import (budget {FIRST_PARTY_BUDGET_US} us)"
+
+
+def test_total_import_time_budget(main_import):
+    profile, _, _ = main_import
+    total = profile["main"][1]
+    assert total < TOTAL_BUDGET_US, f"import main took {total} us (budget {TOTAL_BUDGET_US} us)"
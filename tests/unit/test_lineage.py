@@ -0,0 +1,96 @@
+from sqlalchemy import event, select
+
+import database
+import lineage
+import schema
+
+
+def cross(client, *plants):
+    cross_id = client.post("/plant_crosses/", json={"cross_date": "2024-06-01", "method": "hand"}).json()["cross_id"]
+    links = client.post("/plant_plant_crosses/", json=[{"plant_id": plant, "cross_id": cross_id}
+                                                       for plant in plants]).json()
+    return cross_id, links
+
+
+def relatives(client, plant_id, direction="ancestors", **params):
+    response = client.get(f"/plants/{plant_id}", params={"relatives": direction, **params}).json()
+    return [(row["plant_id"], row["depth"]) for row in response]
+
+
+def closure():
+    with database.new_session() as db:
+        return set(db.execute(select(schema.PlantLineage.ancestor_id, schema.PlantLineage.descendant_id,
+                                     schema.PlantLineage.depth, schema.PlantLineage.path)))
+
+
+def test_lineage_follows_yields_and_crosses(client, new_plant):
+    mother, father = new_plant(), new_plant()
+    cross_id, _ = cross(client, mother, father)
+    child = new_plant(mother, cross_id)
+    grandchild = new_plant(child)
+
+    assert relatives(client, grandchild) == [(child, 1)] + sorted([(mother, 2), (father, 2)])
+    assert relatives(client, grandchild, max_depth=1) == [(child, 1)]
+    assert relatives(client, father, direction="descendants") == [(child, 1), (grandchild, 2)]
+    path = client.get(f"/plants/{grandchild}", params={"relatives": "ancestors"}).json()[-1]["path"]
+    assert path == f"{father}/{child}/{grandchild}"
+
+
+def test_cross_changes_reach_every_descendant(client, new_plant):
+    mother, father, donor = new_plant(), new_plant(), new_plant()
+    cross_id, links = cross(client, mother, father)
+    child = new_plant(mother, cross_id)
+    grandchild = new_plant(child)
+    assert relatives(client, donor, direction="descendants") == []
+
+    client.post("/plant_plant_crosses/", json={**links[1], "plant_id": donor})
+
+    assert relatives(client, grandchild) == [(child, 1)] + sorted([(mother, 2), (donor, 2)])
+    assert relatives(client, donor, direction="descendants") == [(child, 1), (grandchild, 2)]
+
+    client.delete(f"/plant_plant_crosses/{links[1]['id']}")
+
+    assert relatives(client, grandchild) == [(child, 1), (mother, 2)]
+
+
+def test_moving_a_plant_to_another_germination_changes_its_parents(client, new_plant):
+    first, second = new_plant(), new_plant()
+    child = new_plant(first)
+    other = client.get(f"/plants/{new_plant(second)}").json()
+
+    client.post("/plants/", json={"plant_id": child, "germination_id": other["germination_id"]})
+
+    assert relatives(client, child) == [(second, 1)]
+
+
+def test_edits_that_keep_the_links_leave_the_lineage_alone(client, new_plant):
+    parent = new_plant()
+    child = client.get(f"/plants/{new_plant(parent)}").json()
+    plant_yield = client.get("/yields/0", params={"plant_id": parent}).json()["items"][0]
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engine = database.get_engine()
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        client.post("/plants/", json={**child, "comments": "Bushy"})
+        client.post("/yields/", json={**plant_yield, "comments": "Heavy"})
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+    assert statements and not [statement for statement in statements if "plant_lineage" in statement]
+    assert relatives(client, child["plant_id"]) == [(parent, 1)]
+
+
+def test_rebuild_matches_incremental_maintenance(client, new_plant):
+    mother, father = new_plant(), new_plant()
+    cross_id, _ = cross(client, mother, father)
+    new_plant(new_plant(mother, cross_id))
+    incremental = closure()
+
+    with database.new_session() as db:
+        lineage.rebuild(db)
+
+    assert closure() == incremental
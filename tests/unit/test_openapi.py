@@ -0,0 +1,56 @@
+import json
+
+
+def test_artifact_matches_live_routes(app):
+    import openapi_document
+
+    assert not openapi_document.drift(app), "api/openapi.json is stale, run `python manage.py openapi` in api/"
+
+
+def test_document_stays_within_the_gpt_action_limit():
+    import openapi_document
+
+    with open(openapi_document.OPENAPI_PATH, encoding="utf-8") as f:
+        document = json.load(f)
+    operations = [operation for path in document["paths"].values() for operation in path.values()]
+
+    assert len(operations) <= openapi_document.MAX_OPERATIONS
+
+
+def test_served_document_is_the_artifact(client):
+    import openapi_document
+
+    response = client.get("/openapi.json")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    with open(openapi_document.OPENAPI_PATH, "rb") as f:
+        assert response.content == f.read()
+
+
+def test_document_keeps_gpt_extras(client):
+    document = json.loads(client.get("/openapi.json").content)
+
+    assert document["servers"][0]["url"].startswith("https://")
+    assert document["paths"]["/seeds/"]["post"]["x-openai-isConsequential"] is True
+    assert document["paths"]["/seeds/{seed_id}"]["get"]["x-openai-isConsequential"] is False
+
+
+def test_check_command_fails_on_drift(app, tmp_path, monkeypatch):
+    import manage
+    import openapi_document
+
+    stale = tmp_path / "openapi.json"
+    stale.write_text(json.dumps({"openapi": "3.1.0", "paths": {}}))
+    monkeypatch.setattr(openapi_document, "OPENAPI_PATH", str(stale))
+
+    assert manage.main(["openapi", "--check"]) == 1
+    assert manage.main(["openapi"]) == 0
+    assert manage.main(["openapi", "--check"]) == 0
+
+
+def test_docs_page_points_at_the_artifact(client):
+    response = client.get("/docs")
+
+    assert response.status_code == 200
+    assert "/openapi.json" in response.text
@@ -0,0 +1,55 @@
+import pytest
+from fastapi import HTTPException
+
+import pagination
+
+
+def test_cursors_round_trip():
+    assert pagination.decode_cursor(pagination.encode_cursor(42)) == 42
+
+
+# Not base64, not JSON, and {"id": "42"}
+@pytest.mark.parametrize("cursor", ["nope!", "bm9wZQ", "eyJpZCI6ICI0MiJ9"])
+def test_foreign_cursors_are_rejected(cursor):
+    with pytest.raises(HTTPException) as error:
+        pagination.decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+def test_pages_follow_the_cursor_to_the_end(client):
+    seeds = client.post("/seeds/", json=[{"species": "C. frutescens", "variety": f"Keyset {i}"}
+                                         for i in range(5)]).json()
+    ids = [seed["seed_id"] for seed in seeds]
+
+    # These are the newest seeds, so paging from just before the first one reaches the end after them
+    seen = []
+    cursor = pagination.encode_cursor(ids[0] - 1)
+    while cursor is not None:
+        page = client.get("/seeds/0", params={"limit": 2, "after": cursor}).json()
+        assert len(page["items"]) <= 2
+        seen += [item["seed_id"] for item in page["items"]]
+        cursor = page["next_cursor"]
+
+    assert seen == ids
+
+
+def test_the_last_page_has_no_cursor(client):
+    seed = client.post("/seeds/", json={"species": "C. frutescens", "variety": "Keyset last"}).json()
+    germinations = client.post("/germinations/", json=[
+        {"seed_id": seed["seed_id"], "planted_date": "2024-01-01", "seeds_attempted": 1, "method": "soil"}
+        for _ in range(3)]).json()
+
+    first = client.get("/germinations/0", params={"seed_id": seed["seed_id"], "limit": 2}).json()
+    second = client.get("/germinations/0", params={"seed_id": seed["seed_id"], "limit": 2,
+                                                   "after": first["next_cursor"]}).json()
+
+    assert [item["germination_id"] for item in first["items"] + second["items"]] == \
+        [germination["germination_id"] for germination in germinations]
+    assert second["next_cursor"] is None
+
+
+def test_a_bad_cursor_is_a_400(client):
+    response = client.get("/seeds/0", params={"after": "not-a-cursor"})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor."
@@ -0,0 +1,114 @@
+import pytest
+
+import database
+import pedigree
+
+
+def cross(client, dam, sire):
+    cross_id = client.post("/plant_crosses/", json={"cross_date": "2024-06-01", "method": "hand"}).json()["cross_id"]
+    client.post("/plant_plant_crosses/", json=[{"plant_id": dam, "cross_id": cross_id},
+                                               {"plant_id": sire, "cross_id": cross_id}])
+    return cross_id
+
+
+def kinship(client, *plant_ids):
+    response = client.get("/plants/0", params={"kinship": True, "plant_ids": list(plant_ids)}).json()
+    inbreeding = {plant["plant_id"]: plant["inbreeding"] for plant in response["plants"]}
+    pairs = {(pair["plant_id"], pair["other_id"]): pair["kinship"] for pair in response["pairs"]}
+    return inbreeding, pairs
+
+
+def test_textbook_coefficients(client, new_plant):
+    a, b = new_plant(), new_plant()
+    ab = cross(client, a, b)
+    sibling, other_sibling = new_plant(a, ab), new_plant(a, ab)
+    selfed = new_plant(a)
+    sibs = cross(client, sibling, other_sibling)
+    inbred = new_plant(sibling, sibs)
+
+    inbreeding, pairs = kinship(client, a, b, sibling, other_sibling, selfed, inbred)
+
+    assert inbreeding[a] == inbreeding[b] == inbreeding[sibling] == 0
+    assert inbreeding[selfed] == pytest.approx(0.5)
+    assert inbreeding[inbred] == pytest.approx(0.25)
+    assert pairs[(a, b)] == 0
+    assert pairs[(a, sibling)] == pytest.approx(0.25)
+    assert pairs[(sibling, other_sibling)] == pytest.approx(0.25)
+    assert pairs[(a, selfed)] == pytest.approx(0.5)
+    assert pairs[(a, inbred)] == pytest.approx(0.25)
+
+
+def test_incremental_updates_match_a_rebuild(client, new_plant, monkeypatch):
+    a, b, c = new_plant(), new_plant(), new_plant()
+    child = new_plant(a, cross(client, a, b))
+    grandchild = new_plant(child)
+    kinship(client, a, grandchild)
+
+    # A new cross, and an existing plant moved to another seed lot, with descendants below it
+    new_plant(grandchild, cross(client, grandchild, c))
+    moved = client.get(f"/plants/{child}").json()
+    other = client.get(f"/plants/{new_plant(b, cross(client, b, c))}").json()
+    client.post("/plants/", json={**moved, "germination_id": other["germination_id"]})
+    kinship(client, a)
+
+    incremental = pedigree.relationship_matrix
+    # Starting from one row also exercises growing the blocks and joining families
+    monkeypatch.setattr(pedigree, "INITIAL_CAPACITY", 1)
+    fresh = pedigree.RelationshipMatrix()
+    with database.new_session() as db:
+        fresh.sync(db)
+    for plant_id in fresh.families:
+        for other_id in fresh.families:
+            assert incremental.relationship(plant_id, other_id) == pytest.approx(fresh.relationship(plant_id, other_id))
+    assert incremental.relationship(a, child) == 0
+
+
+def test_unrelated_plants_keep_separate_blocks(client, new_plant):
+    a, b = new_plant(), new_plant()
+    selfed = new_plant(a)
+
+    inbreeding, pairs = kinship(client, a, b, selfed)
+
+    families = pedigree.relationship_matrix.families
+    assert families[a] is families[selfed] and families[a] is not families[b]
+    assert pairs[(a, b)] == pairs[(b, selfed)] == 0
+    assert inbreeding[selfed] == pytest.approx(0.5)
+
+
+def test_cycles_are_not_recomputed_on_every_sync(client, new_plant, monkeypatch):
+    a = new_plant()
+    b = new_plant(a)
+    # Bad data: a grown from seed of its own child
+    seed_lot = client.get(f"/plants/{new_plant(b)}").json()["germination_id"]
+    client.post("/plants/", json={**client.get(f"/plants/{a}").json(), "germination_id": seed_lot})
+    kinship(client, a, b)
+    computed = []
+    monkeypatch.setattr(pedigree.Family, "compute", lambda family, plant_ids, parents: computed.append(plant_ids))
+
+    with database.new_session() as db:
+        pedigree.relationship_matrix.sync(db)
+
+    assert computed == []
+
+
+def test_a_plant_is_compared_with_plant_ids(client, new_plant):
+    a = new_plant()
+    selfed = new_plant(a)
+
+    response = client.get(f"/plants/{selfed}", params={"kinship": True, "plant_ids": [a]}).json()
+
+    assert [plant["plant_id"] for plant in response["plants"]] == [selfed, a]
+    assert response["pairs"][0]["kinship"] == pytest.approx(0.5)
+
+
+def test_unknown_plants_are_404(client):
+    assert client.get("/plants/0", params={"kinship": True, "plant_ids": [999999]}).status_code == 404
+    assert client.get("/plants/0", params={"kinship": True}).status_code == 400
+
+
+def test_one_view_at_a_time(client, new_plant):
+    plant = new_plant()
+
+    response = client.get(f"/plants/{plant}", params={"kinship": True, "relatives": "ancestors"})
+
+    assert response.status_code == 400
@@ -0,0 +1,69 @@
+import pedigree_graph
+from cache import read_cache
+
+
+def family(client, new_plant):
+    """
+    Two parents crossed, a child from the cross and a selfed grandchild. Returns their plant ids.
+    """
+    mother, father = new_plant(), new_plant()
+    cross_id = client.post("/plant_crosses/", json={"cross_date": "2024-06-01", "method": "hand"}).json()["cross_id"]
+    client.post("/plant_plant_crosses/", json=[{"plant_id": mother, "cross_id": cross_id},
+                                               {"plant_id": father, "cross_id": cross_id}])
+    child = new_plant(mother, cross_id)
+    return mother, father, child, new_plant(child)
+
+
+def plant_nodes(graph):
+    return {int(node["id"].split(":")[1]) for node in graph["nodes"] if node["kind"] == "plant"}
+
+
+def tree(client, plant_id, **params):
+    return client.get(f"/plants/{plant_id}", params={"graph": "json", **params})
+
+
+def test_rooted_graphs_follow_the_pedigree(client, new_plant):
+    mother, father, child, grandchild = family(client, new_plant)
+
+    ancestors = tree(client, grandchild, relatives="ancestors").json()
+    assert plant_nodes(ancestors) == {mother, father, child, grandchild}
+    assert {edge["label"] for edge in ancestors["edges"]} == {"parent", "bore", "pollinated", "saved", "grown"}
+
+    one_generation = tree(client, grandchild, relatives="ancestors", max_depth=1).json()
+    assert plant_nodes(one_generation) == {child, grandchild}
+
+    descendants = tree(client, father, relatives="descendants").json()
+    assert plant_nodes(descendants) == {father, child, grandchild}
+    assert plant_nodes(tree(client, 0, max_nodes=2000).json()) >= {mother, father, child, grandchild}
+
+
+def test_node_cap_and_dot(client, new_plant):
+    mother, _, _, grandchild = family(client, new_plant)
+
+    capped = tree(client, grandchild, max_nodes=3).json()
+    assert len(capped["nodes"]) == 3 and capped["truncated"]
+
+    dot = tree(client, grandchild, graph="dot")
+    assert dot.headers["content-type"].startswith("text/vnd.graphviz")
+    assert dot.text.startswith("digraph pedigree {")
+    assert f'"plant:{mother}" [label="Plant {mother}", shape=ellipse];' in dot.text
+
+
+def test_the_graph_is_read_once_until_a_write(client, new_plant, monkeypatch):
+    _, _, child, _ = family(client, new_plant)
+    reads = []
+    real_read = pedigree_graph.read
+    monkeypatch.setattr(pedigree_graph, "read", lambda: reads.append(1) or real_read())
+    read_cache.clear()
+
+    tree(client, child)
+    tree(client, child, max_depth=1)
+    assert len(reads) == 1
+
+    client.post("/plants/", json={})
+    tree(client, child)
+    assert len(reads) == 2
+
+
+def test_unknown_root_is_404(client):
+    assert tree(client, 999999).status_code == 404
@@ -0,0 +1,81 @@
+import pytest
+
+import query_guard
+from query_guard import estimated_rows, objection, with_timeout
+from sql_analysis import tokenize
+
+
+def test_joined_tables_multiply_and_separate_selects_add():
+    plan = [
+        {"id": 1, "table": "plants", "type": "ALL", "rows": 1000, "filtered": 100.0},
+        {"id": 1, "table": "observations", "type": "ALL", "rows": 5000, "filtered": 10.0},
+        {"id": 2, "table": "seeds", "type": "ref", "rows": 3, "filtered": 100.0},
+    ]
+
+    assert estimated_rows(plan) == 1000 + 1000 * 5000 + 3
+
+
+def test_cross_joins_over_budget_are_rejected(monkeypatch):
+    monkeypatch.setattr(query_guard, "ROW_BUDGET", 1_000_000)
+    plan = [{"id": 1, "table": "plants", "type": "ALL", "rows": 2000, "filtered": 100.0},
+            {"id": 1, "table": "observations", "type": "ALL", "rows": 2000, "filtered": 100.0}]
+
+    assert "over the budget of 1,000,000" in objection(plan)
+
+
+def test_full_scans_of_large_tables_name_the_indexed_columns(monkeypatch):
+    monkeypatch.setattr(query_guard, "FULL_SCAN_ROWS", 1000)
+    plan = [{"id": 1, "table": "observations", "type": "ALL", "rows": 50_000, "filtered": 11.1}]
+
+    reason = objection(plan)
+
+    assert "all ~50,000 rows of observations" in reason
+    assert "plant_id" in reason and "observation_id" in reason
+
+
+def test_indexed_plans_within_budget_pass():
+    plan = [{"id": 1, "table": "observations", "type": "ref", "rows": 40, "filtered": 100.0}]
+
+    assert objection(plan) is None
+
+
+# EXPLAIN of a scan of a large table, which estimates the whole table whatever the LIMIT
+LARGE_SCAN = [{"id": 1, "table": "hydroponic_conditions", "type": "ALL", "rows": 5_000_000, "filtered": 100.0,
+               "Extra": None}]
+
+
+def test_limited_scans_of_one_table_are_judged_by_their_limit():
+    query = tokenize("SELECT * FROM hydroponic_conditions")
+
+    assert objection(LARGE_SCAN) is not None
+    assert objection(LARGE_SCAN, query, row_limit=501) is None
+    # An export streams every row to the client as it is read
+    assert objection(LARGE_SCAN, query) is None
+
+
+def test_rare_matches_still_read_most_of_the_table():
+    plan = [{**LARGE_SCAN[0], "filtered": 0.01, "Extra": "Using where"}]
+    query = tokenize("SELECT * FROM hydroponic_conditions WHERE water_ph > 13")
+
+    assert "rows of hydroponic_conditions" in objection(plan, query, row_limit=501)
+
+
+@pytest.mark.parametrize("query, extra", [
+    ("SELECT * FROM hydroponic_conditions ORDER BY water_ph", "Using filesort"),
+    ("SELECT system_id FROM hydroponic_conditions GROUP BY system_id", "Using temporary"),
+    ("SELECT max(water_ph) FROM hydroponic_conditions", None),
+    ("SELECT DISTINCT system_id FROM hydroponic_conditions", None),
+])
+def test_scans_that_read_past_the_limit_are_still_rejected(query, extra):
+    plan = [{**LARGE_SCAN[0], "Extra": extra}]
+
+    assert objection(plan, tokenize(query), row_limit=501) is not None
+    assert objection(plan, tokenize(query)) is not None
+
+
+def test_timeout_hint_goes_right_after_select():
+    hint = f"MAX_EXECUTION_TIME({query_guard.TIMEOUT_MS})"
+
+    assert with_timeout("SELECT * FROM plants") == f"SELECT /*+ {hint} */ * FROM plants"
+    assert with_timeout("select /*+ NO_INDEX(p) */ * FROM plants p") == \
+        f"select /*+ {hint} NO_INDEX(p) */ * FROM plants p"
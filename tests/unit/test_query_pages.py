@@ -0,0 +1,116 @@
+import asyncio
+import contextlib
+from types import SimpleNamespace
+
+import query_pages
+from query_pages import limit_query
+from sql_analysis import tokenize
+
+
+def limited(query, start=0, count=501):
+    return limit_query(query, tokenize(query), start, count)
+
+
+def test_a_limit_is_added_before_trailing_comments_and_semicolons():
+    assert limited("SELECT * FROM plants -- all\n") == "SELECT * FROM plants LIMIT 0, 501 -- all\n"
+    assert limited("SELECT * FROM plants;") == "SELECT * FROM plants LIMIT 0, 501;"
+
+
+def test_the_querys_own_limit_is_tightened_not_exceeded():
+    assert limited("SELECT * FROM plants ORDER BY plant_id LIMIT 10") == \
+        "SELECT * FROM plants ORDER BY plant_id LIMIT 0, 10"
+    assert limited("SELECT * FROM plants LIMIT 20 OFFSET 5", start=15) == "SELECT * FROM plants LIMIT 20, 5"
+    assert limited("SELECT * FROM plants LIMIT 5, 2000", start=500) == "SELECT * FROM plants LIMIT 505, 501"
+
+
+def test_subquery_limits_are_left_alone():
+    assert limited("SELECT * FROM (SELECT * FROM plants LIMIT 3) p") == \
+        "SELECT * FROM (SELECT * FROM plants LIMIT 3) p LIMIT 0, 501"
+
+
+def test_locking_clauses_are_limited_from_outside():
+    assert limited("SELECT * FROM plants FOR UPDATE") == \
+        "SELECT * FROM (SELECT * FROM plants FOR UPDATE) AS limited LIMIT 0, 501"
+
+
+def test_large_results_come_back_in_pages(client, monkeypatch):
+    monkeypatch.setattr(query_pages, "MAX_ROWS", 4)
+    client.post("/seeds/", json=[{"species": "C. pubescens", "variety": f"Page {i}"} for i in range(10)])
+    query = "SELECT variety FROM seeds WHERE species = 'C. pubescens' ORDER BY seed_id"
+
+    seen = []
+    token = None
+    while True:
+        page = client.post("/run_select_query/", params={"query": query, "continuation_token": token}).json()
+        seen += [row["variety"] for row in page["rows"]]
+        if not page["truncated"]:
+            break
+        assert page["total"] is None
+        token = page["next_token"]
+
+    assert seen == [f"Page {i}" for i in range(10)]
+    assert page["total"] == 10
+
+
+def test_byte_budget_cuts_a_page_short(client, monkeypatch):
+    monkeypatch.setattr(query_pages, "MAX_BYTES", 1)
+    client.post("/seeds/", json=[{"species": "C. frutescens", "variety": "Tabasco"},
+                                 {"species": "C. frutescens", "variety": "Malagueta"}])
+
+    page = client.post("/run_select_query/", params={
+        "query": "SELECT variety FROM seeds WHERE species = 'C. frutescens'"}).json()
+
+    assert len(page["rows"]) == 1
+    assert page["truncated"] and page["next_token"]
+
+
+def test_tokens_only_resume_their_own_query(client):
+    token = query_pages.encode_token("SELECT 1 FROM seeds", 5)
+
+    response = client.post("/run_select_query/", params={"query": "SELECT 2 FROM seeds", "continuation_token": token})
+
+    assert response.status_code == 400
+
+
+class FakeCursor:
+    description = [("variety",)]
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.fetched = 0
+        self.closed = False
+
+    async def execute(self, query):
+        pass
+
+    async def fetchmany(self, size):
+        chunk = self.rows[self.fetched:self.fetched + size]
+        self.fetched += len(chunk)
+        return chunk
+
+    async def close(self):
+        self.closed = True
+
+
+def test_mysql_pages_are_read_unbuffered_and_stop_at_the_budget(monkeypatch):
+    import aiomysql
+
+    monkeypatch.setattr(query_pages, "CHUNK_SIZE", 2)
+    cursor = FakeCursor([("x" * 20,)] * 100)
+    opened = []
+
+    async def open_cursor(*cursor_class):
+        opened.extend(cursor_class)
+        return cursor
+
+    @contextlib.asynccontextmanager
+    async def connection():
+        yield SimpleNamespace(raw_connection=SimpleNamespace(cursor=open_cursor))
+
+    database = SimpleNamespace(url=SimpleNamespace(dialect="mysql"), connection=connection)
+
+    rows, truncated = asyncio.run(query_pages.fetch_page(database, "SELECT variety FROM seeds", 500, 100))
+
+    assert opened == [aiomysql.SSCursor]
+    assert truncated and len(rows) == 2
+    assert cursor.fetched == 4 and cursor.closed
@@ -0,0 +1,95 @@
+import pytest
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+
+import database
+import rollups
+import schema
+
+
+def sow(client, seed_id, method, attempted, successful=None, days=None, germination_id=None):
+    return client.post("/germinations/", json={
+        "germination_id": germination_id, "seed_id": seed_id, "planted_date": "2024-03-01",
+        "germination_date": f"2024-03-{1 + days:02d}" if days is not None else None,
+        "seeds_attempted": attempted, "seeds_successful": successful, "method": method}).json()
+
+
+def by_method(client, **params):
+    return {row["method"]: row for row in client.get("/germinations/0", params={"rollups": True, **params}).json()}
+
+
+def stored():
+    columns = [column for column in schema.GerminationRollup.__table__.columns if column.key != "rollup_id"]
+    with database.new_session() as db:
+        return sorted((tuple(row) for row in db.execute(select(*columns))), key=repr)
+
+
+def test_rollups_follow_germination_writes(client):
+    seed = client.post("/seeds/", json={"species": "C. chinense", "variety": "Rollup Habanero"}).json()["seed_id"]
+    sow(client, seed, "paper towel", 10, 8, days=6)
+    sow(client, seed, "paper towel", 10, 4, days=10)
+    sow(client, seed, "paper towel", 10, 6, days=9)
+    soil = sow(client, seed, "soil", 10, 2, days=14)
+
+    rows = by_method(client, variety="Rollup Habanero")
+    assert rows["paper towel"]["sowings"] == 3
+    assert rows["paper towel"]["success_rate"] == 0.6
+    assert rows["paper towel"]["median_days"] == 9
+    assert list(rows) == ["paper towel", "soil"]
+
+    sow(client, seed, "soil", 10, 9, days=12, germination_id=soil["germination_id"])
+    assert by_method(client, variety="Rollup Habanero")["soil"]["success_rate"] == 0.9
+
+    client.delete(f"/germinations/{soil['germination_id']}")
+    assert list(by_method(client, variety="Rollup Habanero")) == ["paper towel"]
+    assert by_method(client, seed_id=seed)["paper towel"]["median_days"] == 9
+
+
+def test_renaming_a_seed_moves_its_totals(client):
+    seed = client.post("/seeds/", json={"species": "C. chinense", "variety": "Unnamed"}).json()
+    sow(client, seed["seed_id"], "rockwool", 5, 5, days=7)
+
+    client.post("/seeds/", json={**seed, "variety": "Renamed"})
+
+    assert by_method(client, variety="Unnamed") == {}
+    assert by_method(client, variety="Renamed")["rockwool"]["seeds_successful"] == 5
+    assert by_method(client, seed_id=seed["seed_id"])["rockwool"]["variety"] == "Renamed"
+
+
+def test_rebuild_matches_incremental_maintenance(client):
+    seed = client.post("/seeds/", json={"species": "C. baccatum", "variety": "Rebuilt"}).json()["seed_id"]
+    sow(client, seed, "soil", 4, 3, days=8)
+    sow(client, seed, "soil", 4)
+    incremental = stored()
+
+    with database.new_session() as db:
+        rollups.rebuild(db)
+
+    assert stored() == incremental
+
+
+def test_a_rollup_is_one_row_however_it_is_first_written(client):
+    seed = client.post("/seeds/", json={"species": "C. chinense", "variety": "Raced"}).json()["seed_id"]
+    key = (seed, "C. chinense", "Raced", "soil")
+    rollup = schema.GerminationRollup
+
+    with database.new_session() as db:
+        # What two concurrent first writes both run before either reads the row
+        for _ in range(2):
+            db.execute(rollups.insert_if_missing(db.get_bind().dialect.name, key))
+        assert len(db.execute(select(rollup).where(*rollups.key_filter(key))).all()) == 1
+        with pytest.raises(IntegrityError):
+            db.execute(insert(rollup).values(sowings=0, seeds_attempted=0, seeds_successful=0, days_histogram="{}",
+                                             **rollups.digest(key)))
+        db.rollback()
+
+    sow(client, seed, "soil", 4, 2, days=5)
+    assert by_method(client, seed_id=seed)["soil"]["sowings"] == 1
+
+
+def test_medians():
+    totals = rollups.Totals()
+    assert totals.median_days() is None
+    for days in (3, 9, 4, 10):
+        totals.add_germination({"planted_date": "2024-01-01", "germination_date": f"2024-01-{1 + days:02d}"})
+    assert totals.median_days() == 6.5
@@ -0,0 +1,63 @@
+import saved_queries
+from cache import query_cache
+
+
+def run(client, name=None, **parameters):
+    return client.post("/run_select_query/", json={"name": name, "parameters": parameters})
+
+
+def test_without_a_query_or_name_the_saved_queries_are_listed(client):
+    listed = run(client).json()
+
+    assert [query["name"] for query in listed] == list(saved_queries.SAVED_QUERIES)
+    assert client.post("/run_select_query/").json() == listed
+    plant_observations = next(query for query in listed if query["name"] == "plant_observations")
+    assert {"name": "plant_id", "type": "integer", "description": "The plant", "required": True,
+            "default": None} in plant_observations["parameters"]
+
+
+def test_germination_rate_by_variety(client):
+    seed = client.post("/seeds/", json={"species": "C. rhomboideum", "variety": "Saved"}).json()
+    client.post("/germinations/", json=[
+        {"seed_id": seed["seed_id"], "planted_date": "2024-03-01", "seeds_attempted": 10, "seeds_successful": 7,
+         "method": "paper towel"},
+        {"seed_id": seed["seed_id"], "planted_date": "2024-04-01", "seeds_attempted": 10, "seeds_successful": 5,
+         "method": "rockwool"},
+    ])
+
+    result = run(client, "germination_rate_by_variety", species="C. rhomboideum").json()
+
+    assert result["rows"] == [{"species": "C. rhomboideum", "variety": "Saved", "sowings": 2, "seeds_attempted": 20,
+                               "seeds_successful": 12, "germination_rate": 0.6}]
+    assert result["total"] == 1 and not result["truncated"]
+
+
+def test_results_are_cached_per_parameter_set_until_a_write(client):
+    client.post("/yields/", json={"plant_id": 1, "date": "2023-07-04", "color": "red", "texture": "smooth"})
+    july = {"start": "2023-07-01", "end": "2023-07-31"}
+
+    assert len(run(client, "yields_between", **july).json()["rows"]) == 1
+    hits = query_cache.hits
+    assert len(run(client, "yields_between", **july).json()["rows"]) == 1
+    assert query_cache.hits == hits + 1
+    assert run(client, "yields_between", start="2023-08-01", end="2023-08-31").json()["rows"] == []
+
+    client.post("/yields/", json={"plant_id": 1, "date": "2023-07-05", "color": "red", "texture": "wrinkled"})
+
+    assert len(run(client, "yields_between", **july).json()["rows"]) == 2
+
+
+def test_arguments_are_checked(client):
+    assert run(client, "no_such_query").status_code == 404
+    assert run(client, "plant_observations").json()["detail"] == "plant_observations needs the plant_id parameter."
+    assert run(client, "plant_observations", plant_id="seven").json()["detail"] == "plant_id must be of type integer."
+    assert run(client, "plant_observations", plant_id=1, color="red").status_code == 400
+
+
+def test_templates_compile_for_mysql():
+    from sqlalchemy.dialects import mysql
+
+    for query in saved_queries.SAVED_QUERIES.values():
+        sql, order = query.compiled(mysql.dialect())
+        assert "%s" in sql and ":" not in sql
+        assert order[-1] == "limit"
@@ -0,0 +1,141 @@
+import os
+
+import pytest
+
+import query_guard
+import snapshot
+
+
+@pytest.fixture()
+def analytics(client, monkeypatch, tmp_path):
+    fresh = snapshot.Snapshot(str(tmp_path / "analytics.db"))
+    monkeypatch.setattr(snapshot, "ENABLED", True)
+    monkeypatch.setattr(snapshot, "snapshot", fresh)
+    return fresh
+
+
+def query(client, sql):
+    return client.post("/run_select_query/", params={"query": sql})
+
+
+def test_queries_run_on_the_snapshot_and_report_its_age(client, analytics):
+    client.post("/seeds/", json={"species": "C. baccatum", "variety": "Aji Amarillo"})
+    snapshot.warm()
+
+    result = query(client, "SELECT variety FROM seeds WHERE variety = 'Aji Amarillo'").json()
+
+    assert result["rows"] == [{"variety": "Aji Amarillo"}]
+    assert 0 <= result["snapshot_age_seconds"] < snapshot.MAX_AGE
+    assert 0 <= result["snapshot_rebuilt_age_seconds"] < snapshot.REBUILD_AGE
+    assert os.path.exists(analytics.path)
+
+
+def test_the_snapshot_is_stale_until_its_refresh_is_due(client, analytics, monkeypatch):
+    sql = "SELECT COUNT(*) AS n FROM seeds WHERE species = 'C. chacoense'"
+    client.post("/seeds/", json={"species": "C. chacoense", "variety": "First"})
+    snapshot.warm()
+    assert query(client, sql).json()["rows"] == [{"n": 1}]
+
+    client.post("/seeds/", json={"species": "C. chacoense", "variety": "Second"})
+    assert query(client, sql).json()["rows"] == [{"n": 1}]
+
+    monkeypatch.setattr(snapshot, "MAX_AGE", -1)
+    assert query(client, sql).json()["rows"] == [{"n": 2}]
+
+
+def test_updates_written_here_are_picked_up_by_an_incremental_refresh(client, analytics, monkeypatch):
+    monkeypatch.setattr(snapshot, "MAX_AGE", -1)
+    seed = client.post("/seeds/", json={"species": "C. praetermissum", "variety": "Old"}).json()
+    sql = f"SELECT variety FROM seeds WHERE seed_id = {seed['seed_id']}"
+    snapshot.warm()
+    assert query(client, sql).json()["rows"] == [{"variety": "Old"}]
+    built_at = analytics.built_at
+
+    client.post("/seeds/", json={**seed, "variety": "New"})
+
+    result = query(client, sql).json()
+    assert result["rows"] == [{"variety": "New"}]
+    assert analytics.built_at == built_at
+    # The incremental refresh is newer than the rebuild, which is what bounds edits made elsewhere
+    assert result["snapshot_rebuilt_age_seconds"] >= result["snapshot_age_seconds"]
+
+
+def test_requests_never_build_the_snapshot(client, analytics, monkeypatch):
+    client.post("/seeds/", json={"species": "C. cardenasii", "variety": "Live"})
+    sql = "SELECT variety FROM seeds WHERE species = 'C. cardenasii'"
+
+    # With no snapshot yet, the query runs on the live database
+    result = query(client, sql).json()
+    assert result["rows"] == [{"variety": "Live"}]
+    assert result["snapshot_age_seconds"] is None and result["snapshot_rebuilt_age_seconds"] is None
+    assert not os.path.exists(analytics.path)
+
+    snapshot.warm()
+    built_at = analytics.built_at
+    monkeypatch.setattr(snapshot, "REBUILD_AGE", -1)
+
+    # A rebuild that is due waits for the keep-warm step
+    assert query(client, sql).json()["snapshot_age_seconds"] is not None
+    assert analytics.built_at == built_at
+    snapshot.warm()
+    assert analytics.built_at > built_at
+
+
+def test_a_failed_refresh_records_nothing_as_copied(client, analytics, monkeypatch):
+    analytics.refresh(full=True)
+    copied, versions = dict(analytics.last_pk), dict(analytics.versions)
+    seed = client.post("/seeds/", json={"species": "C. annuum", "variety": "Rolled back"}).json()
+    last_table = list(snapshot.schema.Base.metadata.tables)[-1]
+    real_copy = analytics._copy
+
+    def failing_copy(source, target, table, last_pk):
+        real_copy(source, target, table, last_pk)
+        if table.name == last_table:
+            raise RuntimeError("target lost")
+
+    monkeypatch.setattr(analytics, "_copy", failing_copy)
+    with pytest.raises(RuntimeError):
+        analytics.refresh()
+
+    assert (analytics.last_pk, analytics.versions) == (copied, versions)
+    monkeypatch.setattr(analytics, "_copy", real_copy)
+    analytics.refresh()
+    connection = analytics.connect()
+    assert connection.execute(f"SELECT variety FROM seeds WHERE seed_id = {seed['seed_id']}").fetchall() == \
+        [("Rolled back",)]
+    connection.close()
+
+
+def test_the_snapshot_cannot_be_written_to(analytics):
+    analytics.refresh()
+    connection = analytics.connect()
+    with pytest.raises(Exception):
+        connection.execute("PRAGMA writable_schema = ON")
+    with pytest.raises(Exception):
+        connection.execute("DELETE FROM seeds")
+    connection.close()
+
+
+def test_runaway_queries_are_cancelled(client, analytics, monkeypatch):
+    monkeypatch.setattr(query_guard, "TIMEOUT_MS", 1)
+    monkeypatch.setattr(snapshot, "PROGRESS_INTERVAL", 1)
+
+    client.post("/seeds/", json=[{"species": "C. galapagoense", "variety": f"Join {i}"} for i in range(20)])
+    snapshot.warm()
+
+    response = query(client, "SELECT COUNT(*) FROM seeds a, seeds b, seeds c, seeds d, seeds e")
+
+    assert response.status_code == 400
+    assert "cancelled" in response.json()["detail"]
+
+
+def test_queries_sqlite_cannot_run_fall_back_to_the_live_database(client, analytics, monkeypatch):
+    def unsupported(*args):
+        raise snapshot.SnapshotQueryError("no such function: DATE_FORMAT")
+
+    monkeypatch.setattr(analytics, "run_page", unsupported)
+
+    result = query(client, "SELECT 1 AS one").json()
+
+    assert result["rows"] == [{"one": 1}]
+    assert result["snapshot_age_seconds"] is None
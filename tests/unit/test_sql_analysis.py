@@ -0,0 +1,25 @@
+from sql_analysis import analyze, fingerprint
+
+
+def test_whitespace_comments_and_keyword_case_are_ignored():
+    assert fingerprint("select species, count(*) as n\n  from seeds -- all of them\n group by species") == \
+        fingerprint("SELECT species,count(*) AS n FROM seeds /* all */ GROUP BY species")
+
+
+def test_literals_and_column_names_are_kept():
+    assert fingerprint("SELECT * FROM seeds WHERE variety = 'Red'") != \
+        fingerprint("SELECT * FROM seeds WHERE variety = 'red'")
+    # MySQL names unaliased columns after their text, so these return different keys
+    assert fingerprint("SELECT COUNT(*) FROM seeds") != fingerprint("SELECT count(*) FROM seeds")
+
+
+def test_tables_are_found_in_joins_and_quotes():
+    analysis = analyze("SELECT o.* FROM `observations` o JOIN plants p ON p.plant_id = o.plant_id")
+
+    assert analysis.tables == ("observations", "plants")
+
+
+def test_volatile_and_foreign_queries_are_not_cacheable():
+    assert analyze("SELECT * FROM plants WHERE planted_date > CURDATE() - INTERVAL 7 DAY").tables is None
+    assert analyze("SELECT table_name FROM information_schema.tables").tables is None
+    assert analyze("SELECT 1").tables is None
@@ -0,0 +1,35 @@
+import json
+
+from streaming import NDJSON_MEDIA_TYPE
+
+NDJSON = {"accept": NDJSON_MEDIA_TYPE}
+
+
+def lines(response):
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith(NDJSON_MEDIA_TYPE)
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_lists_stream_every_row_as_ndjson(client):
+    seed = client.post("/seeds/", json={"species": "C. annuum", "variety": "Streamed"}).json()
+    germinations = client.post("/germinations/", json=[
+        {"seed_id": seed["seed_id"], "planted_date": f"2024-0{month}-01", "seeds_attempted": 2, "method": "soil"}
+        for month in (1, 2, 3)]).json()
+
+    rows = lines(client.get("/germinations/0", params={"seed_id": seed["seed_id"]}, headers=NDJSON))
+
+    assert rows == germinations
+    limited = lines(client.get("/germinations/0", params={"seed_id": seed["seed_id"], "limit": 2}, headers=NDJSON))
+    assert limited == germinations[:2]
+    # Without the header the same call is a page
+    assert "items" in client.get("/germinations/0", params={"seed_id": seed["seed_id"]}).json()
+
+
+def test_select_queries_stream_as_ndjson(client):
+    client.post("/seeds/", json=[{"species": "C. annuum", "variety": f"Streamed {i}"} for i in range(3)])
+
+    response = client.post("/run_select_query/", params={
+        "query": "SELECT variety FROM seeds WHERE variety LIKE 'Streamed %' ORDER BY seed_id"}, headers=NDJSON)
+
+    assert lines(response) == [{"variety": f"Streamed {i}"} for i in range(3)]
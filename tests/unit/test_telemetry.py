@@ -0,0 +1,81 @@
+import time
+
+import pytest
+from fastapi import HTTPException
+
+import telemetry
+
+URL = "/telemetry/hydroponic_conditions/"
+
+
+@pytest.fixture()
+def systems(client):
+    return [client.post("/hydroponic_systems/", json={"system_type": "NFT"}).json()["system_id"] for _ in range(2)]
+
+
+def conditions(client, system_id):
+    return client.get("/hydroponic_conditions/0", params={"system_id": system_id, "limit": 500}).json()["items"]
+
+
+def test_batches_from_many_systems_are_written_with_timestamps(client, systems):
+    now = int(time.time()) - 120
+    response = client.post(URL, json={
+        "system_id": [systems[0], systems[0], systems[1]], "recorded_at": [now, now + 60, now],
+        "water_ph": [6.1, 6.2, None], "electrical_conductivity_us_cm": [1450, 1452, 980]})
+
+    assert response.status_code == 201
+    assert response.json() == {"inserted": 3, "systems": systems}
+    first = conditions(client, systems[0])
+    assert [row["water_ph"] for row in first] == [6.1, 6.2]
+    assert first[1]["recorded_at"].startswith(time.strftime("%Y-%m-%dT%H:%M", time.gmtime(now + 60)))
+    assert first[0]["date"] == time.strftime("%Y-%m-%d", time.gmtime(now))
+    second = conditions(client, systems[1])
+    assert second[0]["water_ph"] is None and second[0]["water_temperature_f"] is None
+
+    client.post(URL, json={"system_id": systems[1], "recorded_at": [now + 60], "water_temperature_f": [68.5]})
+    latest = client.post("/run_select_query/", json={"name": "latest_conditions_per_system"}).json()["rows"]
+    assert {row["system_id"]: row["water_temperature_f"] for row in latest}[systems[1]] == 68.5
+
+
+@pytest.mark.parametrize("batch, message", [
+    ({"system_id": 1, "recorded_at": []}, "non-empty list"),
+    ({"system_id": 1, "recorded_at": [0], "water_ph": [6]}, "recorded_at is missing or not a plausible Unix time at "
+                                                            "readings 0"),
+    ({"system_id": [1, None], "recorded_at": [1712390400] * 2, "water_ph": [6, 6]}, "system_id is missing or not "
+                                                                                     "an id at readings 1"),
+    ({"system_id": 1, "recorded_at": [1712390400] * 3, "water_ph": [6, 15, -1]}, "water_ph is outside 0-14 at "
+                                                                                  "readings 1, 2"),
+    ({"system_id": 1, "recorded_at": [1712390400] * 2, "water_ph": [6]}, "water_ph must be a list of 2 readings"),
+    ({"system_id": 1, "recorded_at": [1712390400], "water_ph": ["acid"]}, "numbers or nulls"),
+    ({"system_id": 1, "recorded_at": [1712390400], "water_ph": ["6.5"]}, "water_ph must hold numbers or nulls"),
+    ({"system_id": 1, "recorded_at": [1712390400], "water_ph": [True]}, "water_ph must hold numbers or nulls"),
+    ({"system_id": [True], "recorded_at": [1712390400], "water_ph": [6]}, "system_id must hold numbers or nulls"),
+    ({"system_id": 1, "recorded_at": ["1712390400"], "water_ph": [6]}, "recorded_at must hold numbers or nulls"),
+    ({"system_id": 1, "recorded_at": [1712390400], "water_ph": [None]}, "Readings 0 have no values"),
+    ({"system_id": 1, "recorded_at": [1712390400], "humidity": [40]}, "Unknown columns: humidity"),
+])
+def test_bad_batches_are_rejected_whole(client, batch, message):
+    response = client.post(URL, json=batch)
+
+    assert response.status_code == 400
+    assert message in response.json()["detail"]
+
+
+def test_unknown_systems_write_nothing(client, systems):
+    response = client.post(URL, json={"system_id": [systems[0], 999999], "recorded_at": [1712390400] * 2,
+                                      "water_ph": [6, 6]})
+
+    assert response.status_code == 404
+    assert "999999" in response.json()["detail"]
+    assert conditions(client, systems[0]) == []
+
+
+def test_long_lists_of_bad_positions_are_cut_short():
+    batch = {"system_id": 1, "recorded_at": [1712390400] * 25, "water_temperature_f": [0] * 25}
+
+    with pytest.raises(HTTPException, match="9 and 15 more"):
+        telemetry.validate(batch)
+
+
+def test_the_endpoint_is_not_a_gpt_action(client):
+    assert "/telemetry/hydroponic_conditions/" not in client.app.openapi()["paths"]
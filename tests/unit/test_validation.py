@@ -0,0 +1,69 @@
+import itertools
+
+import pytest
+
+from sql_analysis import tokenize
+from validation import UNDECIDED, fast_verdict, sqlparse_verdict, validator_stats, verdict_cache
+
+HEADS = ["select", "SELECT", "Select", " select", "\nselect", "-- c\nselect", "/* c */select", "#c\nselect", "(select",
+         "selectx", "select.", "select*", "select`a`", "delete", "update", "insert", "with", "explain", "show",
+         "/*!50000 select*/", "", "  ", "\n\t", "-- only", "select#c\n", "select-- c\n", "select/* c */",
+         "select #c\n"]
+BODIES = ["", " 1", " * from plants", "* from plants", " count(*) from plants",
+          " max(height_cm), plant_id from observations group by plant_id", " a from t where x in (1,2)",
+          " a from t where b in(1)", " a from t where not(a)", " a from t where exists (select 1)", " (a) from t",
+          " a, (b) from t", " a from t order by (a)", " 1; delete from t", " a from t where a = ';'",
+          " a from t where a = '(x'", " coalesce(a, 0) as a from t", " if(a>1, 1, 0) from t",
+          " date_format(date, '%Y-%m') as m, avg(height_cm) from observations group by m",
+          " sum(a) over (partition by b) from t", " a from t join (select 1) x on true",
+          " case when a then 1 end from t", " cast(a as char) from t", " 1 union select 2", " 1 union (select 2)",
+          " a from t for update", " a -- trailing", " a /* x */ from t", " a from t where (a = 1 or b = 2)",
+          " a from t where a = (select max(a) from t) order by (a)", " a from t where a in (select b from u) limit 1",
+          " a from t where (a) group by (b)", " a from t where a in (1) union (select 2)",
+          " a from t where x = 1 having (a)", " a from t where (select 1 from u group by b)",
+          " a from t where a in (select b from u where c in (1, 2)) order by a",
+          " count (*) from t", " a from t order by max (a)", " a as x, b from t group by a, lower(b)"]
+
+
+def reference(query):
+    try:
+        return sqlparse_verdict(query)
+    except Exception as e:
+        return type(e)
+
+
+@pytest.mark.parametrize("query", [head + body for head, body in itertools.product(HEADS, BODIES)])
+def test_fast_path_agrees_with_sqlparse(query):
+    verdict = fast_verdict(tokenize(query))
+    if verdict is not UNDECIDED:
+        assert verdict == reference(query)
+
+
+@pytest.mark.parametrize("query", ["SELECT#c\nAS ", "SELECT-- c\nAS ", "SELECT/*c*/AS "])
+def test_comments_straight_after_select_go_to_sqlparse(query):
+    assert fast_verdict(tokenize(query)) is UNDECIDED
+
+
+def test_common_queries_skip_sqlparse():
+    for query in ["SELECT * FROM plants", "select count(*) from observations where plant_id in (1, 2)",
+                  "SELECT plant_id, avg(height_cm) AS h FROM observations GROUP BY plant_id ORDER BY h DESC LIMIT 5",
+                  "DELETE FROM plants", " select 1", ""]:
+        assert fast_verdict(tokenize(query)) is not UNDECIDED, query
+
+
+def test_verdicts_are_memoized(client):
+    query = "SELECT variety FROM seeds WHERE variety = 'memo'"
+    client.post("/run_select_query/", params={"query": query})
+    fast, hits = validator_stats["fast"], verdict_cache.hits
+
+    client.post("/run_select_query/", params={"query": query})
+
+    assert validator_stats["fast"] == fast
+    assert verdict_cache.hits == hits + 1
+
+
+def test_rejections_keep_their_messages(client):
+    response = client.post("/run_select_query/", params={"query": "DELETE FROM seeds"})
+
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Only SELECT statements are allowed."}
@@ -0,0 +1,69 @@
+import pytest
+
+
+@pytest.fixture()
+def scheduled_event():
+    """ Generates the EventBridge event sent by the KeepWarmSchedule rule """
+
+    return {
+        "version": "0",
+        "id": "53dc4d37-cffa-4f76-80c9-8b7d4a4d2eaa",
+        "detail-type": "Scheduled Event",
+        "source": "aws.events",
+        "account": "123456789012",
+        "time": "2024-03-10T12:00:00Z",
+        "region": "us-east-2",
+        "resources": ["arn:aws:events:us-east-2:123456789012:rule/KeepWarmSchedule"],
+        "detail": {},
+    }
+
+
+def test_scheduled_event_is_answered_before_mangum(app, scheduled_event, monkeypatch):
+    import main
+
+    def fail(*args):
+        raise AssertionError("scheduled events must not reach Mangum")
+
+    monkeypatch.setattr(main, "asgi_handler", fail)
+    monkeypatch.setattr(main, "_openapi_bytes", None)
+
+    ret = main.handler(scheduled_event, None)
+
+    assert set(ret["warmed"]) == {name for name, _ in main.WARMUP_STEPS}
+    assert all(isinstance(duration, float) for duration in ret["warmed"].values()), ret
+    assert main._openapi_bytes is not None
+
+
+def test_failing_step_is_reported_not_raised():
+    from warmup import warm
+
+    def broken():
+        raise RuntimeError("database unreachable")
+
+    ret = warm([("database", broken), ("noop", lambda: None)])
+
+    assert ret["warmed"]["database"] == "failed: database unreachable"
+    assert isinstance(ret["warmed"]["noop"], float)
+
+
+def test_http_events_still_go_through_mangum(app):
+    import main
+
+    event = {
+        "version": "2.0",
+        "routeKey": "ANY /{proxy+}",
+        "rawPath": "/",
+        "rawQueryString": "",
+        "headers": {"host": "1234567890.execute-api.us-east-2.amazonaws.com"},
+        "requestContext": {
+            "http": {"method": "GET", "path": "/", "protocol": "HTTP/1.1", "sourceIp": "127.0.0.1",
+                     "userAgent": "pytest"},
+            "stage": "$default",
+        },
+        "isBase64Encoded": False,
+    }
+
+    ret = main.handler(event, None)
+
+    assert ret["statusCode"] == 200
+    assert "Hello World" in ret["body"]